@@ -1,61 +1,311 @@
 import pandas as pd
-import random
 import numpy as np
-from copy import deepcopy
+import zlib
+from functools import lru_cache
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
 
+# Shared storage layer lives with the generators : Synthetic_Data_Generation has to be
+# importable, as it is through synthgen, the Orchestrator or the benchmark scripts
+from DataIO import write_table, table_path, iter_table, TableWriter
 
 
 
 
-# Remove in Production when column names are not masked
 
-features = ['I','MT', 'IP', 'SNS', 'RL', 'OS', 'C','AC', 'WC', 'E','T']
+# Column roles and compact dtypes are defined once in Schema
+from Schema import features, numeric, ints, categorical, load_data, coerce
+from Instrument import stage
 
-numeric = ['MT', 'C', 'AC','WC',
-           'E']
-ints = ['C', 'AC','WC',
-           'E']
-categorical = [ 'IP','OS','RL','SNS']
 
 
 
+def category_table(values):
+    
+    # Fixed ordering of the categories seen for a column, used for integer codes
+    return np.array(sorted(values,key=str),dtype=object)
+
 
-def mutate(x,p,fmap,col):
+def encode_categories(x,table):
     
-    roulette = random.uniform(0, 1)
-    if roulette > p:
-        return random.choice(list(set(fmap[col])-set(x)))
-    else :
-        return x
+    # Codes index into table, -1 for values that were not seen in fit
+    return pd.Index(table).get_indexer(x).astype(np.int64)
+
+
+# Rows are grouped into fixed blocks with one seeded stream per (block, column),
+# so the draws for a row never depend on how the input was chunked
+NOISE_BLOCK = 65536
+
+class NoiseStream:
     
+    def __init__(self,seed=None):
+        
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        self.seed = seed
+        self.cache = {}
+        
+    def block(self,col,b,width):
+        
+        # Only the last block of each column is kept, enough for chunks smaller than a block
+        if col not in self.cache or self.cache[col][0] != b:
+            rng = np.random.default_rng([self.seed,b,zlib.crc32(col.encode())])
+            self.cache[col] = (b,rng.random((NOISE_BLOCK,width)))
+        return self.cache[col][1]
+        
+    def uniform(self,col,start,n,width=1):
+        
+        # Uniforms in [0,1) for global rows start .. start+n
+        out = np.empty((n,width))
+        pos = start
+        while pos < start+n:
+            b, off = divmod(pos,NOISE_BLOCK)
+            take = min(NOISE_BLOCK-off,start+n-pos)
+            out[pos-start:pos-start+take] = self.block(col,b,width)[off:off+take]
+            pos += take
+        return out
+
+
+def excluded_codes(values,table):
     
-def laplace_noise(x,scale_map,noise,col,ints):
+    # A mutated value is drawn uniformly from set(fmap[col])-set(x) : every category
+    # but those that are a character of x (for values longer than one character
+    # that is every category, x included). A value that is not text leaves out
+    # itself. Sorted codes of the left out categories per value, padded with a code
+    # no category has, and their number.
+    index = {c:j for j,c in enumerate(table)}
+    rows = [sorted({index[c] for c in (set(v) if isinstance(v,str) else {v}) if c in index}) for v in values]
+    excluded = np.full((len(rows),max([len(r) for r in rows]+[0])),len(table),dtype=np.int64)
+    for i, r in enumerate(rows):
+        excluded[i,:len(r)] = r
+    return excluded, np.array([len(r) for r in rows],dtype=np.int64)
+
+
+@lru_cache(maxsize=64)
+def category_exclusions(categories):
     
-    y = x + np.random.laplace(loc=0.0, scale=scale_map[col])*noise
-    if col in ints:
-        return int(y)
-    else :
-        return y
+    # excluded_codes of every category of a table, once per table
+    return excluded_codes(categories,np.array(categories,dtype=object))
+
+
+def sample_other_category(k,u,excluded,counts):
     
-def add_noise(x,c,fmap,scale_map,p,noise,numeric,ints,categorical):
+    # Uniform draw over the k-counts categories not in excluded : the r-th of them
+    # is r moved past each smaller excluded code
+    other = np.floor(u*(k-counts)).astype(np.int64)
+    for j in range(excluded.shape[1]):
+        other += other >= excluded[:,j]
+    return other
+
+
+def mutate_column(x,p,table,u,codes=None):
     
-    if c in categorical:
-        return mutate(x,p,fmap,c)
-    elif c in numeric+ints :
-        return laplace_noise(x,scale_map,noise,c,ints)
-    else :
+    # codes can be passed in when the column was encoded once for several runs
+    x = np.asarray(x,dtype=object)
+    flip = u[:,0] > p
+    if not flip.any() or len(table) == 0:
         return x
+    codes = encode_categories(x[flip],table) if codes is None else codes[flip]
+    excluded, counts = category_exclusions(tuple(table))
+    excluded, counts = excluded[codes], counts[codes]
+    unseen = codes < 0
+    if unseen.any():
+        extra, extra_counts = excluded_codes(x[flip][unseen],table)
+        width = max(excluded.shape[1],extra.shape[1])
+        excluded = np.pad(excluded,((0,0),(0,width-excluded.shape[1])),constant_values=len(table))
+        excluded[unseen] = np.pad(extra,((0,0),(0,width-extra.shape[1])),constant_values=len(table))
+        counts[unseen] = extra_counts
+    # A value every category is left out for is kept
+    drawn = counts < len(table)
+    rows = np.flatnonzero(flip)[drawn]
+    out = x.copy()
+    out[rows] = table[sample_other_category(len(table),u[rows,1],excluded[drawn],counts[drawn])]
+    return out
+
+
+def laplace_column(x,scale,noise,is_int,u):
     
+    # Inverse CDF of Laplace(0, scale). u = 0 gives |d| = 0.5, bounded just below so
+    # the log stays finite (0.5-2**-54 is the float below 0.5)
+    d = u[:,0]-0.5
+    draw = -scale*np.sign(d)*np.log1p(-2*np.minimum(np.abs(d),0.5-2**-54))
+    y = np.asarray(x,dtype=np.float64) + draw*noise
+    if is_int:
+        # int() truncates towards zero, so does astype
+        return y.astype(np.int64)
+    return y
+
+
+def encode_frame(df,tables,numeric,ints,categorical):
     
+    # Category codes and float arrays that can be reused across noise settings
+    encoded = {}
+    for c in df.columns:
+        if c in categorical:
+            encoded[c] = (df[c].to_numpy(dtype=object),encode_categories(df[c].to_numpy(),tables[c]))
+        elif c in numeric+ints :
+            encoded[c] = df[c].to_numpy(dtype=np.float64)
+    return encoded
+
 
-def add_noise_df(df,fmap,scale_map,p,noise,numeric,ints,categorical):
-     
-    noisy_df = deepcopy(df)
+def add_noise_df(df,fmap,scale_map,p,noise,numeric,ints,categorical,stream=None,tables=None,start=0,encoded=None):
+    
+    # Column-at-a-time noise, only the columns that are perturbed are copied
+    # start is the position of the first row of df in the full dataset
+    if stream is None:
+        stream = NoiseStream()
+    if tables is None:
+        tables = {c:category_table(fmap[c]) for c in categorical if c in fmap}
+    if encoded is None:
+        encoded = encode_frame(df,tables,numeric,ints,categorical)
+    
+    noisy_df = df.copy(deep=False)
     for c in noisy_df.columns:
-        noisy_df[c] = [add_noise(x,c,fmap,scale_map,p,noise,numeric,ints,categorical) for x in noisy_df[c]]
+        if c in categorical:
+            u = stream.uniform(c,start,len(noisy_df),2)
+            x, codes = encoded[c]
+            noisy_df[c] = mutate_column(x,p,tables[c],u,codes)
+        elif c in numeric+ints :
+            u = stream.uniform(c,start,len(noisy_df))
+            noisy_df[c] = laplace_column(encoded[c],scale_map[c],noise,c in ints,u)
         
     return noisy_df
+
+
+# Per-process state for Noise.sweep, set once per worker instead of per configuration
+SWEEP_STATE = {}
+
+def init_sweep_worker(state):
+    
+    SWEEP_STATE.clear()
+    SWEEP_STATE.update(state)
+    
+    
+def sweep_worker(job):
+    
+    p, noise, seed, save_path = job
+    st = SWEEP_STATE
+    noisy = add_noise_df(df=st['df'],fmap=st['fmap'],scale_map=st['scale_map'],p=p,noise=noise,
+                         numeric=st['numeric'],ints=st['ints'],categorical=st['categorical'],
+                         stream=NoiseStream(seed),tables=st['tables'],encoded=st['encoded'])
+    write_table(coerce(noisy),save_path)
+    return save_path
+
+
+def spawn_seeds(seed,n):
+    
+    # Independent child seeds, child i reproduces transform(..., seed=seeds[i])
+    children = np.random.SeedSequence(seed).spawn(n)
+    return [int(c.generate_state(1,np.uint64)[0]) for c in children]
+        
+
+class NoiseStats:
+    
+    # Mergeable fit statistics: per-column count/mean/M2 (Welford, combined with
+    # Chan's pairwise update) for numeric columns and category sets for the rest.
+    # Stats built on separate partitions or processes merge into the same result.
+    
+    def __init__(self,numeric=numeric,categorical=categorical):
+        
+        self.numeric = list(numeric)
+        self.categorical = list(categorical)
+        self.n = np.zeros(len(self.numeric))
+        self.mean = np.zeros(len(self.numeric))
+        self.m2 = np.zeros(len(self.numeric))
+        self.fmap = {col:set() for col in self.categorical}
+        # Key of the data the stats were fitted on, when saved (data_key)
+        self.data = None
         
+    def merge_moments(self,n,mean,m2):
+        
+        total = self.n+n
+        safe = np.where(total > 0,total,1)
+        delta = mean-self.mean
+        self.mean = self.mean+delta*n/safe
+        self.m2 = self.m2+m2+delta**2*self.n*n/safe
+        self.n = total
+        
+    def update(self,df):
+        
+        x = df[self.numeric].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(x)
+        n = valid.sum(axis=0)
+        mean = np.where(valid,x,0).sum(axis=0)/np.where(n > 0,n,1)
+        m2 = (np.where(valid,x-mean,0)**2).sum(axis=0)
+        self.merge_moments(n,mean,m2)
+        for col in self.categorical:
+            self.fmap[col].update(pd.unique(df[col]))
+        return self
+        
+    def merge(self,other):
+        
+        self.merge_moments(other.n,other.mean,other.m2)
+        for col in self.categorical:
+            self.fmap[col].update(other.fmap[col])
+        return self
+    
+    def std(self):
+        
+        # Sample standard deviation, as DataFrame.describe() reports it
+        return np.sqrt(self.m2/np.where(self.n > 1,self.n-1,np.nan))
+    
+    def scale_map(self):
+        
+        return {c:s/2**0.5 for c,s in zip(self.numeric,self.std())}
+    
+    def describe(self):
+        
+        return pd.DataFrame([self.n,self.mean,self.std()],index=['count','mean','std'],columns=self.numeric)
+    
+    def to_dict(self):
+        
+        plain = lambda v: v.item() if hasattr(v,'item') else v
+        return {'numeric':self.numeric,'categorical':self.categorical,
+                'n':self.n.tolist(),'mean':self.mean.tolist(),'m2':self.m2.tolist(),
+                'fmap':{col:[plain(v) for v in self.fmap[col]] for col in self.categorical},
+                'data':self.data}
+    
+    @classmethod
+    def from_dict(cls,d):
+        
+        stats = cls(d['numeric'],d['categorical'])
+        stats.n = np.array(d['n'],dtype=np.float64)
+        stats.mean = np.array(d['mean'],dtype=np.float64)
+        stats.m2 = np.array(d['m2'],dtype=np.float64)
+        stats.fmap = {col:set(v) for col,v in d['fmap'].items()}
+        stats.data = d.get('data')
+        return stats
+    
+    def save(self,path):
+        
+        with open(path,'w') as f:
+            json.dump(self.to_dict(),f)
+            
+    @classmethod
+    def load(cls,path):
+        
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+        
+
+def data_key(path):
+    
+    # The data file as saved stats know it : path, size and modification time,
+    # compared without reading the file
+    st = os.stat(path)
+    return {'path':os.path.abspath(path),'size':st.st_size,'mtime_ns':st.st_mtime_ns}
+
+
+def partition_stats(path,chunksize=100000,start=0,stop=None):
+    
+    # Stats over rows start .. stop of a table, for fitting on several workers and merging
+    stats = NoiseStats()
+    for chunk in iter_table(path,chunksize,start,stop):
+        chunk.columns = features
+        stats.update(coerce(chunk))
+    return stats
+
 
 class Noise:
     
@@ -69,40 +319,124 @@ class Noise:
 
         
             
-    def fit(self,real_data_path):
+    def fit(self,real_data_path,chunksize=None,stats_path=None,fingerprint=None):
         
-        self.path = real_data_path       
-        self.df = pd.read_csv(self.path)
-        self.df.columns = features
+        # chunksize fits in one streaming pass without loading the data,
+        # stats_path saves the fitted statistics or reuses them when the file exists
+        # and was fitted on the same data : the same fingerprint when one is given,
+        # otherwise the same path, size and modification time
+        self.path = real_data_path
+        self.df = None
+        key = fingerprint if fingerprint is not None else data_key(self.path)
+        if stats_path and os.path.isfile(stats_path):
+            with stage('noise','load_saved',path=stats_path) as ev:
+                saved = NoiseStats.load(stats_path)
+                ev['match'] = saved.data == key
+            if saved.data == key:
+                self.fit_stats(saved)
+                return
         
-        self.fmap = {}
-        for col in self.categorical:
-            self.fmap[col] = set(self.df[col])
- 
-
-        self.scale_map = {}
-        self.ds = self.df[numeric].describe()
-        for c in self.numeric:
-            self.scale_map[c] = self.ds[c]['std']/2**0.5
+        if chunksize:
+            with stage('noise','fit',chunksize=chunksize):
+                stats = partition_stats(self.path,chunksize)
+        else:
+            with stage('noise','load') as ev:
+                self.df = load_data(self.path)
+                ev['rows'] = len(self.df)
+            with stage('noise','fit',rows=len(self.df)):
+                stats = NoiseStats().update(self.df)
+            
+        self.fit_stats(stats)
+        if stats_path:
+            stats.data = key
+            stats.save(stats_path)
             
-    def transform(self,synth_data_path,p,noise):
+    def fit_stats(self,stats):
         
+        self.stats = stats
+        self.fmap = stats.fmap
+        self.tables = {col:category_table(self.fmap[col]) for col in self.categorical}
+        self.ds = stats.describe()
+        self.scale_map = stats.scale_map()
+        
+    def transform(self,synth_data_path,p,noise,seed=None,chunksize=None,save_path=None):
+        
+        # Noise is added to the synthetic rows at synth_data_path. chunksize streams
+        # them through in blocks of rows, the noisy rows are appended to save_path and
+        # never held in memory all at once. The rows drawn for a seed do not depend
+        # on chunksize.
+        # save_path replaces the name made from the settings
         self.synth_path = synth_data_path
-        self.synth = pd.read_csv(self.synth_path)
         
         self.p = p
         self.noise = noise
+        self.stream = NoiseStream(seed)
+        
+        tag = "_p_{}_n_{}".format(self.p,self.noise)+("_seed_{}".format(seed) if seed is not None else "")
+        self.save_path = save_path or table_path(os.path.splitext(self.synth_path)[0]+tag)
+        
+        if chunksize:
+            self.noisy_data = None
+            self.transform_chunks(chunksize)
+            return
+        
+        with stage('noise','load',path=self.synth_path) as ev:
+            self.synth = load_data(self.synth_path)
+            ev['rows'] = len(self.synth)
+        with stage('noise','noise',rows=len(self.synth),p=self.p,noise=self.noise):
+            self.noisy_data = add_noise_df(df=self.synth,fmap=self.fmap,scale_map=self.scale_map,p=self.p,
+                                           noise=self.noise,numeric=self.numeric,ints=self.ints,categorical=self.categorical,
+                                           stream=self.stream,tables=self.tables)
+            self.noisy_data = coerce(self.noisy_data)
         
-        self.save_path = self.synth_path.split(".")[0]+"_p_{}_n_{}".format(self.p,self.noise)+".csv"
+        with stage('noise','write',path=self.save_path,rows=len(self.noisy_data)):
+            write_table(self.noisy_data,self.save_path)
+        
+    def transform_chunks(self,chunksize):
+        
+        start = 0
+        with stage('noise','noise',p=self.p,noise=self.noise,chunksize=chunksize,path=self.save_path) as ev, TableWriter(self.save_path) as writer:
+            for chunk in iter_table(self.synth_path,chunksize):
+                chunk.columns = features
+                chunk = coerce(chunk)
+                noisy = add_noise_df(df=chunk,fmap=self.fmap,scale_map=self.scale_map,p=self.p,
+                                     noise=self.noise,numeric=self.numeric,ints=self.ints,categorical=self.categorical,
+                                     stream=self.stream,tables=self.tables,start=start)
+                writer.write(coerce(noisy))
+                start += len(chunk)
+            ev['rows'] = start
+        
+    def sweep(self,synth_data_path,configs,seed=None,processes=None):
+        
+        # One encoded copy of the synthetic rows shared by every (p, noise) pair in configs
+        # processes=1 runs the configurations one after another in this process
+        self.synth_path = synth_data_path
+        self.configs = list(configs)
+        self.seeds = spawn_seeds(seed,len(self.configs))
         
-        self.noisy_data = add_noise_df(df=self.df,fmap=self.fmap,scale_map=self.scale_map,p=self.p,
-                                       noise=self.noise,numeric=self.numeric,ints=self.ints,categorical=self.categorical)
+        with stage('noise','load',path=self.synth_path) as ev:
+            self.synth = load_data(self.synth_path)
+            ev['rows'] = len(self.synth)
+        state = {'df':self.synth,'fmap':self.fmap,'scale_map':self.scale_map,'tables':self.tables,
+                 'numeric':self.numeric,'ints':self.ints,'categorical':self.categorical,
+                 'encoded':encode_frame(self.synth,self.tables,self.numeric,self.ints,self.categorical)}
+        base = os.path.splitext(self.synth_path)[0]
+        jobs = [(p,noise,s,table_path(base+"_p_{}_n_{}".format(p,noise))) for (p,noise),s in zip(self.configs,self.seeds)]
         
-        self.noisy_data.to_csv(self.save_path)
+        if processes == 1:
+            init_sweep_worker(state)
+            paths = [sweep_worker(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=processes,initializer=init_sweep_worker,initargs=(state,)) as pool:
+                paths = list(pool.map(sweep_worker,jobs))
+                
+        self.sweep_paths = dict(zip(self.configs,paths))
+        return self.sweep_paths
         
-    def fit_transform(self,real_data_path,synth_data_path,p,noise):
+    def fit_transform(self,real_data_path,synth_data_path,p,noise,seed=None,chunksize=None,save_path=None,
+                      stats_path=None,fingerprint=None):
         
-        self.fit(real_data_path)
-        self.transform(synth_data_path,p,noise)
+        self.fit(real_data_path,chunksize,stats_path,fingerprint)
+        self.transform(synth_data_path,p,noise,seed,chunksize,save_path)
         
         
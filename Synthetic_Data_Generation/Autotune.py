@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "ctgan,torch,pandas,numpy,os"
+# ---------------------------------------------------------------------------
+""" Contains the CPU training mode of CTGAN and TVAE: a short calibration of the
+torch intra-op / inter-op thread counts and the batch size by training
+throughput, cached per machine and data shape. """
+# ---------------------------------------------------------------------------
+
+
+import numpy as np
+import json
+import multiprocessing
+import os
+import platform
+import time
+from Schema import primary_key, sdv_fields
+from ModelCache import package_versions
+from Instrument import stage, emit
+
+
+"""
+Usage Example :
+from CtGan import CtGan
+ctgan = CtGan("Data/data.csv")
+synth = ctgan.fit_transform(epochs=300,bs='auto',samples=56070)
+ctgan.tuning
+
+from Autotune import calibrate
+tuning = calibrate('tvae',data,discrete=['IP','SNS','RL','OS','T'],threads=[1,2,4])
+"""
+
+
+default_batch_sizes = [50,100,200,500,1000,2000,5000]
+# Rows the calibration trains on, throughput per step does not depend on the data size
+calibration_rows = 5000
+tune_path = "model_cache/autotune.json"
+
+
+def thread_candidates(cpus=None):
+
+    # 1, 2, 4, ... up to the number of CPUs
+    cpus = cpus or os.cpu_count() or 1
+    out, n = [1], 2
+    while n < cpus:
+        out.append(n)
+        n *= 2
+    if cpus > 1:
+        out.append(cpus)
+    return out
+
+
+def batch_candidates(kind,rows,pac=10,sizes=None):
+
+    # CTGAN batches must be even and split into groups of pac rows,
+    # batches larger than the data are left out
+    step = int(np.lcm(2,pac)) if kind == 'ctgan' else 1
+    out = sorted({max(step,int(round(b/step))*step) for b in (sizes or default_batch_sizes)})
+    return [b for b in out if b <= rows] or out[:1]
+
+
+def measure(kind,data,discrete,transformer,batch_size,pac,min_seconds,min_steps=3):
+
+    # Rows per second of training steps at batch_size, after one warm-up step
+    from ctgan import CTGAN, TVAE
+    from Training import synthesizers
+    setup, epoch_fn = synthesizers[kind][:2]
+    if kind == 'ctgan':
+        model = CTGAN(batch_size=batch_size,pac=pac,cuda=False)
+        rows_per_step = batch_size
+    else:
+        model = TVAE(batch_size=batch_size,cuda=False)
+        rows_per_step = min(batch_size,len(data))
+    state = setup(model,data,discrete,transformer)
+    state['steps'] = 1
+    epoch_fn(model,state)
+    steps, t = 0, time.perf_counter()
+    while steps < min_steps or time.perf_counter()-t < min_seconds:
+        epoch_fn(model,state)
+        steps += 1
+    return steps*rows_per_step/(time.perf_counter()-t)
+
+
+def calibrate_worker(kind,data,discrete,interop,threads,batch_sizes,pac,min_seconds,queue):
+
+    # Runs in a fresh process, torch fixes the inter-op thread count on first use
+    try:
+        import torch
+        torch.set_num_interop_threads(interop)
+        from Training import fit_transformer
+        transformer = fit_transformer(data,discrete)
+        trials = []
+        for n in threads:
+            torch.set_num_threads(n)
+            for bs in batch_sizes:
+                trials.append({'interop_threads':interop,'threads':n,'batch_size':bs,
+                               'rows_per_s':measure(kind,data,discrete,transformer,bs,pac,min_seconds)})
+        queue.put(('ok',trials))
+    except Exception as e:
+        queue.put(('failed',"{}: {}".format(type(e).__name__,e)))
+
+
+def choose(trials,tolerance=0.05):
+
+    # Highest throughput, the largest batch size among trials within tolerance of it
+    best = max(t['rows_per_s'] for t in trials)
+    close = [t for t in trials if t['rows_per_s'] >= best*(1-tolerance)]
+    return max(close,key=lambda t:(t['batch_size'],t['rows_per_s']))
+
+
+def calibrate(kind,data,discrete,pac=10,threads=None,interop=None,batch_sizes=None,min_seconds=0.5,cache_path=tune_path):
+
+    # Tries every (inter-op threads, threads, batch size) and returns the fastest
+    # with its throughput and the trials. Results are kept in cache_path per kind,
+    # machine, library versions, data shape and candidates.
+    cpus = os.cpu_count() or 1
+    threads = threads or thread_candidates(cpus)
+    interop = interop or sorted({1,min(2,cpus)})
+    batch_sizes = batch_candidates(kind,len(data),pac,batch_sizes)
+    versions = package_versions()
+    key = json.dumps({'kind':kind,'pac':pac if kind == 'ctgan' else None,'cpus':cpus,'machine':platform.machine(),
+                      'torch':versions.get('torch'),'ctgan':versions.get('ctgan'),'columns':list(map(str,data.columns)),
+                      'discrete':list(discrete),'threads':threads,'interop':interop,'batch_sizes':batch_sizes},sort_keys=True)
+    tuned = {}
+    if cache_path and os.path.isfile(cache_path):
+        with open(cache_path) as f:
+            tuned = json.load(f)
+        if key in tuned:
+            emit(kind,'autotune_cached',**{k:v for k,v in tuned[key].items() if k != 'trials'})
+            return tuned[key]
+
+    sample = data.sample(min(len(data),calibration_rows),random_state=0)
+    ctx = multiprocessing.get_context('spawn')
+    trials = []
+    with stage(kind,'autotune',candidates=len(threads)*len(interop)*len(batch_sizes)) as ev:
+        for n in interop:
+            queue = ctx.Queue()
+            proc = ctx.Process(target=calibrate_worker,args=(kind,sample,list(discrete),n,threads,batch_sizes,pac,min_seconds,queue))
+            proc.start()
+            proc.join()
+            if queue.empty():
+                raise RuntimeError("Calibration exited with code {}".format(proc.exitcode))
+            status, result = queue.get()
+            if status != 'ok':
+                raise RuntimeError("Calibration failed : {}".format(result))
+            trials.extend(result)
+        result = {**choose(trials),'kind':kind,'cpus':cpus,'trials':trials}
+        ev.update({k:v for k,v in result.items() if k != 'trials'})
+
+    if cache_path:
+        tuned[key] = result
+        os.makedirs(os.path.dirname(cache_path) or ".",exist_ok=True)
+        tmp = cache_path+".tmp"
+        with open(tmp,'w') as f:
+            json.dump(tuned,f,indent=1)
+        os.replace(tmp,cache_path)
+    return result
+
+
+def apply_threads(tuning):
+
+    # The inter-op count can only be set before torch first runs parallel work,
+    # the count actually in effect is recorded next to the chosen one
+    import torch
+    torch.set_num_threads(tuning['threads'])
+    try:
+        torch.set_num_interop_threads(tuning['interop_threads'])
+    except RuntimeError:
+        pass
+    tuning['applied_threads'] = torch.get_num_threads()
+    tuning['applied_interop_threads'] = torch.get_num_interop_threads()
+    return tuning
+
+
+def tune(kind,data,pac=10,**options):
+
+    # CPU mode for a generator : calibrates on the schema's features (id left out),
+    # applies the threads and reports the expected epoch time before training
+    # Discrete columns chosen as the real fit chooses them (Training.py)
+    from Training import discrete_columns
+    features = [c for c in data.columns if c != primary_key]
+    discrete = discrete_columns(sdv_fields(features),data[features])
+    tuning = apply_threads(dict(calibrate(kind,data[features],discrete,pac,**options)))
+    tuning['epoch_seconds'] = len(data)/tuning['rows_per_s']
+    emit(kind,'throughput',rows_per_s=round(tuning['rows_per_s'],1),batch_size=tuning['batch_size'],
+         threads=tuning['applied_threads'],interop_threads=tuning['applied_interop_threads'],
+         epoch_seconds=round(tuning['epoch_seconds'],2))
+    return tuning
@@ -8,43 +8,326 @@
 """ Contains a class for generating synthetic Data using Data Synthesizer.
 Derived Work From https://github.com/DataResponsibly/DataSynthesizer """ 
 # ---------------------------------------------------------------------------
-from DataSynthesizer.DataDescriber import DataDescriber
-from DataSynthesizer.DataGenerator import DataGenerator
-from DataSynthesizer.ModelInspector import ModelInspector
-from DataSynthesizer.lib.utils import read_json_file, display_bayesian_network
+from itertools import combinations, product
 import pandas as pd
+import numpy as np
+import random
+import json
 import os
+from DataIO import read_table, write_table, table_path
+from concurrent.futures import ProcessPoolExecutor
+from Instrument import stage, emit
+from DataCache import datasets, SharedFrame
+from BayesSampler import BayesSampler
 
-# Remove in Production when column names are not masked
-features = ['I','MT', 'IP', 'SNS', 'RL', 'OS', 'C','AC', 'WC', 'E','T']
+# DataSynthesizer and sklearn are imported where they are used, importing this
+# module stays cheap for scripts that never fit or sample BAYES
 
-#Defining Attribute types
+# Column names and the DataSynthesizer attribute types are defined once in Schema
+from Schema import features, target, attribute_to_datatype, attribute_is_categorical, load_data, coerce
 
-attribute_to_datatype = {
-    'MT': 'Float',
-    'IP': 'String',
-    'SNS': 'String',
-    'RL': 'String',
-    'OS': 'String',
-    'C': 'Integer',
-    'WC': 'Integer',  
-    'E': 'Integer',
-    'AC':'Integer'
- # 'T': 'Integer'
-}
 
-attribute_is_categorical = {
-    'MT': False,
-    'IP': True,
-    'SNS': True,
-    'RL': True,
-    'OS': True,
-    'C': False,
-    'WC': False,  
-    'E': False,
-    'AC':True
- # 'T': True
-}
+
+
+# The dtypes and values read_csv would give data after a CSV round trip (category
+# values, float32 through their text form, 64 bit numbers). DataSynthesizer used to
+# read the classes from CSV files, its descriptions are unchanged on these.
+def csv_form(data):
+    
+    columns = {}
+    for c in data.columns:
+        col = data[c]
+        if isinstance(col.dtype,pd.CategoricalDtype):
+            columns[c] = np.asarray(col)
+        elif col.dtype == np.float32:
+            columns[c] = col.astype(str).astype('float64').to_numpy()
+        elif col.dtype.kind in 'iuf':
+            columns[c] = col.to_numpy(dtype='float64' if col.dtype.kind == 'f' else 'int64')
+        else:
+            columns[c] = col.to_numpy()
+    return pd.DataFrame(columns,index=data.index)
+
+
+# DataDescriber reading the DataFrame it is given instead of a CSV file
+def data_describer(data):
+    
+    from DataSynthesizer.DataDescriber import DataDescriber
+    describer = DataDescriber()
+    if isinstance(data,str):
+        return describer
+    frame = csv_form(data)
+    describer.read_dataset_from_csv = lambda file_name=None: setattr(describer,'df_input',frame)
+    return describer
+
+
+# Each class of T is described and generated in its own process, the two runs
+# are independent so wall time is that of the slower class. dataset_file is a
+# path or a DataFrame (a SharedFrame sent to a worker arrives as one).
+def describe_class(dataset_file,description_file,epsilon,k,attribute_to_datatype,attribute_is_categorical):
+    
+    describer = data_describer(dataset_file)
+    describer.describe_dataset_in_correlated_attribute_mode(
+    dataset_file = dataset_file,
+    epsilon = epsilon,
+    k = k,
+    attribute_to_datatype = attribute_to_datatype,
+    attribute_to_is_categorical = attribute_is_categorical)
+    describer.save_dataset_description_to_file(description_file)
+    return description_file
+
+
+def pin_root(description,value):
+    
+    # Description whose root attribute always takes value, the rest of the network
+    # is then sampled given it, so every generated row has it
+    description = json.loads(json.dumps(description))
+    root = description['bayesian_network'][0][1][0]
+    bins = description['attribute_description'][root]['distribution_bins']
+    if not description['attribute_description'][root]['is_categorical'] or value not in bins:
+        raise ValueError("{} = {} is not a category of the description".format(root,value))
+    description['conditional_probabilities'][root] = [1.0 if b == value else 0.0 for b in bins]
+    return description
+
+
+# Rows of one description (a path or the description itself) drawn in memory by
+# BayesSampler, typed to the schema. seed is an int or a sequence of ints.
+def generate_class(samples,description_file,seed=0):
+    
+    return coerce(BayesSampler(description_file).sample(samples,seed)[features])
+
+
+
+
+# Non-private statistics of one class of T for the correlated attribute mode.
+# Histograms, binning and the encoded data are computed once; mutual information
+# of every (child, parents) candidate and the joint counts of every attribute set
+# are memoised. describe(epsilon, k) then only draws the Laplace noise and runs the
+# exponential mechanism, following DataDescriber's order of random draws.
+class BayesStats:
+    
+    def __init__(self,dataset_file,attribute_to_datatype,attribute_is_categorical,seed=0):
+        
+        self.describer = data_describer(dataset_file)
+        self.describer.describe_dataset_in_random_mode(dataset_file,
+                                                       attribute_to_datatype = dict(attribute_to_datatype),
+                                                       attribute_to_is_categorical = dict(attribute_is_categorical),
+                                                       seed = seed)
+        for column in self.describer.attr_to_column.values():
+            column.infer_distribution()
+        self.clean = {attr:column.distribution_probabilities.copy() for attr,column in self.describer.attr_to_column.items()}
+        
+        self.encoded = self.describer.encode_dataset_into_binning_indices()
+        self.codes = {attr:self.encoded[attr].to_numpy() for attr in self.encoded.columns}
+        self.dims = {attr:int(self.codes[attr].max())+1 for attr in self.encoded.columns}
+        self.is_binary = {attr:len(np.unique(self.codes[attr])) <= 2 for attr in self.encoded.columns}
+        self.num_tuples, self.num_attributes = self.encoded.shape
+        self.mi = {}
+        self.counts = {}
+        
+    def combined(self,attrs):
+        
+        # One integer label per row for the joint value of attrs, C order like itertools.product
+        return np.ravel_multi_index([self.codes[a] for a in attrs],[self.dims[a] for a in attrs])
+        
+    def mutual_information(self,child,parents):
+        
+        key = (child,tuple(sorted(parents)))
+        if key not in self.mi:
+            from sklearn.metrics import mutual_info_score
+            self.mi[key] = mutual_info_score(self.codes[child],self.combined(key[1]))
+        return self.mi[key]
+    
+    def joint_counts(self,attrs):
+        
+        key = tuple(attrs)
+        if key not in self.counts:
+            shape = [self.dims[a] for a in attrs]
+            self.counts[key] = np.bincount(self.combined(attrs),minlength=int(np.prod(shape))).reshape(shape).astype(float)
+        return self.counts[key]
+    
+    def noisy_counts(self,attrs,epsilon):
+        
+        counts = self.joint_counts(attrs)
+        if epsilon:
+            from DataSynthesizer.lib.PrivBayes import laplace_noise_parameter
+            scale = laplace_noise_parameter(len(attrs)-1,self.num_attributes,self.num_tuples,epsilon)
+            counts = counts+np.random.laplace(0,scale=scale,size=counts.size).reshape(counts.shape)
+            counts[counts < 0] = 0
+        return counts
+    
+    def greedy_bayes(self,k,epsilon,root=None):
+        
+        # root fixes the first attribute of the network instead of a random one
+        from DataSynthesizer.lib.PrivBayes import calculate_k, exponential_mechanism
+        num_tuples, num_attributes = self.encoded.shape
+        if not k:
+            k = calculate_k(num_attributes,num_tuples)
+        columns = list(self.encoded.columns)
+        root = root or random.choice(self.encoded.columns)
+        V = [root]
+        rest = [a for a in columns if a != root]
+        N = []
+        while rest:
+            num_parents = min(len(V),k)
+            pairs = []
+            for child, split in product(rest,range(len(V)-num_parents+1)):
+                for other_parents in combinations(V[split+1:],num_parents-1):
+                    pairs.append((child,list(other_parents)+[V[split]]))
+            mis = [self.mutual_information(child,parents) for child,parents in pairs]
+            if epsilon:
+                p = exponential_mechanism(epsilon,mis,pairs,self.is_binary,num_tuples,num_attributes)
+                idx = np.random.choice(list(range(len(mis))),p=p)
+            else:
+                idx = mis.index(max(mis))
+            N.append(pairs[idx])
+            V.append(pairs[idx][0])
+            rest.remove(pairs[idx][0])
+        return N
+    
+    def conditional_distributions(self,bn,epsilon):
+        
+        # Same tables as PrivBayes.construct_noisy_conditional_distributions
+        from DataSynthesizer.lib.utils import normalize_given_distribution
+        k = len(bn[-1][1])
+        root = bn[0][1][0]
+        kplus1 = [root]+[child for child,_ in bn[:k]]
+        noisy_kplus1 = self.noisy_counts(kplus1,epsilon)
+        
+        conditional = {root:normalize_given_distribution(noisy_kplus1.sum(axis=tuple(range(1,len(kplus1))))).tolist()}
+        for idx, (child, parents) in enumerate(bn):
+            attrs = parents+[child]
+            if idx <= k-1:
+                keep = [kplus1.index(a) for a in attrs]
+                drop = tuple(i for i in range(len(kplus1)) if i not in keep)
+                stats = noisy_kplus1.sum(axis=drop) if drop else noisy_kplus1
+                stats = np.transpose(stats,np.argsort(np.argsort(keep)))
+            else:
+                stats = self.noisy_counts(attrs,epsilon)
+            conditional[child] = {}
+            for instance in np.ndindex(*stats.shape[:-1]):
+                conditional[child][str(list(instance))] = normalize_given_distribution(stats[instance]).tolist()
+        return conditional
+    
+    def describe(self,epsilon,k,seed=0,root=None):
+        
+        from DataSynthesizer.lib.utils import set_random_seed
+        set_random_seed(seed)
+        num_attributes_in_BN = self.describer.data_description['meta']['num_attributes_in_BN']
+        attribute_description = {}
+        for attr, column in self.describer.attr_to_column.items():
+            column.distribution_probabilities = self.clean[attr].copy()
+            column.inject_laplace_noise(epsilon,num_attributes_in_BN)
+            attribute_description[attr] = column.to_json()
+            
+        set_random_seed(seed)
+        bn = self.greedy_bayes(k,epsilon/2,root)
+        return {'meta':self.describer.data_description['meta'],
+                'attribute_description':attribute_description,
+                'bayesian_network':bn,
+                'conditional_probabilities':self.conditional_distributions(bn,epsilon/2)}
+    
+    def save_description(self,epsilon,k,description_file,seed=0,root=None):
+        
+        with open(description_file,'w') as outfile:
+            json.dump(self.describe(epsilon,k,seed,root),outfile,indent=4)
+        return description_file
+
+
+
+
+# Counts of one class of T under the binning of a saved description, for updates.
+# Only the joint counts the network's conditional tables are built from are kept, so
+# new rows are added in time proportional to them and the tables are redrawn from
+# BayesStats.conditional_distributions. Marginals of the rows added since the
+# structure was learned measure drift against the marginals it was learned on.
+class BayesCounts(BayesStats):
+    
+    def __init__(self,description,table):
+        
+        from DataSynthesizer.lib.utils import normalize_given_distribution
+        self.description = description
+        self.attrs = description['meta']['attributes_in_BN']
+        self.dims = {}
+        self.codes = self.encode(table)
+        self.dims = {a:int(self.codes[a].max())+1 for a in self.attrs}
+        self.num_tuples, self.num_attributes = len(table), len(self.attrs)
+        self.counts = {}
+        bn = description['bayesian_network']
+        k = len(bn[-1][1])
+        self.joint_counts([bn[0][1][0]]+[child for child,_ in bn[:k]])
+        for child, parents in bn[k:]:
+            self.joint_counts(parents+[child])
+        for a in self.attrs:
+            self.joint_counts([a])
+        self.codes = {}
+        self.base = {a:normalize_given_distribution(self.counts[(a,)]) for a in self.attrs}
+        self.since = {a:np.zeros(self.dims[a]) for a in self.attrs}
+        
+    def encode(self,table):
+        
+        # Bin indices as DataSynthesizer encodes them, None when a value falls outside
+        # the description (unseen category, outside [min, max], missing, unseen bin)
+        table = csv_form(table[self.attrs])
+        codes = {}
+        for a in self.attrs:
+            attribute = self.description['attribute_description'][a]
+            bins, values = attribute['distribution_bins'], table[a]
+            if values.isna().any():
+                return None
+            if attribute['is_categorical']:
+                if attribute['data_type'] == 'String':
+                    idx = values.astype(str).map({str(b):i for i,b in enumerate(bins)})
+                else:
+                    idx = values.astype(float).map({float(b):i for i,b in enumerate(bins)})
+                if idx.isna().any():
+                    return None
+                codes[a] = idx.to_numpy(dtype=np.int64)
+            else:
+                x = values.to_numpy(dtype=np.float64)
+                if (x < attribute['min']).any() or (x > attribute['max']).any():
+                    return None
+                codes[a] = np.searchsorted(bins,x,side='right')-1
+            if a in self.dims and codes[a].max(initial=0) >= self.dims[a]:
+                return None
+        return codes
+        
+    def add(self,codes):
+        
+        self.codes = codes
+        for key, counts in self.counts.items():
+            counts += np.bincount(self.combined(key),minlength=counts.size).reshape(counts.shape)
+        for a in self.attrs:
+            self.since[a] += np.bincount(codes[a],minlength=self.dims[a])
+        self.num_tuples += len(codes[self.attrs[0]])
+        self.codes = {}
+        
+    def since_structure(self):
+        
+        return int(self.since[self.attrs[0]].sum())
+        
+    def drift(self):
+        
+        # Largest total variation distance of a marginal of the rows added since the
+        # structure was learned from the marginal it was learned on
+        from DataSynthesizer.lib.utils import normalize_given_distribution
+        return max(0.5*np.abs(normalize_given_distribution(self.since[a])-self.base[a]).sum() for a in self.attrs)
+        
+    def describe(self,epsilon,seed=0):
+        
+        # Same network, marginals and conditional tables from the current counts, noise
+        # drawn as DataDescriber does (marginals at epsilon, tables at epsilon/2)
+        from DataSynthesizer.lib.utils import set_random_seed, normalize_given_distribution
+        set_random_seed(seed)
+        description = json.loads(json.dumps(self.description))
+        description['meta']['num_tuples'] = self.num_tuples
+        for a in self.attrs:
+            p = normalize_given_distribution(self.counts[(a,)])
+            if epsilon:
+                scale = 2/self.num_tuples/(epsilon/description['meta']['num_attributes_in_BN'])
+                p = normalize_given_distribution(p+np.random.laplace(0,scale=scale,size=len(p)))
+            description['attribute_description'][a]['distribution_probabilities'] = p.tolist()
+        description['conditional_probabilities'] = self.conditional_distributions(description['bayesian_network'],epsilon/2)
+        return description
 
 
 
@@ -64,6 +347,10 @@ from BAYES import BAYES
 bayes = BAYES("Data/data.csv",overwrite=False,save=True)
 synth = bayes.fit_transform(epsilon=100,k=1,onesamples=100,zerosamples=5)
 
+One network for both classes of T, exact rows per class :
+bayes.fit_conditional(epsilon=100,k=2,column='T')
+synth = bayes.sample_counts({0:5,1:100})
+
 """
 
 class BAYES:
@@ -71,108 +358,215 @@ class BAYES:
     def __init__(self,data_path,overwrite=False,save=True):
         
         
-        # Data Processing for Bayes : Splitting T
-        if not (os.path.isfile("bayes_temp/data0.csv") and os.path.isfile("bayes_temp/data1.csv")):
-            df = pd.read_csv(data_path)
-            df.columns = features
-            df_zero = df[df['T']==0]
-            df_one = df[df['T']==1]
-            assert(len(df_zero)>0)
-            assert(len(df_one)>0)
-            df_zero.to_csv('bayes_temp/data0.csv')
-            df_one.to_csv('bayes_temp/data1.csv')
-            
-        self.one = 'bayes_temp/data1.csv'
-        self.zero = 'bayes_temp/data0.csv'
+        # Data Processing for Bayes : Splitting T, all the rows are also kept for fit_conditional.
+        # The classes are views of one shared copy of the data (DataCache.py) that the
+        # describers read directly, split once per file for every BAYES object.
+        with stage('bayes','split',column='T') as ev:
+            self.set_data(datasets.split(data_path if isinstance(data_path,str) else coerce(data_path),target))
+            ev['strata'] = {str(t):len(self.shared[t]) for t in self.shared}
             
         self.save = save
         self.overwrite = overwrite
         
-        self.describer0 = DataDescriber()
-        self.describer1 = DataDescriber()
-        
         self.attribute_is_categorical = attribute_is_categorical
         self.attribute_to_datatype = attribute_to_datatype
+        self.bayes_counts = {}
+        self.updates = 0
+        
+    def set_data(self,shared):
         
+        assert(len(shared.get(0,()))>0)
+        assert(len(shared.get(1,()))>0)
+        self.shared = dict(shared)
+        self.zero = shared[0].frame
+        self.one = shared[1].frame
+        self.all = shared[0].whole().frame
+        # Rows given to update per class of T, not yet in the shared class data
+        self.new_rows = {0:[],1:[]}
+        
+    def class_rows(self,t):
+        
+        # SharedFrame of every row of class t. The rows update added are joined in
+        # here, when a description is learned from all the rows, not on each update.
+        if self.new_rows[t]:
+            data = pd.concat([self.shared[t].frame]+self.new_rows[t],ignore_index=True)
+            self.shared[t] = SharedFrame.from_frame(data)
+            self.new_rows[t] = []
+            self.zero, self.one = self.shared[0].frame, self.shared[1].frame
+            self.all = pd.concat([self.zero,self.one],ignore_index=True)
+        return self.shared[t]
        
     
-    def fit(self,epsilon=100,k=2):
+    def fit(self,epsilon=100,k=2,synth_path=None):
         
-        self.synth_path = "synthdata/bayes_k_{}_eps_{}.csv".format(k,epsilon)
-        self.t0file = 'synthdata/bayesdata_k_{}_eps_{}_tg_{}.csv'.format(k,epsilon,0)
-        self.t1file = 'synthdata/bayesdata_k_{}_eps_{}_tg_{}.csv'.format(k,epsilon,1)
+        # synth_path replaces the name made from the settings (Orchestrator gives each job its own)
+        self.synth_path = synth_path or table_path("synthdata/bayes_k_{}_eps_{}".format(k,epsilon))
+        self.description0 = 'bayes_temp/bayes_k_{}_eps_{}_tg_{}.csv'.format(k,epsilon,0)
+        self.description1 = 'bayes_temp/bayes_k_{}_eps_{}_tg_{}.csv'.format(k,epsilon,1)
+        self.epsilon, self.k = epsilon, k
+        self.bayes_counts = {}
+        self.updates = 0
        
         if os.path.isfile(self.synth_path) and not self.overwrite:
-            print("Generated Data Exists")
-            print("Loading saved copy :",)
-            self.synth = pd.read_csv(self.synth_path)
+            with stage('bayes','load_saved',path=self.synth_path) as ev:
+                self.synth = coerce(read_table(self.synth_path))
+                ev['rows'] = len(self.synth)
             return False
         
         else :
             
-            print("Generated data does not exist / overwrite method has been called")
-            print("Generating ....")
-     
-            #For T 0
-            self.describer0.describe_dataset_in_correlated_attribute_mode(
-            dataset_file = self.zero,
-            epsilon = epsilon,
-            k = k,
-            attribute_to_datatype = self.attribute_to_datatype,
-            attribute_to_is_categorical = self.attribute_is_categorical)
-            self.description0 = 'bayes_temp/bayes_k_{}_eps_{}_tg_{}.csv'.format(k,epsilon,0)
-            self.describer0.save_dataset_description_to_file(self.description0)
-
-            #For T 1
-            self.describer1.describe_dataset_in_correlated_attribute_mode(
-            dataset_file = self.one,
-            epsilon = epsilon,
-            k = k,
-            attribute_to_datatype = self.attribute_to_datatype,
-            attribute_to_is_categorical = self.attribute_is_categorical)
-            self.description1 = 'bayes_temp/bayes_k_{}_eps_{}_tg_{}.csv'.format(k,epsilon,1)
-            self.describer1.save_dataset_description_to_file(self.description1)
+            #For T 0 and T 1
+            with stage('bayes','fit',epsilon=epsilon,k=k), ProcessPoolExecutor(max_workers=2) as pool:
+                jobs = [pool.submit(describe_class,data,description,epsilon,k,
+                                    self.attribute_to_datatype,self.attribute_is_categorical)
+                        for data,description in [(self.class_rows(0),self.description0),(self.class_rows(1),self.description1)]]
+                for job in jobs:
+                    job.result()
             
             return True
         
         
-    def transform(self,onesamples=100,zerosamples=5):
+    def transform(self,onesamples=100,zerosamples=5,seed=0):
         
         self.onesamples = onesamples
         self.zerosamples = zerosamples
         
-        try :
-            
-            #For T 0 
-            self.generator0 = DataGenerator()
-            self.generator0.generate_dataset_in_correlated_attribute_mode(self.zerosamples ,self.description0)
-            self.generator0.save_synthetic_data(self.t0file)
-            
-            #For T 1
-            self.generator1 = DataGenerator()
-            self.generator1.generate_dataset_in_correlated_attribute_mode(self.onesamples ,self.description1)
-            self.generator1.save_synthetic_data(self.t1file)
-            
-            #joining dataframes
-            self.synth = pd.concat([pd.read_csv(self.t0file),pd.read_csv(self.t1file)])
-            self.synth = self.synth[features]
-           
-        except Exception as e:
-            
-            print("Error : Model Has to be fit before transformation.")
-            print(e)
+        #For T 0 and T 1, each class from its own stream of seed
+        with stage('bayes','sample',rows=self.zerosamples+self.onesamples):
+            self.synth = pd.concat([generate_class(self.zerosamples,self.description0,(seed,0)),
+                                    generate_class(self.onesamples,self.description1,(seed,1))],ignore_index=True)
         
                     
             
-    def fit_transform(self,epsilon=100,k=2,onesamples=100,zerosamples=5):
+    def sweep(self,epsilons,ks,onesamples=100,zerosamples=5,processes=None):
+        
+        # Every (epsilon, k) pair from one pass of non-private statistics per class,
+        # generation for all pairs then runs on a process pool
+        # Returns {(epsilon,k): synth_path}
+        if not hasattr(self,'stats'):
+            with stage('bayes','stats'):
+                self.stats = {t:BayesStats(self.class_rows(t).frame,self.attribute_to_datatype,self.attribute_is_categorical)
+                              for t in (0,1)}
+        
+        paths = {}
+        jobs = []
+        for epsilon, k in product(epsilons,ks):
+            synth_path = table_path("synthdata/bayes_k_{}_eps_{}".format(k,epsilon))
+            paths[(epsilon,k)] = synth_path
+            if os.path.isfile(synth_path) and not self.overwrite:
+                continue
+            files = []
+            for t, samples in [(0,zerosamples),(1,onesamples)]:
+                description = 'bayes_temp/bayes_k_{}_eps_{}_tg_{}.csv'.format(k,epsilon,t)
+                with stage('bayes','fit',epsilon=epsilon,k=k,stratum=t):
+                    self.stats[t].save_description(epsilon,k,description)
+                files.append((samples,description,(0,t)))
+            jobs.append((synth_path,files))
+        
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [[pool.submit(generate_class,*f) for f in files] for _,files in jobs]
+            for (synth_path,_), parts in zip(jobs,futures):
+                with stage('bayes','sample',path=synth_path):
+                    synth = pd.concat([p.result() for p in parts],ignore_index=True)
+                with stage('bayes','write',path=synth_path,rows=len(synth)):
+                    write_table(synth,synth_path)
+        
+        self.sweep_paths = paths
+        return paths
+    
+    def fit_conditional(self,epsilon=100,k=2,column='T'):
+        
+        # One network over all the rows, with column as its root, for sample_counts.
+        # Replaces the describer per class of T : one run that sees all the data.
+        self.joint = (epsilon,k,column)
+        self.joint_description = 'bayes_temp/bayes_k_{}_eps_{}_root_{}.csv'.format(k,epsilon,column)
+        if os.path.isfile(self.joint_description) and not self.overwrite:
+            return self.joint_description
+        with stage('bayes','fit',epsilon=epsilon,k=k,root=column):
+            self.class_rows(0), self.class_rows(1)
+            stats = BayesStats(self.all,self.attribute_to_datatype,self.attribute_is_categorical)
+            stats.save_description(epsilon,k,self.joint_description,root=column)
+        return self.joint_description
+    
+    def sample_counts(self,counts,processes=None,seed=0):
+        
+        # Exactly counts[value] rows per value of the root column of fit_conditional
+        # (e.g. {0:5607,1:50463} for T). Each value is generated from the description
+        # with the root pinned to it, in memory, so no row is rejected. processes
+        # generates the values in parallel.
+        from DataSynthesizer.lib.utils import read_json_file
+        epsilon, k, column = self.joint
+        description = read_json_file(self.joint_description)
+        files = [(n,pin_root(description,value),(seed,i)) for i,(value,n) in enumerate(counts.items()) if n > 0]
+        with stage('bayes','sample',rows=sum(n for n,_,_ in files),column=column):
+            if processes == 1 or len(files) < 2:
+                parts = [generate_class(*f) for f in files]
+            else:
+                with ProcessPoolExecutor(max_workers=processes) as pool:
+                    parts = list(pool.map(generate_class,*zip(*files)))
+            synth = pd.concat(parts,ignore_index=True)
+        synth['I'] = np.arange(len(synth),dtype=synth['I'].dtype)
+        return synth
+    
+    def update(self,new_data,drift_threshold=0.1,min_rows=200):
+        
+        # New real rows folded into the fitted descriptions without relearning the
+        # network : the conditional tables are redrawn from counts updated with the new
+        # rows of each class (BayesCounts), so the time taken follows the new rows.
+        # The structure of a class is learned again from all its rows (describe_class)
+        # when a value falls outside its description, or when min_rows rows have
+        # arrived since it was learned and a marginal of them has drifted by more than
+        # drift_threshold in total variation. Call transform to sample the update.
+        # Every update releases a new description at epsilon, written under its own
+        # name (_u_<update>), the privacy cost of the releases adds up.
+        from DataSynthesizer.lib.utils import read_json_file
+        with stage('bayes','load') as ev:
+            new = load_data(new_data) if isinstance(new_data,str) else coerce(new_data)
+            ev['rows'] = len(new)
+        descriptions = {0:self.description0,1:self.description1}
+        for t in (0,1):
+            rows = new[new[target] == t]
+            if len(rows) == 0:
+                continue
+            counts = self.bayes_counts.get(t)
+            if counts is None:
+                # The description was learned from every row of the class
+                with stage('bayes','stats',stratum=t):
+                    counts = self.bayes_counts[t] = BayesCounts(read_json_file(descriptions[t]),self.class_rows(t).frame)
+            codes = counts.encode(rows)
+            if codes is not None:
+                counts.add(codes)
+            # Kept aside, a later structure refit learns from them
+            self.new_rows[t].append(rows[self.all.columns])
+            descriptions[t] = 'bayes_temp/bayes_k_{}_eps_{}_tg_{}_u_{}.csv'.format(self.k,self.epsilon,t,self.updates+1)
+            if codes is None or (counts.since_structure() >= min_rows and counts.drift() > drift_threshold):
+                emit('bayes','refit',stratum=t,reason="outside description" if codes is None else "drift",
+                     drift=None if codes is None else round(float(counts.drift()),4))
+                with stage('bayes','fit',epsilon=self.epsilon,k=self.k,stratum=t):
+                    describe_class(self.class_rows(t).frame,descriptions[t],self.epsilon,self.k,
+                                   self.attribute_to_datatype,self.attribute_is_categorical)
+                self.bayes_counts[t] = None
+                continue
+            with stage('bayes','update',stratum=t,rows=len(rows),drift=round(float(counts.drift()),4)):
+                with open(descriptions[t],'w') as outfile:
+                    json.dump(counts.describe(self.epsilon,seed=self.updates+1),outfile,indent=4)
+        
+        self.description0, self.description1 = descriptions[0], descriptions[1]
+        self.updates += 1
+        tag = "_u_{}".format(self.updates)
+        self.synth_path = table_path("synthdata/bayes_k_{}_eps_{}{}".format(self.k,self.epsilon,tag))
+        return self
+    
+    def fit_transform(self,epsilon=100,k=2,onesamples=100,zerosamples=5,synth_path=None):
         
         #fitting
-        if self.fit(epsilon=100,k=2):
+        if self.fit(epsilon=epsilon,k=k,synth_path=synth_path):
             #transforming
-            self.transform(onesamples=100,zerosamples=5)
+            self.transform(onesamples=onesamples,zerosamples=zerosamples)
             
         if self.save:
-            self.synth.to_csv(self.synth_path)
+            with stage('bayes','write',path=self.synth_path,rows=len(self.synth)):
+                write_table(self.synth,self.synth_path)
                 
         return self.synth     
        
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "sdv,pandas,os"
+# ---------------------------------------------------------------------------
+""" Contains the base classes of the SDV backed generators (CtGan, TVae, GCopula) :
+data loading, the fitted model cache, batched and per class sampling, saving the
+synthetic table and folding in new real rows. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import os
+from DataIO import read_table, write_table, table_path
+from ModelCache import ModelCache
+from Sampling import iter_batches, iter_quota_batches, write_batches
+from Schema import features, sdv_constraints, sdv_field_types, transform_kinds, load_data, coerce, unseen_categories
+from Constraints import ConstraintEngine, ConstraintReport
+from Instrument import stage, emit
+from DataCache import datasets
+from Autotune import tune
+
+# Constraints to map Engineering of Features, defined in Schema. The SDV objects are
+# built on first use, importing this module does not load sdv. {repair : objects}
+constraints = {}
+# Vectorized repair of sampled rows against the same definitions
+engine = ConstraintEngine()
+
+
+# SDVBackend : everything but the model. A subclass sets name (events, cache keys and
+# the attribute holding the model : self.ctgan, self.tvae, self.gcopula) and gives
+#  - fit(...) : builds the model, sets self.key, self.tag, self.fit_args (the arguments
+#    of fit, a refit passes them again) and self.fitted = False
+#  - fit_info() : settings in the fit event and the cache entry
+#  - synth_name() : file name of the synthetic table made from the settings
+#  - warm_update(model,new,**settings) : folds new rows into the fitted model
+# EpochBackend adds the fit of the neural models trained epoch by epoch (Training.py)
+"""
+Usage Example :
+from Backend import SDVBackend
+
+class Copula(SDVBackend):
+    name = 'gcopula'
+    def fit(self): ...
+    def fit_info(self): return {}
+    def synth_name(self): return "synthdata/copula_s_{}{}".format(self.samples,self.tag)
+"""
+
+
+class SDVBackend:
+
+    name = None
+
+    def __init__(self,data_path,overwrite=False,save=True,cache=None,repair=False):
+
+        self.save = save
+        self.overwrite = overwrite
+        # repair False : the model learns every SDV constraint and rejects invalid rows,
+        # True : it still learns the multiple_of transform, rows breaking the inequalities
+        # are repaired after sampling (Constraints.py) instead of rejected
+        self.repair = repair
+        # cache=False fits from scratch every time
+        self.cache = ModelCache() if cache is None else cache
+
+        with stage(self.name,'load') as ev:
+            # A path is read once per process and shared read-only (DataCache.py)
+            if isinstance(data_path,str):
+                self.data = datasets.load(data_path)
+            else :
+                self.data = coerce(data_path)
+            ev['rows'] = len(self.data)
+
+    @property
+    def model(self):
+
+        return getattr(self,self.name)
+
+    @model.setter
+    def model(self,model):
+
+        setattr(self,self.name,model)
+
+    def model_constraints(self):
+
+        if self.repair not in constraints:
+            constraints[self.repair] = sdv_constraints(transform_kinds if self.repair else None)
+        return constraints[self.repair]
+
+    def repair_names(self):
+
+        return engine.names if self.repair else False
+
+    def fit_model(self):
+
+        # Fitted model from the cache when one matches the data and settings
+        with stage(self.name,'fit',**self.fit_info()) as ev:
+            if not self.cache:
+                self.model.fit(self.data)
+                return self.model
+            return self.cache.fit(self.key,self.model,self.data,{'model':self.name,**self.fit_info()})
+
+    def output_current(self):
+
+        return not self.cache or self.cache.output_matches(self.synth_path,self.key)
+
+    def fitted_model(self):
+
+        if not self.fitted:
+            self.model = self.fit_model()
+            self.fitted = True
+        return self.model
+
+    def iter_samples(self,samples,batch_size=10000):
+
+        # Generator of DataFrames of at most batch_size rows, memory stays flat in samples
+        # self.report holds the per constraint repair counts of the call
+        self.report = ConstraintReport(engine.names)
+        return iter_batches(self.fitted_model(),samples,batch_size,features,
+                            engine=engine if self.repair else None,report=self.report,component=self.name)
+
+    def iter_quota_samples(self,counts,column='T',batch_size=10000):
+
+        # Generator of DataFrames holding exactly counts[value] rows with column == value
+        # (e.g. {0:5607,1:50463} for T), all from the one fitted model (Sampling.py)
+        self.report = ConstraintReport(engine.names)
+        return iter_quota_batches(self.fitted_model(),counts,column,batch_size,features,
+                                  engine=engine if self.repair else None,report=self.report,component=self.name)
+
+    def sample_counts(self,counts,column='T',batch_size=10000):
+
+        return pd.concat(self.iter_quota_samples(counts,column,batch_size),ignore_index=True)
+
+    def sample_to_file(self,path,samples,batch_size=10000):
+
+        # Writes samples rows to path batch by batch, returns the number of rows written
+        return write_batches(self.iter_samples(samples,batch_size),path)
+
+    def transform(self,samples=56070,synth_path=None):
+
+        # synth_path replaces the name made from the settings (Orchestrator gives each job its own)
+        self.samples = samples
+        self.synth_path = synth_path or table_path(self.synth_name())
+        if os.path.isfile(self.synth_path) and not self.overwrite and self.output_current():
+            with stage(self.name,'load_saved',path=self.synth_path) as ev:
+                self.synth = coerce(read_table(self.synth_path))
+                ev['rows'] = len(self.synth)
+            return self.synth
+
+        self.synth = pd.concat(self.iter_samples(self.samples,max(self.samples,1)),ignore_index=True)
+        if self.save:
+            with stage(self.name,'write',path=self.synth_path,rows=len(self.synth)):
+                write_table(self.synth,self.synth_path)
+                if self.cache:
+                    self.cache.mark_output(self.synth_path,self.key)
+        return self.synth
+
+    def update(self,new_data,**settings):
+
+        # New real rows folded into the fitted model by warm_update, the time taken
+        # follows the new rows. Categories the model has never seen change its
+        # encoding, they trigger a full refit on all the data instead.
+        with stage(self.name,'load') as ev:
+            new = load_data(new_data) if isinstance(new_data,str) else coerce(new_data)
+            ev['rows'] = len(new)
+        unseen = unseen_categories(self.data,new)
+        if unseen:
+            self.data = pd.concat([self.data,new],ignore_index=True)
+            emit(self.name,'refit',reason="unseen categories",columns=sorted(unseen))
+            self.fit(**self.fit_args)
+            return self.fitted_model()
+
+        parent = self.key
+        model = self.fitted_model()
+        with stage(self.name,'update',rows=len(new),**settings):
+            self.warm_update(model,new,**settings)
+        self.data = pd.concat([self.data,new],ignore_index=True)
+        self.updates += 1
+        self.tag = self.tag.split("_u_")[0]+"_u_{}".format(self.updates)
+        # The updated model is keyed by its parent and the new rows only
+        if self.cache:
+            self.key = self.cache.key(self.name,new,{'update_of':parent,**settings})
+            self.cache.put(self.key,model,{'model':self.name,'update_of':parent,'rows':len(new)})
+        self.model = model
+        return model
+
+
+class EpochBackend(SDVBackend):
+
+    # A subclass gives build(**options), the sdv model made with the options
+
+    def fit(self,epochs=1,bs=10,patience=None,monitor='loss',min_delta=0.0,checkpoint_every=None):
+
+        self.fit_args = {'epochs':epochs,'bs':bs,'patience':patience,'monitor':monitor,'min_delta':min_delta,'checkpoint_every':checkpoint_every}
+        # bs='auto' trains on the CPU, with the torch threads and the batch size that gave
+        # the highest throughput in a short calibration (Autotune.py), kept in self.tuning
+        self.tuning = tune(self.name,self.data) if bs == 'auto' else None
+        if self.tuning:
+            bs = self.tuning['batch_size']
+        self.epochs = epochs
+        self.bs = bs
+        # patience stops training once the monitored value ('loss', or 'fidelity' of samples
+        # against a held out slice) has not improved for that many epochs, epochs is then
+        # the most that run. checkpoint_every saves the training state every that many
+        # epochs, a fit interrupted on the same data and settings resumes from it.
+        from Training import Trainer
+        self.trainer = Trainer(self.name,patience,monitor,min_delta,checkpoint_every=checkpoint_every)
+        # Checkpoints leave the fitted model unchanged, the other training settings do
+        # not (early stopping, and the held out slice of monitor='fidelity' even
+        # without patience), they go in the cache key and the file name
+        stopping = self.trainer.settings() if self.trainer.settings() != Trainer(self.name).settings() else None
+        self.tag = "_p_{}_{}".format(patience,monitor) if stopping else ""
+        with stage(self.name,'build',epochs=self.epochs,batch_size=self.bs,patience=patience):
+            self.model = self.build(primary_key='I',epochs=self.epochs,constraints=self.model_constraints(),batch_size=self.bs,
+                                    field_types=sdv_field_types,**({'cuda':False} if self.tuning else {}))
+            self.model.trainer = self.trainer
+            self.model.tuning = self.tuning
+            params = {'epochs':self.epochs,'batch_size':self.bs,'repair':self.repair_names(),'field_types':sdv_field_types}
+            if stopping:
+                params['stopping'] = stopping
+            self.key = self.cache.key(self.name,self.data,params,self.model_constraints()) if self.cache else None
+        self.fitted = False
+        self.updates = 0
+
+    def fit_info(self):
+
+        return {'epochs':self.epochs,'batch_size':self.bs}
+
+    def synth_name(self):
+
+        return "synthdata/{}_b_{}_e_{}_s_{}{}".format(self.name,self.bs,self.epochs,self.samples,self.tag)
+
+    def update(self,new_data,epochs=5,replay=1.0):
+
+        # Warm start on new real rows : the fitted model is fine-tuned for epochs epochs
+        # from its weights instead of retrained on the whole history (Training.py).
+        # replay rows are sampled from the model per new row and trained on with them.
+        return super().update(new_data,epochs=epochs,replay=replay)
+
+    def warm_update(self,model,new,epochs,replay):
+
+        model.update(new,epochs,replay)
+
+    def fit_transform(self,epochs=1,bs=10,samples=56070,synth_path=None,**training):
+
+        #fitting
+        self.fit(epochs,bs,**training)
+
+        #transforming
+        self.transform(samples,synth_path)
+        return self.synth
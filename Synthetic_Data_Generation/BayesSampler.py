@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pandas,numpy,json"
+# ---------------------------------------------------------------------------
+""" Contains an in-memory sampler for the Bayesian network descriptions written
+by DataSynthesizer's correlated attribute mode. Whole columns are drawn in
+topological order with vectorized inverse-CDF lookups, and returned as a typed
+DataFrame without temporary files. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import numpy as np
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+
+"""
+Usage Example :
+from BayesSampler import BayesSampler
+sampler = BayesSampler("bayes_temp/bayes_k_2_eps_1_tg_1.csv")
+synth = sampler.sample(1000000,seed=0)
+synths = sampler.sample_seeds(100000,seeds=range(8),processes=4)
+"""
+
+
+# Rows drawn from one random stream. A sample is cut into chunks of this size, chunk
+# i always draws from the i-th child of the seed, so the rows only depend on
+# (n, seed) and not on how many processes generate them
+chunk_rows = 1<<20
+
+
+# Tables with at most this many bins are scanned a bin at a time, wider ones searched
+scan_bins = 32
+
+
+def cumulative(p):
+
+    # Rows of probabilities as cumulative tables ending at exactly 1, stored one bin
+    # per row (bins x configurations) so each bin is contiguous for draw
+    cdf = np.cumsum(np.asarray(p,dtype=np.float64),axis=-1)
+    cdf /= cdf[:,-1:]
+    return np.ascontiguousarray(cdf.T)
+
+
+def draw(cdf,rows,u):
+
+    # Inverse CDF of configuration rows[j] at u[j] : the number of its cumulative
+    # values at or below u[j], so bins of probability 0 are never drawn. u is below
+    # 1 and the last cumulative value is 1.
+    width = len(cdf)
+    if width <= scan_bins:
+        index = np.zeros(len(u),dtype=np.intp)
+        for column in cdf[:-1]:
+            index += column.take(rows) <= u
+        return index
+    # Configuration r shifted by r, every configuration then searches one sorted array
+    shifted = (cdf.T+np.arange(cdf.shape[1])[:,None]).ravel()
+    return np.minimum(np.searchsorted(shifted,u+rows,side='right')-rows*width,width-1)
+
+
+class BayesSampler:
+
+    # Conditional tables of a description, one cumulative table per (child, parents)
+    # with a row per joint parent configuration, indexed like np.ravel_multi_index.
+    # Parent configurations the description has no distribution for fall back to
+    # the child's marginal, as DataGenerator does.
+
+    def __init__(self,description):
+
+        if isinstance(description,str):
+            with open(description) as f:
+                description = json.load(f)
+        self.description = description
+        self.meta = description['meta']
+        self.attributes = description['attribute_description']
+        for attr, info in self.attributes.items():
+            if info['data_type'] == 'SocialSecurityNumber':
+                raise ValueError("{} : SocialSecurityNumber attributes are not supported".format(attr))
+        self.columns = self.meta['all_attributes']
+        self.candidate_keys = set(self.meta['candidate_keys'])
+        self.bins = {a:len(info['distribution_bins']) for a,info in self.attributes.items()}
+
+        bn = description['bayesian_network']
+        conditional = description['conditional_probabilities']
+        self.order = []
+        self.tables = {}
+        if bn:
+            root = bn[0][1][0]
+            self.order.append((root,[]))
+            self.tables[root] = cumulative([conditional[root]])
+        for child, parents in bn:
+            dims = [self.bins[p] for p in parents]
+            p = np.tile(self.attributes[child]['distribution_probabilities'],(int(np.prod(dims)),1))
+            for config, dist in conditional[child].items():
+                p[np.ravel_multi_index(json.loads(config),dims)] = dist
+            self.order.append((child,parents))
+            self.tables[child] = cumulative(p)
+        # Attributes outside the network that are not candidate keys : independent marginals
+        self.independent = {a:cumulative([info['distribution_probabilities']]) for a,info in self.attributes.items()
+                            if a not in self.tables and a not in self.candidate_keys}
+
+    def encode(self,n,rng):
+
+        # Bin index of every network attribute, parents before children
+        codes = {}
+        for child, parents in self.order:
+            rows = np.ravel_multi_index([codes[p] for p in parents],[self.bins[p] for p in parents]) if parents else np.zeros(n,dtype=np.int64)
+            codes[child] = draw(self.tables[child],rows,rng.random(n))
+        for a, cdf in self.independent.items():
+            codes[a] = draw(cdf,np.zeros(n,dtype=np.int64),rng.random(n))
+        return codes
+
+    def values(self,attr,codes,rng,n,start=0,total=None):
+
+        # Column of values for bin indices codes, as DataGenerator maps them : the bin
+        # itself for categories, uniform within the bin otherwise (the last bin runs
+        # to max), integers rounded. Categories come back as a categorical column.
+        # Candidate keys number the rows start to start+n of a sample of total rows.
+        info = self.attributes[attr]
+        bins = info['distribution_bins']
+        if attr in self.candidate_keys:
+            index = np.arange(start,start+n)
+            if info['data_type'] == 'Float':
+                return info['min']+index*(info['max']-info['min'])/(total or n)
+            if info['data_type'] == 'String':
+                prefix = random_strings(rng,int(rng.integers(info['min'],info['max']+1)),1)[0]
+                return np.array([prefix+str(i) for i in index],dtype=object)
+            return index
+        if info['is_categorical']:
+            if info['data_type'] == 'String':
+                return pd.Categorical.from_codes(codes,categories=bins)
+            return np.asarray(bins)[codes]
+        edges = np.append(np.asarray(bins,dtype=np.float64),info['max'])
+        low, high = edges[codes], edges[codes+1]
+        x = low+(high-low)*rng.random(n)
+        if info['data_type'] == 'String':
+            return np.array([random_strings(rng,int(k),1)[0] for k in np.round(x)],dtype=object)
+        if info['data_type'] in ('Integer','DateTime'):
+            return np.round(x).astype(np.int64)
+        return x
+
+    def sample_chunk(self,n,seed,start=0,total=None):
+
+        rng = np.random.default_rng(seed)
+        codes = self.encode(n,rng)
+        return pd.DataFrame({a:self.values(a,codes.get(a),rng,n,start,total) for a in self.columns})
+
+    def sample(self,n,seed=0,processes=None):
+
+        # n rows from seed (an int or a sequence of ints). Chunks of chunk_rows rows
+        # are generated on processes worker processes when there is more than one
+        seeds = np.random.SeedSequence(seed).spawn(max(-(-n//chunk_rows),1))
+        sizes = [min(chunk_rows,n-i*chunk_rows) for i in range(len(seeds))]
+        starts = [i*chunk_rows for i in range(len(seeds))]
+        if len(seeds) == 1 or processes == 1:
+            parts = [self.sample_chunk(k,s,a,n) for k,s,a in zip(sizes,seeds,starts)]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                parts = list(pool.map(self.sample_chunk,sizes,seeds,starts,[n]*len(seeds)))
+        return pd.concat(parts,ignore_index=True) if len(parts) > 1 else parts[0]
+
+    def sample_seeds(self,n,seeds,processes=None):
+
+        # {seed : n rows} for every seed, the seeds generated in parallel
+        seeds = list(seeds)
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            return dict(zip(seeds,pool.map(self.sample,[n]*len(seeds),seeds,[1]*len(seeds))))
+
+
+def random_strings(rng,length,n):
+
+    # n random strings of ASCII letters of the given length
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    return np.array(["".join(w) for w in letters[rng.integers(0,len(letters),(n,max(length,0)))]],dtype=object)
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pandas,numpy"
+# ---------------------------------------------------------------------------
+""" Contains a vectorized engine that validates and repairs sampled batches
+against the constraint definitions in Schema, so rows meet the constraints
+by construction instead of being rejected and sampled again. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import numpy as np
+import operator
+from Schema import constraints
+
+
+"""
+Usage Example :
+from Constraints import ConstraintEngine, ConstraintReport
+engine = ConstraintEngine()
+report = ConstraintReport(engine.names)
+batch = engine.repair(batch,report)
+report.describe()
+"""
+
+
+operators = {'<':operator.lt,'<=':operator.le,'>':operator.gt,'>=':operator.ge}
+
+
+def constraint_name(c):
+
+    if c['kind'] == 'scalar_inequality':
+        return "{}{}{}".format(c['column'],c['relation'],c['value'])
+    if c['kind'] == 'inequality':
+        return "{}<={}".format(c['low'],c['high'])
+    if c['kind'] == 'multiple_of':
+        return "{}%{}|{}".format(c['column'],c['base'],c['exclusion_column'])
+    raise ValueError("Unknown constraint kind : {}".format(c['kind']))
+
+
+def constraint_columns(c):
+
+    # (columns a repair writes, columns it only reads)
+    if c['kind'] == 'scalar_inequality':
+        return {c['column']}, set()
+    if c['kind'] == 'inequality':
+        return {c['low']}, {c['high']}
+    if c['kind'] == 'multiple_of':
+        return {c['column']}, {c['exclusion_column']}
+    raise ValueError("Unknown constraint kind : {}".format(c['kind']))
+
+
+def repair_order(defs):
+
+    # Constraints that write a column run before the constraints reading it, so
+    # clipping E to C happens after C itself has been repaired. Ties keep the
+    # order of the definitions.
+    pending = list(defs)
+    ordered = []
+    while pending:
+        for c in pending:
+            blocked = any(constraint_columns(o)[0] & constraint_columns(c)[1] for o in pending if o is not c)
+            if not blocked:
+                break
+        else:
+            # Cyclic definitions, the final validation still rejects what is left
+            c = pending[0]
+        ordered.append(c)
+        pending.remove(c)
+    return ordered
+
+
+def bound_value(value,relation,dtype):
+
+    # Largest (or smallest) representable value meeting a strict relation
+    if relation in ('<=','>='):
+        return value
+    step = -1 if relation == '<' else 1
+    if np.issubdtype(dtype,np.integer):
+        return value+step
+    return np.nextafter(value,np.inf*step)
+
+
+def column_values(df,col):
+
+    x = df[col].to_numpy()
+    return x, np.isnan(x) if x.dtype.kind == 'f' else np.zeros(len(x),dtype=bool)
+
+
+def is_valid(c,df):
+
+    # Boolean mask of the rows meeting one constraint, missing values are valid as in SDV
+    if c['kind'] == 'scalar_inequality':
+        x, nan = column_values(df,c['column'])
+        return nan | operators[c['relation']](x,c['value'])
+    if c['kind'] == 'inequality':
+        low, low_nan = column_values(df,c['low'])
+        high, high_nan = column_values(df,c['high'])
+        return low_nan | high_nan | (high >= low)
+    if c['kind'] == 'multiple_of':
+        x, nan = column_values(df,c['column'])
+        excluded = df[c['exclusion_column']].to_numpy() == 0
+        return nan | excluded | ((x % c['base'] == 0) & (x > 0))
+    raise ValueError("Unknown constraint kind : {}".format(c['kind']))
+
+
+def repair_column(c,df,invalid):
+
+    # Repaired values of the column written by c, or None when nothing changes
+    if not invalid.any():
+        return None
+    if c['kind'] == 'scalar_inequality':
+        x = df[c['column']].to_numpy()
+        bound = bound_value(c['value'],c['relation'],x.dtype)
+        clip = np.minimum if c['relation'] in ('<','<=') else np.maximum
+        return c['column'], np.where(invalid,clip(x,bound),x).astype(x.dtype,copy=False)
+    if c['kind'] == 'inequality':
+        low = df[c['low']].to_numpy()
+        high = df[c['high']].to_numpy()
+        return c['low'], np.where(invalid,high,low).astype(low.dtype,copy=False)
+    if c['kind'] == 'multiple_of':
+        # Nearest positive multiple of base, values at or below 0 are left to be rejected
+        x = df[c['column']].to_numpy()
+        q = np.maximum(np.rint(x/c['base']),1)
+        return c['column'], np.where(invalid & (x > 0),q*c['base'],x).astype(x.dtype,copy=False)
+    raise ValueError("Unknown constraint kind : {}".format(c['kind']))
+
+
+class ConstraintReport:
+
+    # Per constraint counts over one sampling call. rows : rows checked,
+    # invalid : rows breaking the constraint as sampled, repaired : rows fixed
+    # by the engine, rejected : rows still invalid after repair and dropped
+
+    fields = ['rows','invalid','repaired','rejected']
+
+    def __init__(self,names):
+
+        self.names = list(names)
+        self.counts = {name:dict.fromkeys(self.fields,0) for name in self.names}
+
+    def add(self,name,**counts):
+
+        for field, n in counts.items():
+            self.counts[name][field] += int(n)
+
+    def merge(self,other):
+
+        for name in other.names:
+            if name not in self.counts:
+                self.names.append(name)
+                self.counts[name] = dict.fromkeys(self.fields,0)
+            self.add(name,**other.counts[name])
+        return self
+
+    def rates(self):
+
+        # Share of checked rows that were invalid, repaired and rejected
+        return {name:{f:(c[f]/c['rows'] if c['rows'] else 0.0) for f in self.fields[1:]}
+                for name,c in self.counts.items()}
+
+    def describe(self):
+
+        ds = pd.DataFrame(self.counts).T[self.fields]
+        rates = pd.DataFrame(self.rates()).T.add_suffix('_rate')
+        return pd.concat([ds,rates],axis=1)
+
+
+class ConstraintEngine:
+
+    def __init__(self,definitions=constraints):
+
+        self.constraints = repair_order(definitions)
+        self.names = [constraint_name(c) for c in self.constraints]
+
+    def applies(self,c,df):
+
+        written, read = constraint_columns(c)
+        return all(col in df.columns for col in written | read)
+
+    def validate(self,df):
+
+        # {constraint name: boolean mask of valid rows}
+        return {name:is_valid(c,df) for name,c in zip(self.names,self.constraints) if self.applies(c,df)}
+
+    def is_valid(self,df):
+
+        valid = np.ones(len(df),dtype=bool)
+        for mask in self.validate(df).values():
+            valid &= mask
+        return valid
+
+    def repair(self,df,report=None):
+
+        # Repairs df column by column (only the columns a constraint writes are
+        # replaced, rows are never copied unless some have to be dropped) and
+        # returns it without the rows that could not be repaired
+        before = {}
+        for name, c in zip(self.names,self.constraints):
+            if not self.applies(c,df):
+                continue
+            invalid = ~is_valid(c,df)
+            before[name] = invalid
+            repaired = repair_column(c,df,invalid)
+            if repaired is not None:
+                df[repaired[0]] = repaired[1]
+
+        # Later repairs can break earlier ones, a final pass catches those rows
+        after = self.validate(df)
+        keep = np.ones(len(df),dtype=bool)
+        for name, valid in after.items():
+            keep &= valid
+            if report is not None:
+                report.add(name,rows=len(df),invalid=before[name].sum(),
+                           repaired=(before[name] & valid).sum(),rejected=(~valid).sum())
+        if not keep.all():
+            df = df[keep]
+        return df
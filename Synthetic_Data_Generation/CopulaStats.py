@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "copulas,pandas,numpy"
+# ---------------------------------------------------------------------------
+""" Contains mergeable statistics of the table a Gaussian copula was fitted on,
+so its marginals and correlation can be updated with new rows without
+refitting on the whole history. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import numpy as np
+import sys
+from copulas import EPSILON
+from copulas.univariate import GaussianUnivariate, UniformUnivariate
+
+
+"""
+Usage Example :
+from CopulaStats import CopulaStats
+stats = CopulaStats(model._model,table)       # copulas GaussianMultivariate and its table
+stats.update(model._model,new_table)          # marginals and correlation now cover both
+"""
+
+
+class CopulaStats:
+
+    # Everything here merges by addition, so an update costs time in the new rows:
+    #  - count, mean, M2, min and max per column : exact Gaussian and uniform marginals
+    #  - a uniform reservoir of rows (the rows with the smallest random keys seen so
+    #    far) : refits the marginal families without closed form updates
+    #  - count, sum and cross products of the normal scores : the copula correlation.
+    #    Scores of earlier rows were taken under the marginals of their time.
+
+    def __init__(self,model,table,reservoir=20000,seed=0):
+
+        self.columns = list(model.columns)
+        self.size = reservoir
+        # Keys from their own stream, not the one make_data(seed) drew the rows from
+        self.rng = np.random.default_rng([seed,1])
+        k = len(self.columns)
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)
+        self.min = np.full(k,np.inf)
+        self.max = np.full(k,-np.inf)
+        self.rows = table[self.columns].iloc[:0]
+        self.keys = np.empty(0)
+        self.m = 0
+        self.s = np.zeros(k)
+        self.ss = np.zeros((k,k))
+        self.add(table)
+        self.add_scores(model,table)
+
+    def add(self,table):
+
+        x = table[self.columns].to_numpy(dtype=np.float64)
+        n = len(x)
+        if n == 0:
+            return
+        mean = x.mean(axis=0)
+        delta = mean-self.mean
+        total = self.n+n
+        self.mean = self.mean+delta*n/total
+        self.m2 = self.m2+((x-mean)**2).sum(axis=0)+delta**2*self.n*n/total
+        self.n = total
+        self.min = np.minimum(self.min,x.min(axis=0))
+        self.max = np.maximum(self.max,x.max(axis=0))
+        keys = np.concatenate([self.keys,self.rng.random(n)])
+        rows = pd.concat([self.rows,table[self.columns]],ignore_index=True)
+        keep = np.argsort(keys,kind='stable')[:self.size]
+        self.keys, self.rows = keys[keep], rows.iloc[keep].reset_index(drop=True)
+
+    def add_scores(self,model,table):
+
+        z = model._transform_to_normal(table[self.columns])
+        z = z[np.isfinite(z).all(axis=1)]
+        self.m += len(z)
+        self.s += z.sum(axis=0)
+        self.ss += z.T@z
+
+    def correlation(self):
+
+        # Same clean up as GaussianMultivariate._get_covariance
+        mean = self.s/max(self.m,1)
+        cov = self.ss/max(self.m,1)-np.outer(mean,mean)
+        sd = np.sqrt(np.clip(np.diag(cov),0,None))
+        with np.errstate(divide='ignore',invalid='ignore'):
+            corr = np.nan_to_num(cov/np.outer(sd,sd),nan=0.0)
+        np.fill_diagonal(corr,np.where(sd > 0,1.0,0.0))
+        if np.linalg.cond(corr) > 1.0/sys.float_info.epsilon:
+            corr = corr+np.identity(len(corr))*EPSILON
+        return pd.DataFrame(corr,index=self.columns,columns=self.columns)
+
+    def marginal(self,i,univariate):
+
+        # Gaussian and uniform marginals from the merged moments, every other family
+        # refitted on the reservoir, falling back to a Gaussian as copulas does
+        instance = getattr(univariate,'_instance',None) or univariate
+        if isinstance(instance,GaussianUnivariate):
+            fresh = GaussianUnivariate()
+            fresh._set_params({'loc':self.mean[i],'scale':np.sqrt(self.m2[i]/self.n)})
+        elif isinstance(instance,UniformUnivariate):
+            fresh = UniformUnivariate()
+            fresh._set_params({'loc':self.min[i],'scale':self.max[i]-self.min[i]})
+        else:
+            fresh = type(univariate)() if univariate is instance else univariate
+            try:
+                fresh.fit(self.rows[self.columns[i]].to_numpy())
+                return fresh
+            except Exception:
+                fresh = GaussianUnivariate()
+                fresh._set_params({'loc':self.mean[i],'scale':np.sqrt(self.m2[i]/self.n)})
+        fresh.fitted = True
+        if instance is not univariate:
+            univariate._instance = fresh
+            return univariate
+        return fresh
+
+    def update(self,model,table):
+
+        # Marginals first, then the new rows' scores under them, then the correlation
+        self.add(table)
+        model.univariates = [self.marginal(i,u) for i,u in enumerate(model.univariates)]
+        self.add_scores(model,table)
+        model.covariance = self.correlation()
+        return model
@@ -12,63 +12,30 @@
 
 
 import pandas as pd
-import os
-from sdv.tabular import CTGAN
-from sdv.constraints import create_custom_constraint
-from sdv.constraints import Inequality
-from sdv.constraints import FixedCombinations
-from sdv.constraints import ScalarInequality
-
-# Defining Constraints to map Engineering of Features
-
-# WC < C
-wc_constraint = Inequality(
-  low_column_name='WC',
-  high_column_name='C')
-
-# E < C
-e_constraint = Inequality(
-  low_column_name='E',
-  high_column_name='C')
-
-# C <= 19
-c_constraint = ScalarInequality(
-    column_name='C',
-    relation='<=',
-   value=19
-   )
- 
-# Actual C=0 when C<19
-def is_valid(column_names, data, exclusion_column):
-    column_name=column_names[0]
-    is_divisible = (data[column_name] % 19 == 0) & (data[column_name]!=0)
-    is_excluded = (data[exclusion_column] == 0)
-    #is_zero= data[column_name]!=0
-    return (is_divisible | is_excluded )
-def transform(column_names, data, exclusion_column):
-    column_name = column_names[0]
-    data[column_name] = data[column_name] / 19
-    return data
-def reverse_transform(column_names, transformed_data, exclusion_column):
-    column_name = column_names[0]
-    is_included = (transformed_data[exclusion_column] == 0)
-    rounded_data = transformed_data[is_included][column_name].round()
-    transformed_data.at[is_included, column_name] = rounded_data
-    transformed_data[column_name] *= 19
-    return transformed_data
- 
-    
-# Collating all the constraints 
-constraint_object = create_custom_constraint(is_valid_fn=is_valid,transform_fn=transform,
-                                             reverse_transform_fn=reverse_transform)
-ac_constraint = constraint_object(
-       column_names=['C'],
-    exclusion_column='AC')
+from DataIO import table_path
+from Stratified import Stratified
+from Schema import features, coerce
+from Backend import EpochBackend
+
+
+# sdv CTGAN fitted epoch by epoch when a Trainer is attached (Training.py). The class
+# is made on first use so sdv and torch load with the first fit, not on import, and
+# is found as a module attribute (pickled models) through __getattr__
+def epoch_model():
+
+    if 'EpochCTGAN' not in globals():
+        from sdv.tabular import CTGAN
+        from Training import EpochTraining
+        EpochCTGAN = type('EpochCTGAN',(EpochTraining,CTGAN),{'__module__':__name__})
+        globals()['EpochCTGAN'] = EpochCTGAN
+    return globals()['EpochCTGAN']
 
-constraints=[c_constraint,e_constraint,wc_constraint,ac_constraint]
 
-# Remove in Production when column names are not masked
-features = ['I','MT', 'IP', 'SNS', 'RL', 'OS', 'C','AC', 'WC', 'E','T']
+def __getattr__(name):
+
+    if name == 'EpochCTGAN':
+        return epoch_model()
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__,name))
 
 
 
@@ -85,114 +52,69 @@ ctgan = CtGan("Data/data.csv",overwrite=False,save=True)
 synth = ctgan.fit_transform(epochs=1,bs=10,samples=56070)
 synth
 
+CPU mode, threads and batch size from a short calibration :
+synth = ctgan.fit_transform(epochs=300,bs='auto',samples=56070)
+ctgan.tuning
+
+Early stopping and resumable checkpoints :
+synth = ctgan.fit_transform(epochs=300,bs=500,samples=56070,patience=10,monitor='fidelity',checkpoint_every=10)
+
+Exact rows per class of T from the one model, instead of one model per class (CtGan_ts) :
+ctgan.fit(epochs=300,bs=500)
+synth = ctgan.sample_counts({0:5607,1:50463})
+
 """
 
-class CtGan:
-    
-    def __init__(self,data_path,overwrite=False,save=True):
-        
-        self.save = save
-        self.overwrite = overwrite
-        
-        if isinstance(data_path,str):
-            self.data = pd.read_csv(data_path)
-            # Remove in Production when column names are not masked
-            self.data.columns=features
-        else :
-            self.data = data_path
-        
-    def fit(self,epochs=1,bs=10):
-     
-        self.epochs = epochs
-        self.bs = bs
-        self.ctgan = CTGAN(primary_key='I',epochs=self.epochs,constraints=constraints,batch_size=self.bs,verbose=True)
-          
-        
-    def transform(self,samples=56070):
-        
-        self.samples = samples
-        self.synth_path = "synthdata/ctgan_b_{}_e_{}_s_{}.csv".format(self.bs,self.epochs,self.samples)
-        try:
-            if os.path.isfile(self.synth_path) and not self.overwrite:
-                print("Generated Data Exists")
-                print("Loading saved copy :",)
-                self.synth = pd.read_csv(self.synth_path)
-                return self.synth
-            
-            else :
-                print("Generated data does not exist / overwrite method has been called")
-                print("Generating ....") 
-                self.ctgan.fit(self.data)
-                self.synth = self.ctgan.sample(num_rows=self.samples)
-                self.synth = self.synth[features]
-                if self.save:
-                    self.synth.to_csv(self.synth_path)
-                    
-                return self.synth
-
-        except Exception as e:
-            print("Error : Model Has to be fit before transformation.")
-            print(e)
-            
-    def fit_transform(self,epochs=1,bs=10,samples=56070):
-        
-        #fitting
-        self.fit(epochs,bs)
-        
-        #transforming
-        self.transform(samples)
-        return self.synth
+class CtGan(EpochBackend):
+
+    # Loading, caching, sampling, saving and updates in Backend.py, the model in self.ctgan
+    name = 'ctgan'
+
+    def build(self,**options):
+
+        return epoch_model()(verbose=True,**options)
     
         
+# Stratified CTGAN, one model per value of T trained and sampled in parallel
 class CtGan_ts:  
 
-    def __init__(self,data_path,overwrite=False,save=True):
+    def __init__(self,data_path,overwrite=False,save=True,processes=None,cache=None):
 
         self.save = save
         self.overwrite = overwrite
-        if isinstance(data_path,str):
-            self.data = pd.read_csv(data_path)
-            # Remove in Production when column names are not masked
-            self.data.columns=features
-        else :
-            self.data = data_path
+        self.strat = Stratified(CtGan,data_path,column='T',overwrite=overwrite,save=save,
+                                processes=processes,cache=cache,name='ctgan_ts')
+        self.data = self.strat.data
+        self.data0 = self.strat.parts[0]
+        self.data1 = self.strat.parts[1]
 
-        self.data0 = self.data[self.data["T"]==0]
-        self.data1 = self.data[self.data["T"]==1]
-        self.ctgan0 = CtGan(self.data0,self.overwrite,False)
-        self.ctgan1 = CtGan(self.data1,self.overwrite,False)
 
-
-
-    def fit(self,epochs=1,bs=10):
+    def fit(self,epochs=1,bs=10,**training):
         
+        # training : patience, monitor, min_delta, checkpoint_every as for CtGan.fit
         self.epochs = epochs
         self.bs = bs
-        self.ctgan0.fit(epochs,bs)
-        self.ctgan1.fit(epochs,bs)
+        stopping = training.get('patience') or training.get('monitor','loss') != 'loss'
+        self.tag = "_p_{}_{}".format(training.get('patience'),training.get('monitor','loss')) if stopping else ""
+        self.strat.fit(epochs=epochs,bs=bs,**training)
 
 
-    def transform(self,zerosamples=5607,onesamples=50463):
+    def transform(self,zerosamples=5607,onesamples=50463,synth_path=None):
         
         self.samples = zerosamples+onesamples
-        self.synth_path = "synthdata/ctgan_ts_b_{}_e_{}_s_{}.csv".format(self.bs,self.epochs,self.samples)
-        
-        self.ctgan0.transform(zerosamples)
-        self.ctgan1.transform(onesamples)
+        self.synth_path = synth_path or table_path("synthdata/ctgan_ts_b_{}_e_{}_s_{}{}".format(self.bs,self.epochs,self.samples,self.tag))
         
-        self.synth = pd.concat([self.ctgan0.synth,self.ctgan1.synth])
-        self.synth = self.synth[features]
-        if self.save:
-            self.synth.to_csv(self.synth_path)
+        self.synth = self.strat.transform({0:zerosamples,1:onesamples},synth_path=self.synth_path)
+        self.synth = coerce(self.synth[features])
             
         return self.synth
         
         
-    def fit_transform(self,epochs=1,bs=10,zerosamples=5607,onesamples=50463):
+    def fit_transform(self,epochs=1,bs=10,zerosamples=5607,onesamples=50463,synth_path=None,**training):
         
         #fitting
-        self.fit(epochs,bs)
+        self.fit(epochs,bs,**training)
         
         #transforming
-        self.transform(zerosamples=5607,onesamples=50463)
+        self.transform(zerosamples=zerosamples,onesamples=onesamples,synth_path=synth_path)
         return self.synth
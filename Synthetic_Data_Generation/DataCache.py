@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pandas,numpy,multiprocessing,os"
+# ---------------------------------------------------------------------------
+""" Contains the in-process cache of real datasets shared by the generators:
+each table is read once per path, modification time and schema, kept in shared
+memory, and handed out as read-only views that worker processes reach without
+copies. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import weakref
+from multiprocessing import shared_memory
+from Schema import schema, load_data, coerce
+from Instrument import stage
+
+# Frames over the read-only shared memory are handed out as views when pandas copies
+# them on the first change (copy-on-write, always on from pandas 3). Older pandas
+# writes in place, there every caller gets its own copy of the rows instead.
+shared_views = int(pd.__version__.split('.')[0]) >= 3
+
+
+"""
+Usage Example :
+from DataCache import datasets
+data = datasets.load("Data/data.csv")            # read once, later calls share it
+parts = datasets.split("Data/data.csv",'T')      # {0:SharedFrame, 1:SharedFrame}, computed once
+parts[1].frame                                   # rows with T == 1, a view
+pool.submit(fit_stratum,CtGan,parts[1],...)      # the worker attaches to the same memory
+datasets.info()
+"""
+
+
+# Columns are packed one after the other at this alignment in a block
+align = 64
+
+# Blocks of this process by name : created here, attached here, or inherited with a fork
+blocks = weakref.WeakValueDictionary()
+# Attachments of worker processes live as long as the process, with the frames over them
+attached = {}
+attached_views = {}
+# Blocks released while a view still maps them, closed at exit
+lingering = []
+
+
+def schema_digest():
+
+    return hashlib.sha256(json.dumps(schema,sort_keys=True).encode()).hexdigest()[:16]
+
+
+class Block:
+
+    # One shared memory segment. The process that created it unlinks it once no
+    # SharedFrame of this process uses it, worker processes only ever map it.
+
+    def __init__(self,shm,owner):
+
+        self.shm = shm
+        self.name = shm.name
+        if owner:
+            weakref.finalize(self,release_block,shm,os.getpid())
+        blocks[self.name] = self
+
+
+def release_block(shm,pid):
+
+    if os.getpid() != pid:
+        return
+    shm.unlink()
+    try:
+        shm.close()
+    except BufferError:
+        # A view handed out earlier still maps the segment
+        lingering.append(shm)
+
+
+def open_block(name):
+
+    if name in blocks:
+        return blocks[name]
+    try:
+        shm = shared_memory.SharedMemory(name=name,track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+    block = attached[name] = Block(shm,owner=False)
+    return block
+
+
+def column_layout(df):
+
+    # [(column, kind, dtype, offset, extra)] kind : 'array' (values in the block),
+    # 'categorical' (codes in the block, categories in extra), 'object' (values in extra)
+    layout, offset = [], 0
+    for c in df.columns:
+        col = df[c]
+        if isinstance(col.dtype,pd.CategoricalDtype):
+            values, kind, extra = col.array.codes, 'categorical', (col.cat.categories,col.cat.ordered)
+        elif isinstance(col.dtype,np.dtype) and col.dtype.kind in 'biufcmM':
+            values, kind, extra = col.to_numpy(), 'array', None
+        else:
+            layout.append((c,'object',None,None,col.to_numpy()))
+            continue
+        layout.append((c,kind,values.dtype.str,offset,extra))
+        offset += -(-values.nbytes//align)*align
+    return layout, offset
+
+
+def build_frame(block,layout,rows,start,stop):
+
+    columns = {}
+    for c, kind, dtype, offset, extra in layout:
+        if kind == 'object':
+            columns[c] = extra[start:stop]
+            continue
+        values = np.ndarray(rows,dtype=np.dtype(dtype),buffer=block.shm.buf,offset=offset)[start:stop]
+        values.flags.writeable = False
+        if kind == 'categorical':
+            categories, ordered = extra
+            values = pd.Categorical.from_codes(values,dtype=pd.CategoricalDtype(categories,ordered))
+        columns[c] = values
+    return pd.DataFrame(columns,index=pd.RangeIndex(start,stop),copy=False)
+
+
+def attach(name,layout,rows,start,stop):
+
+    # Unpickling a SharedFrame : a view of rows start:stop of the block
+    # of the process, handed out as SharedFrame.frame does
+    key = (name,start,stop)
+    if key not in attached_views:
+        attached_views[key] = build_frame(open_block(name),layout,rows,start,stop)
+    return attached_views[key].copy(deep=not shared_views)
+
+
+class SharedFrame:
+
+    # A DataFrame whose columns live in one shared memory block. frame is a read
+    # only view (see shared_views). Pickled, only
+    # the block name and the column layout are sent, and it unpickles in the
+    # other process as a DataFrame mapping the same memory.
+
+    def __init__(self,block,layout,rows,start=0,stop=None):
+
+        self.block = block
+        self.layout = layout
+        self.rows = rows
+        self.start = start
+        self.stop = rows if stop is None else stop
+        self.view = None
+
+    @classmethod
+    def from_frame(cls,df):
+
+        df = df.reset_index(drop=True)
+        layout, size = column_layout(df)
+        block = Block(shared_memory.SharedMemory(create=True,size=max(size,1)),owner=True)
+        for c, kind, dtype, offset, extra in layout:
+            if kind != 'object':
+                values = df[c].array.codes if kind == 'categorical' else df[c].to_numpy()
+                np.ndarray(len(df),dtype=np.dtype(dtype),buffer=block.shm.buf,offset=offset)[:] = values
+        return cls(block,layout,len(df))
+
+    @property
+    def frame(self):
+
+        if self.view is None:
+            self.view = build_frame(self.block,self.layout,self.rows,self.start,self.stop)
+        # A new DataFrame object per call, columns set by one caller stay with it.
+        # The view is kept : it is the reference that makes copy-on-write copy the
+        # rows before they are changed, a lone frame over them is written in place.
+        return self.view.copy(deep=not shared_views)
+
+    def part(self,start,stop):
+
+        return SharedFrame(self.block,self.layout,self.rows,self.start+start,self.start+stop)
+
+    def whole(self):
+
+        return SharedFrame(self.block,self.layout,self.rows)
+
+    def nbytes(self):
+
+        return self.block.shm.size
+
+    def __len__(self):
+
+        return self.stop-self.start
+
+    def __reduce__(self):
+
+        return (attach,(self.block.name,self.layout,self.rows,self.start,self.stop))
+
+
+def split_frame(df,column):
+
+    # {value : SharedFrame} of the rows of each value of column, as slices of one
+    # block holding the rows grouped by value (a stable sort keeps their order)
+    values = df[column].to_numpy()
+    if len(values) and not (values[1:] >= values[:-1]).all():
+        order = np.argsort(values,kind='stable')
+        df, values = df.iloc[order], values[order]
+    grouped = SharedFrame.from_frame(df)
+    strata, starts = np.unique(values,return_index=True)
+    stops = list(starts[1:])+[len(values)]
+    return {v:grouped.part(int(a),int(b)) for v,a,b in zip(strata.tolist(),starts,stops)}
+
+
+class DataCache:
+
+    # Real datasets of this process, keyed by path, modification time, size and schema.
+    # A changed file, or a change to Schema, is read again on the next use.
+
+    def __init__(self):
+
+        self.tables = {}
+        self.splits = {}
+
+    def key(self,path):
+
+        st = os.stat(path)
+        return (os.path.abspath(path),st.st_mtime_ns,st.st_size,schema_digest())
+
+    def shared(self,path):
+
+        key = self.key(path)
+        if key not in self.tables:
+            with stage('data','load',path=path) as ev:
+                self.drop(key)
+                self.tables[key] = SharedFrame.from_frame(load_data(path))
+                ev['rows'] = len(self.tables[key])
+        return self.tables[key]
+
+    def load(self,path):
+
+        # Read-only view of the data at path, coerced to the schema
+        return self.shared(path).frame
+
+    def split(self,data,column):
+
+        # {value : SharedFrame} for each value of column. For a path the split is
+        # computed once and shared by every caller, a DataFrame is split each call.
+        if not isinstance(data,str):
+            with stage('data','split',column=column) as ev:
+                parts = split_frame(coerce(data),column)
+                ev['strata'] = {str(v):len(p) for v,p in parts.items()}
+            return parts
+        key = self.key(data)
+        if (key,column) not in self.splits:
+            with stage('data','split',path=data,column=column) as ev:
+                self.drop(key)
+                # Rows grouped by column, the ungrouped table is only kept if already loaded
+                table = self.tables[key].frame if key in self.tables else load_data(data)
+                self.splits[(key,column)] = split_frame(table,column)
+                ev['strata'] = {str(v):len(p) for v,p in self.splits[(key,column)].items()}
+        return self.splits[(key,column)]
+
+    def drop(self,key):
+
+        # Entries of the same path under another version of the file or schema
+        stale = lambda k: k[0] == key[0] and k != key
+        for k in [k for k in self.splits if stale(k[0])]:
+            del self.splits[k]
+        for k in [k for k in self.tables if stale(k)]:
+            del self.tables[k]
+
+    def clear(self):
+
+        self.tables = {}
+        self.splits = {}
+
+    def info(self):
+
+        rows = [{'path':k[0],'column':None,'rows':len(t),'mb':t.nbytes()/1024**2} for k,t in self.tables.items()]
+        for (k,column), parts in self.splits.items():
+            first = next(iter(parts.values()))
+            rows.append({'path':k[0],'column':column,'rows':sum(len(p) for p in parts.values()),'mb':first.nbytes()/1024**2})
+        return pd.DataFrame(rows,columns=['path','column','rows','mb'])
+
+
+# The cache of this process, worker processes reach its blocks by name
+datasets = DataCache()
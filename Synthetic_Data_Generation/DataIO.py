@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pandas,pyarrow,os"
+# ---------------------------------------------------------------------------
+""" Contains the table storage layer shared by the generators and Noise.
+Tables are stored as uncompressed Arrow IPC (Feather) by default and read back
+through a memory map; Parquet and CSV are kept for interchange and export. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import hashlib
+import os
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+
+# Format used for generated tables, "feather", "parquet" or "csv"
+storage_format = "feather"
+
+extensions = {'feather':'.feather','arrow':'.feather','parquet':'.parquet','csv':'.csv'}
+
+# Rows per Arrow record batch. Writers always cut batches at this size, so a
+# table written in one call or appended chunk by chunk gives the same bytes
+batch_rows = 65536
+
+
+"""
+Usage Example :
+from DataIO import read_table, write_table, table_path
+path = table_path("synthdata/ctgan_b_10_e_1_s_56070")
+write_table(synth,path)
+synth = read_table(path)
+export_csv(path)
+"""
+
+
+def table_format(path):
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.feather','.arrow','.ipc'):
+        return 'feather'
+    if ext in ('.parquet','.pq'):
+        return 'parquet'
+    return 'csv'
+
+
+def table_path(stem,fmt=None):
+
+    return stem+extensions[fmt or storage_format]
+
+
+def drop_stray_index(df):
+
+    # CSVs written with to_csv's default index carry it back as "Unnamed: 0"
+    if len(df.columns) and str(df.columns[0]).startswith("Unnamed: 0"):
+        return df.drop(columns=df.columns[0])
+    return df
+
+
+def read_table(path,columns=None):
+
+    fmt = table_format(path)
+    if fmt == 'feather':
+        # Memory mapped, numeric columns without nulls are not copied
+        table = feather.read_table(path,columns=columns,memory_map=True)
+        return table.to_pandas(split_blocks=True)
+    if fmt == 'parquet':
+        return pd.read_parquet(path,columns=columns,memory_map=True)
+    df = drop_stray_index(pd.read_csv(path))
+    return df[columns] if columns is not None else df
+
+
+def iter_table(path,chunksize,start=0,stop=None):
+
+    # DataFrames of at most chunksize rows from rows start .. stop of a table
+    fmt = table_format(path)
+    if fmt == 'csv':
+        nrows = None if stop is None else stop-start
+        offset = start
+        for chunk in pd.read_csv(path,chunksize=chunksize,skiprows=range(1,start+1),nrows=nrows):
+            chunk = drop_stray_index(chunk)
+            chunk.index = pd.RangeIndex(offset,offset+len(chunk))
+            offset += len(chunk)
+            yield chunk
+        return
+    if fmt == 'feather':
+        table = feather.read_table(path,memory_map=True)
+    else:
+        table = pq.read_table(path,memory_map=True)
+    stop = table.num_rows if stop is None else min(stop,table.num_rows)
+    for offset in range(start,stop,chunksize):
+        chunk = table.slice(offset,min(chunksize,stop-offset)).to_pandas(split_blocks=True)
+        chunk.index = pd.RangeIndex(offset,offset+len(chunk))
+        yield chunk
+
+
+def table_rows(path):
+
+    fmt = table_format(path)
+    if fmt == 'feather':
+        return feather.read_table(path,memory_map=True).num_rows
+    if fmt == 'parquet':
+        return pq.ParquetFile(path).metadata.num_rows
+    return sum(len(chunk) for chunk in pd.read_csv(path,chunksize=batch_rows,usecols=[0]))
+
+
+def plain_table(table):
+
+    # Category columns become Arrow dictionaries whose dictionary differs from
+    # chunk to chunk, they are stored as plain values and re-coerced on load
+    fields = []
+    for field in table.schema:
+        if pa.types.is_dictionary(field.type):
+            field = field.with_type(field.type.value_type)
+        fields.append(field)
+    return table.cast(pa.schema(fields,metadata=table.schema.metadata))
+
+
+class TableWriter:
+
+    # Appends DataFrames to one table file without holding earlier chunks
+
+    def __init__(self,path):
+
+        self.path = path
+        self.fmt = table_format(path)
+        self.writer = None
+        self.pending = []
+        self.pending_rows = 0
+        self.rows = 0
+        self.schema = None
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self,*exc):
+
+        self.close()
+
+    def write(self,df):
+
+        df = df.reset_index(drop=True)
+        if self.fmt == 'csv':
+            df.to_csv(self.path,mode='w' if self.rows == 0 else 'a',header=self.rows == 0,index=False)
+            self.rows += len(df)
+            return
+        table = plain_table(pa.Table.from_pandas(df,preserve_index=False))
+        self.schema = self.schema or table.schema
+        if table.num_rows:
+            self.pending.append(table)
+        self.pending_rows += len(df)
+        self.rows += len(df)
+        if self.pending_rows >= batch_rows:
+            self.flush(final=False)
+
+    def flush(self,final):
+
+        if not self.pending:
+            return
+        table = pa.concat_tables(self.pending)
+        if self.writer is None:
+            if self.fmt == 'feather':
+                self.writer = pa.ipc.new_file(self.path,table.schema)
+            else:
+                self.writer = pq.ParquetWriter(self.path,table.schema)
+        whole = (table.num_rows//batch_rows)*batch_rows
+        cut = table.num_rows if final else whole
+        for offset in range(0,cut,batch_rows):
+            part = table.slice(offset,min(batch_rows,cut-offset))
+            if self.fmt == 'feather':
+                for batch in part.combine_chunks().to_batches():
+                    self.writer.write_batch(batch)
+            else:
+                self.writer.write_table(part,row_group_size=batch_rows)
+        rest = table.slice(cut)
+        self.pending = [rest] if rest.num_rows else []
+        self.pending_rows = rest.num_rows
+
+    def close(self):
+
+        if self.fmt != 'csv':
+            self.flush(final=True)
+            if self.writer is None and self.schema is not None:
+                # Only empty frames were written, still leave a table with the schema
+                self.writer = pa.ipc.new_file(self.path,self.schema) if self.fmt == 'feather' else pq.ParquetWriter(self.path,self.schema)
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
+
+
+def write_table(df,path):
+
+    with TableWriter(path) as writer:
+        writer.write(df)
+    return path
+
+
+def file_hash(path,block=1<<20):
+
+    # Content hash of a stored file, read in blocks
+    h = hashlib.sha256()
+    with open(path,'rb') as f:
+        for chunk in iter(lambda: f.read(block),b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def export_csv(path,csv_path=None):
+
+    # Streams a stored table out to CSV, returns the CSV path
+    csv_path = csv_path or os.path.splitext(path)[0]+".csv"
+    with TableWriter(csv_path) as writer:
+        for chunk in iter_table(path,batch_rows):
+            writer.write(chunk)
+    return csv_path
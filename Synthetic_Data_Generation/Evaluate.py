@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "sklearn,pandas,numpy,os"
+# ---------------------------------------------------------------------------
+""" Contains the train-synthetic-test-real (TSTR) benchmark: classifiers for T
+are trained on every generated dataset and scored on a held-out real split. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import tempfile
+import sklearn
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.metrics import accuracy_score, balanced_accuracy_score, f1_score, roc_auc_score
+from DataIO import read_table, write_table, extensions, file_hash
+from Schema import numeric, categorical, target, load_data, coerce
+from Instrument import emit
+
+
+"""
+Usage Example :
+from Evaluate import Evaluate
+ev = Evaluate("Data/data.csv",synth_dir="synthdata",classifiers=('logreg','rf'),repeats=3)
+results = ev.fit_transform()
+ev.summary()
+"""
+
+
+# Classifiers for T, seeded ones are trained once per repeat with random_state=seed
+classifiers = {
+    'logreg': (lambda seed: make_pipeline(StandardScaler(),LogisticRegression(max_iter=1000)), False),
+    'rf':     (lambda seed: RandomForestClassifier(n_estimators=100,n_jobs=1,random_state=seed), True),
+    'hgb':    (lambda seed: HistGradientBoostingClassifier(random_state=seed), True),
+}
+
+
+def discover(synth_dir="synthdata"):
+
+    # Every stored table under synth_dir, generators and Noise outputs alike.
+    # BAYES per class files (_tg_) are halves of a dataset and are skipped.
+    found = []
+    for root, _, files in os.walk(synth_dir):
+        for name in files:
+            if os.path.splitext(name)[1].lower() not in set(extensions.values()) or "_tg_" in name:
+                continue
+            found.append(os.path.join(root,name))
+    return sorted(found)
+
+
+def category_tables(df):
+
+    # Category order taken from the real data, so every dataset maps to the same columns
+    return {c:sorted(df[c].astype(str).unique()) for c in categorical}
+
+
+def encode_features(df,tables):
+
+    # Numeric columns as float32 followed by a one-hot block per categorical column,
+    # categories the real data never had encode to all zeros
+    blocks = [df[numeric].to_numpy(dtype=np.float32)]
+    for c in categorical:
+        codes = pd.Categorical(df[c].astype(str),categories=tables[c]).codes
+        onehot = np.zeros((len(df),len(tables[c])),dtype=np.float32)
+        seen = codes >= 0
+        onehot[np.flatnonzero(seen),codes[seen]] = 1
+        blocks.append(onehot)
+    return np.hstack(blocks)
+
+
+def score(model,X,y):
+
+    pred = model.predict(X)
+    out = {'accuracy':accuracy_score(y,pred),
+           'balanced_accuracy':balanced_accuracy_score(y,pred),
+           'f1':f1_score(y,pred,zero_division=0)}
+    try:
+        out['roc_auc'] = roc_auc_score(y,model.predict_proba(X)[:,1])
+    except (AttributeError,IndexError,ValueError):
+        out['roc_auc'] = np.nan
+    return out
+
+
+# Per-process state for the benchmark, the encoded real test split is sent once per worker
+EVAL_STATE = {}
+
+def init_eval_worker(state):
+
+    EVAL_STATE.clear()
+    EVAL_STATE.update(state)
+
+
+def evaluate_job(job):
+
+    path, clf, seed = job
+    st = EVAL_STATE
+    result = {'dataset':path,'classifier':clf,'seed':seed}
+    try:
+        if path == 'real':
+            X, y = st['X_train'], st['y_train']
+        else:
+            synth = coerce(read_table(path))
+            X, y = encode_features(synth,st['tables']), synth[target].to_numpy()
+        result['train_rows'] = int(len(y))
+        if len(np.unique(y)) < 2:
+            raise ValueError("training data has a single class of {}".format(target))
+        model = classifiers[clf][0](seed)
+        model.fit(X,y)
+        result.update(score(model,st['X_test'],st['y_test']))
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+class Evaluate:
+
+    # Results of each (dataset content, classifier, seed, real split) are cached as
+    # JSON in cache_dir, re-running after adding a configuration only evaluates the new one
+
+    def __init__(self,real_data_path,synth_dir="synthdata",test_size=0.3,seed=0,
+                 classifiers=('logreg','rf'),repeats=3,processes=None,cache_dir="eval_cache"):
+
+        self.real_data_path = real_data_path
+        self.synth_dir = synth_dir
+        self.test_size = test_size
+        self.seed = seed
+        self.classifiers = list(classifiers)
+        self.repeats = repeats
+        self.processes = processes
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir,exist_ok=True)
+
+    def fit(self):
+
+        # Real data preprocessing and the held-out split, computed once and shared
+        self.real = load_data(self.real_data_path)
+        train, test = train_test_split(self.real,test_size=self.test_size,random_state=self.seed,
+                                       stratify=self.real[target])
+        self.tables = category_tables(self.real)
+        self.state = {'tables':self.tables,
+                      'X_train':encode_features(train,self.tables),'y_train':train[target].to_numpy(),
+                      'X_test':encode_features(test,self.tables),'y_test':test[target].to_numpy()}
+        split = {'data':file_hash(self.real_data_path),'test_size':self.test_size,'seed':self.seed}
+        self.split_key = hashlib.sha256(json.dumps(split,sort_keys=True).encode()).hexdigest()
+
+    def result_key(self,content,clf,seed):
+
+        content = {'dataset':content,'classifier':clf,'seed':seed,'split':self.split_key,
+                   'sklearn':sklearn.__version__}
+        return hashlib.sha256(json.dumps(content,sort_keys=True).encode()).hexdigest()
+
+    def cached(self,key):
+
+        try:
+            with open(os.path.join(self.cache_dir,key+".json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def store(self,key,result):
+
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir,suffix=".tmp")
+        with os.fdopen(fd,'w') as f:
+            json.dump(result,f,default=float)
+        os.replace(tmp,os.path.join(self.cache_dir,key+".json"))
+
+    def jobs(self,paths):
+
+        jobs = []
+        for path in paths:
+            content = self.split_key if path == 'real' else file_hash(path)
+            for clf in self.classifiers:
+                seeded = classifiers[clf][1]
+                for seed in range(self.repeats if seeded else 1):
+                    jobs.append(((path,clf,seed),self.result_key(content,clf,seed)))
+        return jobs
+
+    def transform(self,paths=None,baseline=True):
+
+        # paths defaults to every dataset in synth_dir, baseline adds train-real-test-real rows
+        self.paths = list(paths) if paths is not None else discover(self.synth_dir)
+        jobs = self.jobs((['real'] if baseline else [])+self.paths)
+        results = {}
+        todo = []
+        for job, key in jobs:
+            hit = self.cached(key)
+            if hit is not None:
+                # The same content may sit under another name
+                results[key] = {**hit,'dataset':job[0]}
+            else:
+                todo.append((job,key))
+        emit('evaluate','jobs',todo=len(todo),jobs=len(jobs),cached=len(jobs)-len(todo))
+
+        if todo:
+            if self.processes == 1:
+                init_eval_worker(self.state)
+                done = [evaluate_job(job) for job,_ in todo]
+            else:
+                with ProcessPoolExecutor(max_workers=self.processes,initializer=init_eval_worker,initargs=(self.state,)) as pool:
+                    done = list(pool.map(evaluate_job,[job for job,_ in todo]))
+            for (_,key), result in zip(todo,done):
+                if 'error' not in result:
+                    self.store(key,result)
+                results[key] = result
+
+        self.results = pd.DataFrame([results[key] for _,key in jobs])
+        return self.results
+
+    def fit_transform(self,paths=None,baseline=True):
+
+        #fitting
+        self.fit()
+
+        #transforming
+        return self.transform(paths,baseline)
+
+    def summary(self):
+
+        # Mean and spread of each metric over the repeats of a dataset and classifier
+        metrics = [m for m in ['accuracy','balanced_accuracy','f1','roc_auc'] if m in self.results]
+        return self.results.groupby(['dataset','classifier'])[metrics].agg(['mean','std'])
+
+    def save(self,path="evaluation/tstr_results.csv"):
+
+        os.makedirs(os.path.dirname(path) or ".",exist_ok=True)
+        return write_table(self.results,path)
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pandas,numpy,os"
+# ---------------------------------------------------------------------------
+""" Contains the fidelity metrics comparing synthetic and real data through
+compact mergeable summaries: per column histograms, pairwise contingency
+tables and numeric co-moments, each built in one streaming pass. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import numpy as np
+import json
+import os
+from itertools import combinations
+from DataIO import iter_table, write_table, file_hash
+from Schema import schema, features, primary_key, load_data, coerce
+from Evaluate import discover
+
+
+"""
+Usage Example :
+from Fidelity import Fidelity
+fid = Fidelity("Data/data.csv",bins=32)
+results = fid.fit_transform(synth_dir="synthdata")
+fid.details["synthdata/ctgan_b_10_e_1_s_56070.feather"]['columns']
+"""
+
+
+class BinSpec:
+
+    # Shared binning of every feature, fixed by the real data so the real and
+    # synthetic summaries line up. Numeric columns use real quantiles as edges
+    # (integer columns with few values end up with one bin per value), the last
+    # code holds missing values. Categorical columns get one code per real
+    # category and a last code for unseen or missing values.
+
+    def __init__(self,real,bins=32):
+
+        self.bins = bins
+        self.columns = list(real.columns)
+        self.kinds = {}
+        self.edges = {}
+        self.tables = {}
+        for c in self.columns:
+            if schema[c]['dtype'] == 'category' or schema[c]['role'] == 'target':
+                self.kinds[c] = 'categorical'
+                self.tables[c] = sorted(pd.unique(real[c].dropna().astype(str)))
+            else:
+                self.kinds[c] = 'numeric'
+                x = real[c].dropna().to_numpy(dtype=np.float64)
+                self.edges[c] = np.unique(np.quantile(x,np.linspace(0,1,bins+1)[1:-1])) if len(x) else np.array([])
+        self.index()
+
+    def index(self):
+
+        self.sizes = {c:self.size(c) for c in self.columns}
+        self.numeric = [c for c in self.columns if self.kinds[c] == 'numeric' and c != primary_key]
+        self.pairs = list(combinations([c for c in self.columns if c != primary_key],2))
+
+    def size(self,c):
+
+        if self.kinds[c] == 'categorical':
+            return len(self.tables[c])+1
+        return len(self.edges[c])+2
+
+    def codes(self,df,c):
+
+        if self.kinds[c] == 'categorical':
+            col = df[c]
+            codes = pd.Index(self.tables[c]).get_indexer(col.astype(str).where(col.notna()))
+            return np.where(codes < 0,len(self.tables[c]),codes).astype(np.int64)
+        x = df[c].to_numpy(dtype=np.float64)
+        codes = np.searchsorted(self.edges[c],x,side='right')
+        codes[np.isnan(x)] = len(self.edges[c])+1
+        return codes
+
+    def to_dict(self):
+
+        return {'bins':self.bins,'columns':self.columns,'kinds':self.kinds,'tables':self.tables,
+                'edges':{c:e.tolist() for c,e in self.edges.items()}}
+
+    @classmethod
+    def from_dict(cls,d):
+
+        # The spec a saved summary was built with, without the real data
+        spec = cls.__new__(cls)
+        spec.bins, spec.columns, spec.kinds, spec.tables = d['bins'], d['columns'], d['kinds'], d['tables']
+        spec.edges = {c:np.array(e,dtype=np.float64) for c,e in d['edges'].items()}
+        spec.index()
+        return spec
+
+
+class Summary:
+
+    # Counts per column, contingency table per pair and co-moments (count, sums,
+    # cross products over complete rows) of the numeric columns. Summaries of
+    # separate chunks or files merge by addition.
+
+    def __init__(self,spec):
+
+        self.spec = spec
+        # Content hash of the data file summarised, when saved
+        self.data = None
+        self.n = 0
+        self.counts = {c:np.zeros(spec.sizes[c],dtype=np.int64) for c in spec.columns}
+        self.tables = {p:np.zeros((spec.sizes[p[0]],spec.sizes[p[1]]),dtype=np.int64) for p in spec.pairs}
+        k = len(spec.numeric)
+        self.m = 0
+        self.s = np.zeros(k)
+        self.xx = np.zeros((k,k))
+
+    def update(self,df):
+
+        codes = {c:self.spec.codes(df,c) for c in self.spec.columns}
+        for c in self.spec.columns:
+            self.counts[c] += np.bincount(codes[c],minlength=self.spec.sizes[c])
+        for a, b in self.spec.pairs:
+            kb = self.spec.sizes[b]
+            self.tables[(a,b)] += np.bincount(codes[a]*kb+codes[b],minlength=self.spec.sizes[a]*kb).reshape(-1,kb)
+        x = df[self.spec.numeric].to_numpy(dtype=np.float64)
+        x = x[~np.isnan(x).any(axis=1)]
+        self.m += len(x)
+        self.s += x.sum(axis=0)
+        self.xx += x.T@x
+        self.n += len(df)
+        return self
+
+    def merge(self,other):
+
+        for c in self.counts:
+            self.counts[c] += other.counts[c]
+        for p in self.tables:
+            self.tables[p] += other.tables[p]
+        self.m += other.m
+        self.s += other.s
+        self.xx += other.xx
+        self.n += other.n
+        return self
+
+    def correlation(self):
+
+        mean = self.s/max(self.m,1)
+        cov = self.xx/max(self.m,1)-np.outer(mean,mean)
+        sd = np.sqrt(np.clip(np.diag(cov),0,None))
+        with np.errstate(divide='ignore',invalid='ignore'):
+            corr = cov/np.outer(sd,sd)
+        return pd.DataFrame(corr,index=self.spec.numeric,columns=self.spec.numeric)
+
+    def save(self,path):
+
+        # The spec and the data hash are stored with the counts, a saved summary
+        # is used without reading the real data again
+        arrays = {'n':self.n,'m':self.m,'s':self.s,'xx':self.xx,
+                  'spec':json.dumps(self.spec.to_dict()),'data':json.dumps(self.data)}
+        arrays.update({'counts__'+c:v for c,v in self.counts.items()})
+        arrays.update({'tables__{}__{}'.format(*p):v for p,v in self.tables.items()})
+        # Through a file object, np.savez would add .npz to the path
+        with open(path,'wb') as f:
+            np.savez(f,**arrays)
+
+    @classmethod
+    def load(cls,path):
+
+        with np.load(path) as f:
+            stats = cls(BinSpec.from_dict(json.loads(str(f['spec']))))
+            spec = stats.spec
+            stats.data = json.loads(str(f['data']))
+            stats.n, stats.m, stats.s, stats.xx = int(f['n']), int(f['m']), f['s'], f['xx']
+            stats.counts = {c:f['counts__'+c] for c in spec.columns}
+            stats.tables = {p:f['tables__{}__{}'.format(*p)] for p in spec.pairs}
+        return stats
+
+
+def cramers_v(table):
+
+    # Bias is not corrected, real and synthetic tables are compared on equal footing
+    table = table[table.sum(axis=1) > 0][:,table.sum(axis=0) > 0]
+    n = table.sum()
+    if n == 0 or min(table.shape) < 2:
+        return 0.0
+    expected = np.outer(table.sum(axis=1),table.sum(axis=0))/n
+    chi2 = ((table-expected)**2/expected).sum()
+    return float(np.sqrt(chi2/n/(min(table.shape)-1)))
+
+
+def column_metrics(real,synth):
+
+    rows = []
+    for c in real.spec.columns:
+        p = real.counts[c]/max(real.n,1)
+        q = synth.counts[c]/max(synth.n,1)
+        row = {'column':c,'kind':real.spec.kinds[c],'tvd':0.5*np.abs(p-q).sum()}
+        # KS at the bin edges, exact for columns with one bin per value
+        row['ks'] = float(np.abs(np.cumsum(p)-np.cumsum(q)).max()) if real.spec.kinds[c] == 'numeric' else np.nan
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def pair_metrics(real,synth):
+
+    rc, sc = real.correlation(), synth.correlation()
+    rows = []
+    for a, b in real.spec.pairs:
+        if a in rc.index and b in rc.index:
+            kind, r, s = 'pearson', rc.loc[a,b], sc.loc[a,b]
+        else:
+            kind, r, s = 'cramers_v', cramers_v(real.tables[(a,b)]), cramers_v(synth.tables[(a,b)])
+        p = real.tables[(a,b)]/max(real.n,1)
+        q = synth.tables[(a,b)]/max(synth.n,1)
+        rows.append({'pair':"{}:{}".format(a,b),'measure':kind,'real':r,'synth':s,
+                     'difference':abs(r-s),'joint_tvd':0.5*np.abs(p-q).sum()})
+    return pd.DataFrame(rows)
+
+
+def summarise(path,spec,chunksize):
+
+    stats = Summary(spec)
+    for chunk in iter_table(path,chunksize):
+        stats.update(coerce(chunk[spec.columns]))
+    return stats
+
+
+class Fidelity:
+
+    def __init__(self,real_data_path,bins=32,chunksize=65536,summary_path=None):
+
+        self.real_data_path = real_data_path
+        self.bins = bins
+        self.chunksize = chunksize
+        # summary_path reuses the real summary when the file holds one of the same data
+        # file and bins, saves it otherwise
+        self.summary_path = summary_path
+
+    def fit(self):
+
+        # Bins are fixed from the real data, then the real summary is built once.
+        # A matching saved summary is loaded instead, the real data is then not read.
+        data_hash = file_hash(self.real_data_path) if self.summary_path else None
+        if self.summary_path and os.path.isfile(self.summary_path):
+            try:
+                saved = Summary.load(self.summary_path)
+            except KeyError:
+                # Saved without its spec and data hash
+                saved = None
+            if saved is not None and saved.data == data_hash and saved.spec.bins == self.bins:
+                self.real, self.spec = saved, saved.spec
+                return
+        real = load_data(self.real_data_path)
+        self.spec = BinSpec(real[features],self.bins)
+        self.real = Summary(self.spec).update(real[features])
+        if self.summary_path:
+            self.real.data = data_hash
+            self.real.save(self.summary_path)
+
+    def transform(self,paths=None,synth_dir="synthdata"):
+
+        # One streaming pass per dataset, all metrics come from the summaries
+        self.paths = list(paths) if paths is not None else discover(synth_dir)
+        self.details = {}
+        results = []
+        for path in self.paths:
+            synth = summarise(path,self.spec,self.chunksize)
+            cols, pairs = column_metrics(self.real,synth), pair_metrics(self.real,synth)
+            self.details[path] = {'columns':cols,'pairs':pairs}
+            # The id column is reported in the details but left out of the averages
+            marg = cols[cols['column'] != primary_key]
+            results.append({'dataset':path,'rows':synth.n,
+                            'tvd_mean':marg['tvd'].mean(),'ks_mean':marg['ks'].mean(),
+                            'ks_max':marg['ks'].max(),'association_diff_mean':pairs['difference'].mean(),
+                            'joint_tvd_mean':pairs['joint_tvd'].mean()})
+        self.results = pd.DataFrame(results)
+        return self.results
+
+    def fit_transform(self,paths=None,synth_dir="synthdata"):
+
+        #fitting
+        self.fit()
+
+        #transforming
+        return self.transform(paths,synth_dir)
+
+    def save(self,path="evaluation/fidelity_results.csv"):
+
+        os.makedirs(os.path.dirname(path) or ".",exist_ok=True)
+        return write_table(self.results,path)
@@ -11,65 +11,8 @@
 # ---------------------------------------------------------------------------
 
 
-import pandas as pd
-import os
-from sdv.tabular import GaussianCopula
-from sdv.constraints import create_custom_constraint
-from sdv.constraints import Inequality
-from sdv.constraints import FixedCombinations
-from sdv.constraints import ScalarInequality
-
-
-# Defining Constraints to map Engineering of Features
-
-# WC < C
-wc_constraint = Inequality(
-  low_column_name='WC',
-  high_column_name='C')
-
-# E < C
-e_constraint = Inequality(
-  low_column_name='E',
-  high_column_name='C')
-
-# C <= 19
-c_constraint = ScalarInequality(
-    column_name='C',
-    relation='<=',
-   value=19
-   )
- 
-# Actual C=0 when C <19
-def is_valid(column_names, data, exclusion_column):
-    column_name=column_names[0]
-    is_divisible = (data[column_name] % 19 == 0) & (data[column_name]!=0)
-    is_excluded = (data[exclusion_column] == 0)
-    #is_zero= data[column_name]!=0
-    return (is_divisible | is_excluded )
-def transform(column_names, data, exclusion_column):
-    column_name = column_names[0]
-    data[column_name] = data[column_name] / 19
-    return data
-def reverse_transform(column_names, transformed_data, exclusion_column):
-    column_name = column_names[0]
-    is_included = (transformed_data[exclusion_column] == 0)
-    rounded_data = transformed_data[is_included][column_name].round()
-    transformed_data.at[is_included, column_name] = rounded_data
-    transformed_data[column_name] *= 19
-    return transformed_data
- 
-    
-# Collating all the constraints 
-constraint_object = create_custom_constraint(is_valid_fn=is_valid,transform_fn=transform,
-                                             reverse_transform_fn=reverse_transform)
-ac_constraint = constraint_object(
-       column_names=['C'],
-    exclusion_column='AC')
-
-constraints=[c_constraint,e_constraint,wc_constraint,ac_constraint]
-
-# Remove in Production when column names are not masked
-features = ['I','MT', 'IP', 'SNS', 'RL', 'OS', 'C','AC', 'WC', 'E','T']
+from Instrument import stage
+from Backend import SDVBackend
 
 
 
@@ -88,61 +31,51 @@ synth
 """
 fd_0 = {'MT':'gamma', 'C':'beta'}
 
-class GCopula:
+class GCopula(SDVBackend):
     
-    def __init__(self,data_path,overwrite=False,save=True):
-        
-        self.save = save
-        self.overwrite = overwrite
-        
-        if isinstance(data_path,str):
-            self.data = pd.read_csv(data_path)
-            # Remove in Production when column names are not masked
-            self.data.columns=features
-        else :
-            self.data = data_path
+    # Loading, caching, sampling, saving and updates in Backend.py, the model in self.gcopula
+    name = 'gcopula'
         
     def fit(self,fd=None):
         
         if fd == None:
             fd = fd_0
-        self.gcopula = GaussianCopula(primary_key='I', constraints=constraints, field_distributions=fd)
-        self.synth_path = "synthdata/gcopula__{}__.csv".format(fd)
-          
-        
-    def transform(self,samples=56070):
+        self.fd = fd
+        self.fit_args = {'fd':fd}
+        self.tag = ""
+        self.updates = 0
+        with stage('gcopula','build',field_distributions=str(fd)):
+            from sdv.tabular import GaussianCopula
+            self.gcopula = GaussianCopula(primary_key='I', constraints=self.model_constraints(), field_distributions=fd)
+            self.key = self.cache.key('gcopula',self.data,{'field_distributions':fd,'repair':self.repair_names()},self.model_constraints()) if self.cache else None
+        self.fitted = False
+    
+    def fit_info(self):
         
-        self.samples = samples
+        return {'field_distributions':self.fd}
+    
+    def synth_name(self):
         
-        try:
-            if os.path.isfile(self.synth_path) and not self.overwrite:
-                print("Generated Data Exists")
-                print("Loading saved copy :",)
-                self.synth = pd.read_csv(self.synth_path)
-                return self.synth
+        return "synthdata/gcopula__{}__s_{}{}".format(self.fd,self.samples,self.tag)
             
-            else :
-                print("Generated data does not exist / overwrite method has been called")
-                print("Generating ....") 
-                self.gcopula.fit(self.data)
-                self.synth = self.gcopula.sample(num_rows=self.samples)
-                self.synth = self.synth[features]
-                if self.save:
-                    self.synth.to_csv(self.synth_path)
-                return self.synth
-
-        except Exception as e:
-            print("Error : Model Has to be fit before transformation.")
-            print(e)
+    def warm_update(self,model,new):
+        
+        # New real rows folded into the fitted copula without refitting on the whole
+        # history : mergeable statistics of the table (CopulaStats.py) give the updated
+        # marginals and correlation. They are kept on the model and built from the data
+        # it was fitted on at the first update.
+        from CopulaStats import CopulaStats
+        if getattr(model,'copula_stats',None) is None:
+            model.copula_stats = CopulaStats(model._model,model._metadata.transform(self.data))
+        model.copula_stats.update(model._model,model._metadata.transform(new))
+        model._num_rows += len(new)
             
-    def fit_transform(self,samples=56070,fd=None):
+    def fit_transform(self,samples=56070,fd=None,synth_path=None):
         
         #fitting
         self.fit(fd)
         
         #transforming
-        self.transform(samples)
+        self.transform(samples,synth_path)
         
         return self.synth
-        
-           
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "logging,json,os"
+# ---------------------------------------------------------------------------
+""" Contains the instrumentation shared by the generators and Noise: every stage
+(load, split, build, fit, sample, constraints, write) emits a structured event
+with its duration and memory to pluggable sinks, with optional cProfile and
+tracemalloc per stage. """
+# ---------------------------------------------------------------------------
+
+
+import json
+import logging
+import os
+import resource
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+"""
+Usage Example :
+from Instrument import MemorySink, add_sink, configure
+events = add_sink(MemorySink())
+configure(profile=['fit'],tracemalloc=['sample'],profile_dir="profiles")
+ctgan = CtGan("Data/data.csv").fit_transform(epochs=1,bs=10,samples=100)
+events.frame()
+
+Without code edits, from the environment (also reaches worker processes) :
+SYNTH_EVENTS=events.jsonl SYNTH_PROFILE=fit,sample SYNTH_TRACEMALLOC=all python run.py
+"""
+
+
+run_id = uuid.uuid4().hex[:12]
+logger = logging.getLogger("synthgen")
+
+
+def rss_mb():
+
+    # Current resident set size, None where /proc is not available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1])*os.sysconf('SC_PAGE_SIZE')/1024**2
+    except (OSError,ValueError,IndexError):
+        return None
+
+
+def peak_rss_mb():
+
+    # High-water mark of the process (ru_maxrss is in KB on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+
+class LoggerSink:
+
+    # One log line per event on the "synthgen" logger. When logging has not been
+    # set up at all the lines still reach the console, as the old prints did.
+
+    def __init__(self,logger=logger,level=logging.INFO):
+
+        self.logger = logger
+        self.level = level
+        if not self.logger.handlers and not logging.getLogger().handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+
+    def __call__(self,event):
+
+        level = logging.ERROR if event.get('status') == 'error' else self.level
+        detail = " ".join("{}={}".format(k,v) for k,v in event.items()
+                          if k not in ('component','stage','seconds','status','run','pid','time','peak_rss_mb','rss_mb','rss_delta_mb','peak_growth_mb'))
+        self.logger.log(level,"[%s] %s %s %.3fs %s",event['component'],event['stage'],event['status'],
+                        event.get('seconds') or 0.0,detail)
+
+
+class JsonlSink:
+
+    # Appends one JSON object per line, safe to share between processes
+    # since every event is a single append
+
+    def __init__(self,path):
+
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".",exist_ok=True)
+
+    def __call__(self,event):
+
+        line = json.dumps(event,default=str)+"\n"
+        with self.lock, open(self.path,'a') as f:
+            f.write(line)
+
+
+class MemorySink:
+
+    # Keeps events in a list, for tests and notebooks
+
+    def __init__(self):
+
+        self.events = []
+
+    def __call__(self,event):
+
+        self.events.append(event)
+
+    def stages(self,component=None):
+
+        return [e['stage'] for e in self.events if component is None or e['component'] == component]
+
+    def frame(self):
+
+        import pandas as pd
+        return pd.DataFrame(self.events)
+
+
+sinks = [LoggerSink()]
+settings = {'profile':set(),'tracemalloc':set(),'profile_dir':"profiles"}
+
+
+def add_sink(sink):
+
+    sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+
+    if sink in sinks:
+        sinks.remove(sink)
+
+
+def configure(profile=None,tracemalloc=None,profile_dir=None):
+
+    # profile / tracemalloc : stage names (or "component.stage", or "all") to run
+    # under cProfile / tracemalloc. Profiles go to profile_dir as .prof files.
+    if profile is not None:
+        settings['profile'] = set(profile)
+    if tracemalloc is not None:
+        settings['tracemalloc'] = set(tracemalloc)
+    if profile_dir is not None:
+        settings['profile_dir'] = profile_dir
+
+
+def configure_from_env():
+
+    split = lambda v: [s.strip() for s in v.split(",") if s.strip()]
+    if os.environ.get("SYNTH_EVENTS"):
+        add_sink(JsonlSink(os.environ["SYNTH_EVENTS"]))
+    configure(profile=split(os.environ.get("SYNTH_PROFILE","")),
+              tracemalloc=split(os.environ.get("SYNTH_TRACEMALLOC","")),
+              profile_dir=os.environ.get("SYNTH_PROFILE_DIR"))
+
+
+def selected(names,component,name):
+
+    return 'all' in names or name in names or "{}.{}".format(component,name) in names
+
+
+def emit(component,name,**fields):
+
+    event = {'run':run_id,'pid':os.getpid(),'time':time.time(),'component':component,
+             'stage':name,'status':'ok',**fields}
+    for sink in list(sinks):
+        try:
+            sink(event)
+        except Exception as e:
+            # A failing sink must not stop a generator
+            logger.warning("Event sink %r failed: %s",sink,e)
+    return event
+
+
+@contextmanager
+def stage(component,name,**fields):
+
+    # Times the block and emits one event for it. The yielded dict can be filled
+    # in by the block (rows, cache hits, ...) and is merged into the event. A
+    # failure is emitted with status "error" and raised again.
+    extra = dict(fields)
+    profiler = None
+    traced = selected(settings['tracemalloc'],component,name)
+    if traced:
+        import tracemalloc
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+    if selected(settings['profile'],component,name):
+        import cProfile
+        profiler = cProfile.Profile()
+    rss0, peak0, t = rss_mb(), peak_rss_mb(), time.perf_counter()
+    status, error = 'ok', None
+    if profiler:
+        profiler.enable()
+    try:
+        yield extra
+    except BaseException as e:
+        status, error = 'error', "{}: {}".format(type(e).__name__,e)
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+        seconds = time.perf_counter()-t
+        rss1, peak1 = rss_mb(), peak_rss_mb()
+        extra.update({'seconds':seconds,'rss_mb':rss1,'peak_rss_mb':peak1,
+                      'rss_delta_mb':None if rss0 is None or rss1 is None else rss1-rss0,
+                      'peak_growth_mb':peak1-peak0})
+        if traced:
+            extra['traced_peak_mb'] = tracemalloc.get_traced_memory()[1]/1024**2
+            if started_tracing:
+                tracemalloc.stop()
+        if profiler:
+            os.makedirs(settings['profile_dir'],exist_ok=True)
+            path = os.path.join(settings['profile_dir'],"{}_{}_{}_{}.prof".format(component,name,os.getpid(),int(time.time()*1000)))
+            profiler.dump_stats(path)
+            extra['profile'] = path
+        extra['status'] = status
+        if error:
+            extra['error'] = error
+        emit(component,name,**extra)
+
+
+configure_from_env()
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pandas,cloudpickle,os"
+# ---------------------------------------------------------------------------
+""" Contains a content addressed on-disk cache for fitted generator models. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import hashlib
+import json
+import os
+import pickle as stdpickle
+import tempfile
+import time
+from importlib import metadata
+from Instrument import emit
+
+try:
+    import cloudpickle as pickle
+except ImportError:
+    import pickle
+
+
+# Libraries whose version changes the fitted model or the way it is pickled
+tracked_packages = ['sdv','ctgan','copulas','rdt','torch','pandas','numpy','DataSynthesizer']
+
+
+def package_versions():
+
+    versions = {}
+    for lib in tracked_packages:
+        try:
+            versions[lib] = metadata.version(lib)
+        except metadata.PackageNotFoundError:
+            versions[lib] = None
+    return versions
+
+
+def data_fingerprint(data):
+
+    h = hashlib.sha256()
+    h.update(json.dumps([[str(c),str(t)] for c,t in data.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(data,index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def function_fingerprint(fn):
+
+    code = fn.__code__
+    return [code.co_code.hex(),[repr(c) for c in code.co_consts if not hasattr(c,'co_code')]]
+
+
+def constraint_fingerprint(constraint):
+
+    # Constructor arguments plus the bytecode of any functions the constraint
+    # class closes over, so editing a custom constraint changes the key
+    try:
+        d = constraint.to_dict()
+    except Exception:
+        d = {'constraint':type(constraint).__qualname__,**vars(constraint)}
+    fns = []
+    for attr in ('is_valid','transform','reverse_transform'):
+        method = getattr(type(constraint),attr,None)
+        for cell in getattr(method,'__closure__',None) or ():
+            if callable(cell.cell_contents) and hasattr(cell.cell_contents,'__code__'):
+                fns.append(function_fingerprint(cell.cell_contents))
+    return {'definition':d,'functions':fns}
+
+
+class ModelCache:
+
+    # Fitted models are pickled to <cache_dir>/<key>.pkl with a small <key>.json
+    # record next to it. Files are written to a temporary name and renamed, so
+    # concurrent sweeps sharing a directory never see a partial model. Once the
+    # directory holds more than max_bytes the least recently used models go first.
+
+    def __init__(self,cache_dir="model_cache",max_bytes=2*1024**3):
+
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir,exist_ok=True)
+
+    def key(self,kind,data,params,constraints=()):
+
+        content = {'kind':kind,
+                   'data':data_fingerprint(data),
+                   'params':params,
+                   'constraints':[constraint_fingerprint(c) for c in constraints],
+                   'versions':package_versions()}
+        return hashlib.sha256(json.dumps(content,sort_keys=True,default=repr).encode()).hexdigest()
+
+    def model_path(self,key):
+
+        return os.path.join(self.cache_dir,key+".pkl")
+
+    def write_atomic(self,path,write):
+
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir,suffix=".tmp")
+        try:
+            with os.fdopen(fd,'wb') as f:
+                write(f)
+            os.replace(tmp,path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def get(self,key):
+
+        path = self.model_path(key)
+        try:
+            with open(path,'rb') as f:
+                model = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (EOFError,stdpickle.UnpicklingError,AttributeError,ImportError,ValueError,TypeError) as e:
+            # Truncated, or pickled against classes that moved or changed : a miss
+            emit('model_cache','corrupt',key=key[:12],error=type(e).__name__)
+            self.remove(key)
+            return None
+        # Touch for least recently used eviction, the entry may have just been evicted
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return model
+
+    def remove(self,key):
+
+        for p in (self.model_path(key),os.path.join(self.cache_dir,key+".json")):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+
+    def put(self,key,model,meta=None):
+
+        self.write_atomic(self.model_path(key),lambda f: pickle.dump(model,f))
+        record = {'key':key,'created':time.time(),'versions':package_versions(),**(meta or {})}
+        self.write_atomic(os.path.join(self.cache_dir,key+".json"),
+                          lambda f: f.write(json.dumps(record,default=repr).encode()))
+        self.evict()
+
+    def meta(self,key):
+
+        try:
+            with open(os.path.join(self.cache_dir,key+".json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def evict(self):
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.cache_dir,name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime,st.st_size,path))
+        total = sum(size for _,size,_ in entries)
+        for _,size,path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.remove(os.path.basename(path)[:-4])
+            total -= size
+
+    def fit(self,key,model,data,meta=None):
+
+        # Cached fitted model for key, or fit model on data and store it
+        cached = self.get(key)
+        if cached is not None:
+            emit('model_cache','hit',key=key[:12])
+            return cached
+        model.fit(data)
+        self.put(key,model,meta)
+        return model
+
+    # Generated CSVs record the key of the model that produced them, so a saved
+    # output is only reused when the data, parameters and constraints still match
+    def mark_output(self,path,key):
+
+        with open(path+".key",'w') as f:
+            f.write(key)
+
+    def output_matches(self,path,key):
+
+        try:
+            with open(path+".key") as f:
+                return f.read().strip() == key
+        except FileNotFoundError:
+            return False
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pandas,sqlite3,os"
+# ---------------------------------------------------------------------------
+""" Contains the experiment orchestrator: a declarative grid over the generators
+and their hyperparameters, run on a pool of worker processes with per job
+budgets and recorded in a resumable SQLite catalog. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import argparse
+import contextlib
+import hashlib
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import resource
+import signal
+import sqlite3
+import sys
+import time
+from DataIO import file_hash, table_rows, table_path
+from Instrument import emit
+
+
+"""
+Usage Example :
+python Orchestrator.py run grid.json --processes 4 --threads 1 --memory-mb 8192
+python Orchestrator.py status
+python Orchestrator.py results --generator ctgan
+
+grid.json :
+{"real_data": "Data/data.csv",
+ "jobs": [
+   {"generator": "ctgan", "grid": {"epochs": [1, 10], "bs": [10, 100]}, "fixed": {"samples": 56070}},
+   {"generator": "bayes", "grid": {"epsilon": [0.1, 1, 10], "k": [1, 2]}},
+   {"generator": "noise", "grid": {"p": [0.9, 0.8], "noise": [0.5, 1]},
+    "fixed": {"synth_data_path": "synthdata/noise.feather", "seed": 0}, "budget": {"threads": 2}}
+ ]}
+"""
+
+
+# Generator name : (module, class). Modules are imported inside the job process,
+# so a sweep over BAYES and Noise does not need sdv installed.
+generators = {
+    'ctgan':    ('CtGan','CtGan'),
+    'ctgan_ts': ('CtGan','CtGan_ts'),
+    'tvae':     ('TVAE','TVae'),
+    'gcopula':  ('GCopula','GCopula'),
+    'bayes':    ('BAYES','BAYES'),
+    'noise':    ('Noise','Noise'),
+}
+
+# How each generator reads the real data through DataCache : the whole table, or
+# its split by T. Noise reads the file itself.
+shared_data = {'ctgan':'load','tvae':'load','gcopula':'load','ctgan_ts':'split','bayes':'split'}
+
+# Defaults for every job, a grid entry can override them with "budget"
+# threads : BLAS / OpenMP / torch threads, memory_mb : address space limit,
+# cpu_seconds : CPU time limit, timeout : wall clock seconds before the job is killed
+default_budget = {'threads':1,'memory_mb':None,'cpu_seconds':None,'timeout':None}
+
+
+def expand(spec):
+
+    # [(generator, params, budget)] for every cell of every grid entry
+    cells = []
+    for entry in spec['jobs']:
+        if entry['generator'] not in generators:
+            raise ValueError("Unknown generator : {}".format(entry['generator']))
+        grid = entry.get('grid',{})
+        names = sorted(grid)
+        for values in itertools.product(*[grid[n] for n in names]):
+            params = {**entry.get('fixed',{}),**dict(zip(names,values))}
+            cells.append((entry['generator'],params,{**default_budget,**entry.get('budget',{})}))
+    return cells
+
+
+def job_id(generator,params,real_hash):
+
+    content = {'generator':generator,'params':params,'real':real_hash}
+    return hashlib.sha256(json.dumps(content,sort_keys=True).encode()).hexdigest()
+
+
+class Catalog:
+
+    # One row per grid cell. status moves pending -> running -> done | failed,
+    # rows left running by a crashed sweep go back to pending on the next run
+
+    columns = """id TEXT PRIMARY KEY, generator TEXT, params TEXT, budget TEXT, real_data TEXT,
+                 status TEXT, output TEXT, rows INTEGER, seconds REAL, peak_rss_mb REAL,
+                 attempts INTEGER DEFAULT 0, error TEXT, created REAL, started REAL, finished REAL"""
+
+    def __init__(self,path="catalog.db"):
+
+        self.path = path
+        with self.connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS jobs ({})".format(self.columns))
+
+    def connect(self):
+
+        # Jobs write their own result, WAL and a busy timeout let them share the file
+        return sqlite3.connect(self.path,timeout=60)
+
+    def add(self,cells,real_data_path):
+
+        real_hash = file_hash(real_data_path)
+        with self.connect() as db:
+            for generator, params, budget in cells:
+                db.execute("INSERT OR IGNORE INTO jobs (id,generator,params,budget,real_data,status,created) VALUES (?,?,?,?,?,?,?)",
+                           (job_id(generator,params,real_hash),generator,json.dumps(params,sort_keys=True),
+                            json.dumps(budget),real_data_path,'pending',time.time()))
+
+    def reset(self,retry_failed=False):
+
+        statuses = ('running','failed') if retry_failed else ('running',)
+        with self.connect() as db:
+            db.execute("UPDATE jobs SET status='pending' WHERE status IN ({})".format(",".join("?"*len(statuses))),statuses)
+
+    def pending(self):
+
+        with self.connect() as db:
+            return db.execute("SELECT id,generator,params,budget,real_data FROM jobs WHERE status='pending' ORDER BY created,id").fetchall()
+
+    def start(self,job):
+
+        with self.connect() as db:
+            db.execute("UPDATE jobs SET status='running', started=?, attempts=attempts+1, error=NULL WHERE id=?",(time.time(),job))
+
+    def finish(self,job,output,rows,seconds,peak_rss_mb):
+
+        with self.connect() as db:
+            db.execute("UPDATE jobs SET status='done', output=?, rows=?, seconds=?, peak_rss_mb=?, finished=? WHERE id=?",
+                       (output,rows,seconds,peak_rss_mb,time.time(),job))
+
+    def fail(self,job,error):
+
+        with self.connect() as db:
+            db.execute("UPDATE jobs SET status='failed', error=?, finished=? WHERE id=? AND status='running'",(error,time.time(),job))
+
+    def status(self,job):
+
+        with self.connect() as db:
+            row = db.execute("SELECT status FROM jobs WHERE id=?",(job,)).fetchone()
+        return row[0] if row else None
+
+    def query(self,generator=None,status=None):
+
+        sql, args = "SELECT * FROM jobs WHERE 1=1", []
+        if generator:
+            sql, args = sql+" AND generator=?", args+[generator]
+        if status:
+            sql, args = sql+" AND status=?", args+[status]
+        with self.connect() as db:
+            return pd.read_sql_query(sql+" ORDER BY generator,created",db,params=args)
+
+    def summary(self):
+
+        with self.connect() as db:
+            return pd.read_sql_query("SELECT generator,status,COUNT(*) AS jobs,SUM(seconds) AS seconds FROM jobs GROUP BY generator,status",db)
+
+
+def apply_budget(budget):
+
+    # Runs in the job process before any generator is imported. The variables reach
+    # the libraries loaded from here on (torch reads them on import), the thread pools
+    # numpy loaded in the parent before the fork are limited by limit_threads
+    threads = str(budget['threads'])
+    for var in ('OMP_NUM_THREADS','MKL_NUM_THREADS','OPENBLAS_NUM_THREADS','NUMEXPR_NUM_THREADS'):
+        os.environ[var] = threads
+    if budget['memory_mb']:
+        limit = int(budget['memory_mb'])*1024**2
+        resource.setrlimit(resource.RLIMIT_AS,(limit,limit))
+    if budget['cpu_seconds']:
+        limit = int(budget['cpu_seconds'])
+        resource.setrlimit(resource.RLIMIT_CPU,(limit,limit+5))
+
+
+def limit_threads(threads):
+
+    # BLAS / OpenMP pools already loaded in this process, and torch's when it is
+    # loaded, held to threads for the duration of the context
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return contextlib.nullcontext()
+    return threadpool_limits(limits=threads)
+
+
+def job_output(generator,job):
+
+    # Every job writes its own table. The names the generators make from their
+    # settings can be shared by several cells (GCopula's by any samples, Noise's by
+    # any seed), a job writing there could reuse or overwrite another one's table.
+    return table_path(os.path.join('synthdata',"{}_{}".format(generator,job[:16])))
+
+
+def run_generator(generator,real_data_path,params,synth_path=None):
+
+    # Runs one cell and returns the path of the table it wrote, synth_path when given
+    module, cls = generators[generator]
+    if generator == 'noise':
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','Noise'))
+        noise = getattr(importlib.import_module(module),cls)()
+        noise.fit_transform(real_data_path,**params,save_path=synth_path)
+        return noise.save_path
+    gen = getattr(importlib.import_module(module),cls)(real_data_path)
+    gen.fit_transform(**params,synth_path=synth_path)
+    return gen.synth_path
+
+
+def job_main(catalog_path,job,generator,params,budget,real_data_path):
+
+    apply_budget(budget)
+    catalog = Catalog(catalog_path)
+    t = time.time()
+    try:
+        for d in ('synthdata','bayes_temp'):
+            os.makedirs(d,exist_ok=True)
+        output = job_output(generator,job)
+        # A table of an earlier attempt of this job is never taken as this one's
+        for p in (output,output+".key"):
+            if os.path.exists(p):
+                os.remove(p)
+        with limit_threads(int(budget['threads'])):
+            written = run_generator(generator,real_data_path,params,output)
+        # Generators raise on failure, a missing or older table is a failure too
+        # (mtimes can trail the clock by a tick)
+        if written != output or not os.path.isfile(output):
+            raise RuntimeError("no output table was written to {}".format(output))
+        if os.path.getmtime(output) < t-1:
+            raise RuntimeError("output table {} predates the job".format(output))
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+        catalog.finish(job,output,table_rows(output),time.time()-t,peak)
+    except BaseException as e:
+        catalog.fail(job,"{}: {}".format(type(e).__name__,e))
+        raise SystemExit(1)
+
+
+def exit_reason(code):
+
+    if code is not None and code < 0:
+        return "killed by {}".format(signal.Signals(-code).name)
+    return "exited with code {}".format(code)
+
+
+class Orchestrator:
+
+    # Each job runs in its own process so a budget only applies to that job and
+    # a job killed for going over it cannot take the other workers down with it
+    # (a ProcessPoolExecutor breaks as a whole when one of its workers dies).
+
+    def __init__(self,spec,catalog_path="catalog.db",processes=None,budget=None,poll=0.5):
+
+        self.spec = spec
+        self.catalog = Catalog(catalog_path)
+        self.processes = processes or os.cpu_count()
+        self.budget = budget or {}
+        self.poll = poll
+
+    def run(self,retry_failed=False):
+
+        cells = expand(self.spec)
+        overrides = {k:v for k,v in self.budget.items() if v is not None}
+        self.catalog.add(cells,self.spec['real_data'])
+        self.catalog.reset(retry_failed)
+        queue = self.catalog.pending()
+        emit('orchestrator','queue',pending=len(queue),cells=len(cells))
+        self.preload(queue)
+
+        running = {}
+        while queue or running:
+            while queue and len(running) < self.processes:
+                job, generator, params, budget, real_data_path = queue.pop(0)
+                budget = {**json.loads(budget),**overrides}
+                self.catalog.start(job)
+                proc = multiprocessing.Process(target=job_main,args=(self.catalog.path,job,generator,json.loads(params),
+                                                                     budget,real_data_path))
+                proc.start()
+                running[job] = (proc,time.time(),budget)
+                emit('orchestrator','start',job=job[:12],generator=generator,params=params)
+            time.sleep(self.poll)
+            for job, (proc,started,budget) in list(running.items()):
+                if budget['timeout'] and proc.is_alive() and time.time()-started > budget['timeout']:
+                    proc.kill()
+                    proc.join()
+                    self.catalog.fail(job,"timeout after {} s".format(budget['timeout']))
+                if proc.exitcode is None:
+                    continue
+                proc.join()
+                del running[job]
+                # A job that died without recording its result (out of memory, CPU limit)
+                if self.catalog.status(job) == 'running':
+                    self.catalog.fail(job,exit_reason(proc.exitcode))
+                emit('orchestrator','finish',job=job[:12],result=self.catalog.status(job))
+        return self.catalog.summary()
+
+    def preload(self,queue):
+
+        # The real data is read here once. Job processes are forked from this one,
+        # they find it in their DataCache and map the same memory instead of each
+        # reading a copy (with another start method they read it themselves).
+        from DataCache import datasets
+        if multiprocessing.get_start_method() != 'fork':
+            return
+        for path, how in {(q[4],shared_data[q[1]]) for q in queue if q[1] in shared_data}:
+            if how == 'load':
+                datasets.load(path)
+            else:
+                datasets.split(path,'T')
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Run a grid of synthetic data generators")
+    parser.add_argument('--catalog',default="catalog.db")
+    commands = parser.add_subparsers(dest='command',required=True)
+
+    run = commands.add_parser('run',help="run every pending cell of a grid file")
+    run.add_argument('grid',help="JSON grid specification")
+    run.add_argument('--real-data',help="overrides real_data of the grid file")
+    run.add_argument('--processes',type=int)
+    run.add_argument('--threads',type=int)
+    run.add_argument('--memory-mb',type=int)
+    run.add_argument('--cpu-seconds',type=int)
+    run.add_argument('--timeout',type=float)
+    run.add_argument('--retry-failed',action='store_true')
+
+    commands.add_parser('status',help="job counts by generator and status")
+
+    results = commands.add_parser('results',help="catalog rows")
+    results.add_argument('--generator')
+    results.add_argument('--status')
+    results.add_argument('--out',help="write the rows to a CSV file instead of printing them")
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        with open(args.grid) as f:
+            spec = json.load(f)
+        if args.real_data:
+            spec['real_data'] = args.real_data
+        budget = {'threads':args.threads,'memory_mb':args.memory_mb,'cpu_seconds':args.cpu_seconds,'timeout':args.timeout}
+        print(Orchestrator(spec,args.catalog,args.processes,budget).run(args.retry_failed).to_string(index=False))
+    elif args.command == 'status':
+        print(Catalog(args.catalog).summary().to_string(index=False))
+    else:
+        rows = Catalog(args.catalog).query(args.generator,args.status)
+        if args.out:
+            rows.to_csv(args.out,index=False)
+        else:
+            print(rows.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
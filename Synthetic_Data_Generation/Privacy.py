@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "scipy,pandas,numpy,os"
+# ---------------------------------------------------------------------------
+""" Contains the privacy metrics: distance to closest record (DCR) and nearest
+neighbour distance ratio (NNDR) of every synthetic dataset against the real data. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import numpy as np
+import os
+from scipy.spatial import cKDTree
+from DataIO import iter_table, write_table
+from Schema import numeric, categorical, load_data, coerce
+from Evaluate import discover
+
+
+"""
+Usage Example :
+from Privacy import Privacy
+priv = Privacy("Data/data.csv")
+results = priv.fit_transform(synth_dir="synthdata")
+"""
+
+
+# Distance between two rows: Euclidean over the numeric columns standardised
+# with the real data, plus 1 for every categorical column that differs.
+# Categories are one-hot encoded scaled by 1/sqrt(2), so a mismatch adds
+# exactly 1 to the squared distance and any vector index can be used.
+onehot_scale = np.float32(1/np.sqrt(2))
+
+
+class Embedding:
+
+    def __init__(self,real):
+
+        x = real[numeric].to_numpy(dtype=np.float64)
+        self.mean = x.mean(axis=0)
+        std = x.std(axis=0)
+        self.std = np.where(std > 0,std,1.0)
+        # The last slot of each block stands for categories the real data never had
+        self.tables = {c:sorted(real[c].astype(str).unique()) for c in categorical}
+        self.width = len(numeric)+sum(len(t)+1 for t in self.tables.values())
+
+    def transform(self,df):
+
+        out = np.zeros((len(df),self.width),dtype=np.float32)
+        out[:,:len(numeric)] = (df[numeric].to_numpy(dtype=np.float64)-self.mean)/self.std
+        pos = len(numeric)
+        rows = np.arange(len(df))
+        for c in categorical:
+            table = self.tables[c]
+            codes = pd.Categorical(df[c].astype(str),categories=table).codes
+            codes = np.where(codes < 0,len(table),codes)
+            out[rows,pos+codes] = onehot_scale
+            pos += len(table)+1
+        return out
+
+
+def blocked_knn(index,sq,query,k,block_rows,block_bytes=256*1024**2):
+
+    # Exact k nearest neighbours by brute force over tiles of block_rows query rows
+    # by as many real rows as fit in block_bytes (16 bytes an entry : the float32
+    # distance, argpartition's int64 index and its working copy), so memory stays
+    # flat in the size of the real data. Each query row keeps a running top k of
+    # candidates merged with every tile. Candidates come from the matrix product
+    # form, their distances are then recomputed directly so exact matches come out
+    # as exactly 0.
+    tile = max(k,block_bytes//(16*block_rows))
+    dist = np.empty((len(query),k),dtype=np.float32)
+    for start in range(0,len(query),block_rows):
+        q = query[start:start+block_rows]
+        best = np.full((len(q),k),np.inf,dtype=np.float32)
+        idx = np.zeros((len(q),k),dtype=np.int64)
+        for lo in range(0,len(index),tile):
+            d2 = q@index[lo:lo+tile].T
+            d2 *= -2
+            d2 += sq[None,lo:lo+tile]
+            top = np.argpartition(d2,min(k,d2.shape[1])-1,axis=1)[:,:k]
+            merged = np.concatenate([best,np.take_along_axis(d2,top,axis=1)],axis=1)
+            ids = np.concatenate([idx,top+lo],axis=1)
+            keep = np.argpartition(merged,k-1,axis=1)[:,:k]
+            best = np.take_along_axis(merged,keep,axis=1)
+            idx = np.take_along_axis(ids,keep,axis=1)
+        diff = index[idx]-q[:,None,:]
+        part = np.sqrt((diff*diff).sum(axis=2))
+        part.sort(axis=1)
+        dist[start:start+len(q)] = part
+    return dist
+
+
+def summarise(path,dcr,nndr):
+
+    return {'dataset':path,'rows':len(dcr),
+            'dcr_mean':float(dcr.mean()),'dcr_median':float(np.median(dcr)),
+            'dcr_p05':float(np.percentile(dcr,5)),'exact_match_rate':float((dcr == 0).mean()),
+            'nndr_mean':float(np.nanmean(nndr)),'nndr_median':float(np.nanmedian(nndr)),
+            'nndr_p05':float(np.nanpercentile(nndr,5))}
+
+
+class Privacy:
+
+    # method "tree" queries a KD-tree over the embedded real data on all cores,
+    # "blocked" is an exact vectorized brute force search. Either way the real
+    # index is built once in fit and shared by every dataset of the sweep, and
+    # synthetic tables are streamed through in chunks of chunksize rows.
+
+    def __init__(self,real_data_path,method="tree",processes=-1,chunksize=65536,block_rows=2048,block_bytes=256*1024**2):
+
+        self.real_data_path = real_data_path
+        self.method = method
+        self.processes = processes
+        self.chunksize = chunksize
+        # "blocked" : query rows per block and the memory of a distance tile
+        self.block_rows = block_rows
+        self.block_bytes = block_bytes
+
+    def fit(self):
+
+        real = load_data(self.real_data_path)
+        self.embedding = Embedding(real)
+        self.index = self.embedding.transform(real)
+        if self.method == "tree":
+            self.tree = cKDTree(self.index)
+        else:
+            self.sq = (self.index*self.index).sum(axis=1)
+
+    def nearest(self,query,k=2):
+
+        # Distances to the k closest real records, ascending
+        if self.method == "tree":
+            dist, _ = self.tree.query(query,k=k,workers=self.processes)
+            return dist.astype(np.float32)
+        return blocked_knn(self.index,self.sq,query,k,self.block_rows,self.block_bytes)
+
+    def distances(self,path):
+
+        # DCR and NNDR of every row of the table at path
+        dcr, nndr = [], []
+        for chunk in iter_table(path,self.chunksize):
+            dist = self.nearest(self.embedding.transform(coerce(chunk)))
+            dcr.append(dist[:,0])
+            with np.errstate(divide='ignore',invalid='ignore'):
+                nndr.append(np.where(dist[:,1] > 0,dist[:,0]/dist[:,1],np.nan))
+        return np.concatenate(dcr), np.concatenate(nndr)
+
+    def transform(self,paths=None,synth_dir="synthdata"):
+
+        # paths defaults to every dataset in synth_dir (BAYES, Noise, SDV outputs)
+        self.paths = list(paths) if paths is not None else discover(synth_dir)
+        results = []
+        for path in self.paths:
+            dcr, nndr = self.distances(path)
+            results.append(summarise(path,dcr,nndr))
+        self.results = pd.DataFrame(results)
+        return self.results
+
+    def fit_transform(self,paths=None,synth_dir="synthdata"):
+
+        #fitting
+        self.fit()
+
+        #transforming
+        return self.transform(paths,synth_dir)
+
+    def save(self,path="evaluation/privacy_results.csv"):
+
+        os.makedirs(os.path.dirname(path) or ".",exist_ok=True)
+        return write_table(self.results,path)
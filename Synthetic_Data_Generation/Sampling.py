@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pandas,numpy"
+# ---------------------------------------------------------------------------
+""" Contains batched sampling helpers shared by the SDV backed generators. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import numpy as np
+from DataIO import TableWriter
+from Schema import coerce
+from Instrument import stage
+
+
+def iter_batches(model,samples,batch_size,columns,id_column='I',engine=None,report=None,component='sampling',conditions=None):
+
+    # Yields samples rows from a fitted model batch_size rows at a time.
+    # SDV numbers the primary key from 0 on every sample call, so ids and the
+    # index are offset to continue across batches as one sample call would.
+    # engine repairs every batch against the schema constraints, counts go to report,
+    # rows it cannot repair are dropped and sampled again in the next batch
+    # component names the generator in the sample / constraints events
+    # conditions {column: value} fixes columns through sdv's conditional sampling
+    offset = 0
+    while offset < samples:
+        n = min(batch_size,samples-offset)
+        with stage(component,'sample',rows=n,offset=offset):
+            if conditions:
+                from sdv.sampling import Condition
+                batch = model.sample_conditions([Condition(conditions,num_rows=n)])
+            else:
+                batch = model.sample(num_rows=n)
+            batch = coerce(batch[columns])
+        if engine is not None:
+            with stage(component,'constraints',rows=len(batch)) as ev:
+                batch = engine.repair(batch,report)
+                ev['kept'] = len(batch)
+        if len(batch) == 0:
+            raise RuntimeError("Model returned no valid rows for a batch of {}".format(n))
+        if id_column in batch.columns:
+            batch[id_column] = np.arange(offset,offset+len(batch),dtype=batch[id_column].dtype)
+        batch.index = pd.RangeIndex(offset,offset+len(batch))
+        offset += len(batch)
+        yield batch
+
+
+def conditions_natively(model):
+
+    # ctgan steers its generator with a condition vector, the Gaussian copula
+    # conditions its distribution, both generate rows of a value directly
+    inner = getattr(model,'_model',None)
+    return hasattr(inner,'_data_sampler') or hasattr(inner,'univariates')
+
+
+def ctgan_discrete(inner,column):
+
+    # ctgan only conditions on the columns it encoded as discrete
+    infos = getattr(getattr(inner,'_transformer',None),'_column_transform_info_list',[])
+    return any(info.column_name == column and info.column_type == 'discrete' for info in infos)
+
+
+def conditional_sample(model,n,column,value):
+
+    # About n rows with column == value (fewer if some come out otherwise)
+    inner = model._model
+    if hasattr(inner,'_data_sampler') and ctgan_discrete(inner,column):
+        # sdv does not pass conditions down to ctgan, its condition vector is used here
+        condition = model._metadata.transform(pd.DataFrame({column:[value]}),is_condition=True)
+        rows = model._metadata.reverse_transform(inner.sample(n,column,condition[column].iloc[0]))
+        rows = model._metadata.filter_valid(rows)
+    else:
+        # A numerical column (or a model fitted before T was declared categorical) is
+        # sampled through sdv's conditions
+        from sdv.sampling import Condition
+        rows = model.sample_conditions([Condition({column:value},num_rows=n)])
+    return rows[rows[column] == value]
+
+
+def iter_quota_batches(model,counts,column,batch_size,columns,id_column='I',engine=None,report=None,component='sampling',max_rows=None):
+
+    # Yields exactly counts[value] rows with column == value for every value, all
+    # from one model. Models that condition natively generate the rows of each value
+    # directly. Others (TVAE) fill every quota from the same unconditional batches,
+    # each sized by the share of each value seen so far, so rows are only discarded
+    # for values whose quota is already full. Gives up once max_rows rows (default
+    # 100 times the total asked for) have been generated.
+    remaining = {v:int(n) for v,n in counts.items() if n > 0}
+    native = conditions_natively(model)
+    max_rows = max_rows or 100*max(sum(remaining.values()),1)
+    # Rows generated while asking for each value (None : unconditionally) and rows of each value kept
+    asked, seen = {}, {v:0 for v in remaining}
+    generated, offset = 0, 0
+    rate = lambda v,k: max(seen[v],1)/asked[k] if asked.get(k) else 1.0
+    while remaining:
+        if generated >= max_rows:
+            raise RuntimeError("No {} rows with {} in {} after {} generated rows".format(
+                sum(remaining.values()),column,sorted(remaining),generated))
+        # Rows to ask for : what is left over the share of rows of the value seen so
+        # far, with some margin once that share is known, at most batch_size
+        value = next(iter(remaining)) if native else None
+        if native:
+            need = remaining[value]/rate(value,value)
+        else:
+            need = max(remaining[v]/rate(v,None) for v in remaining) if asked else sum(remaining.values())
+        n = int(min(batch_size,max(1,np.ceil(need*(1.1 if asked.get(value) else 1.0)))))
+        asked[value] = asked.get(value,0)+n
+        generated += n
+        with stage(component,'sample',rows=n,offset=offset,column=column,value=value) as ev:
+            if native:
+                batch = conditional_sample(model,n,column,value)
+            else:
+                batch = model.sample(num_rows=n)
+            batch = coerce(batch[columns])
+            ev['kept'] = len(batch)
+        if engine is not None:
+            with stage(component,'constraints',rows=len(batch)) as ev:
+                batch = engine.repair(batch,report)
+                ev['kept'] = len(batch)
+        parts = []
+        for v in list(remaining):
+            rows = batch[batch[column] == v]
+            if native and v != value:
+                continue
+            seen[v] += len(rows)
+            parts.append(rows.iloc[:remaining[v]])
+            remaining[v] -= len(parts[-1])
+            if remaining[v] == 0:
+                del remaining[v]
+        batch = pd.concat(parts)
+        if len(batch) == 0:
+            continue
+        if id_column in batch.columns:
+            batch[id_column] = np.arange(offset,offset+len(batch),dtype=batch[id_column].dtype)
+        batch.index = pd.RangeIndex(offset,offset+len(batch))
+        offset += len(batch)
+        yield batch
+
+
+def write_batches(batches,path):
+
+    # Appends each batch to the table at path as soon as it is generated, returns the row count
+    with TableWriter(path) as writer:
+        for batch in batches:
+            writer.write(batch)
+    return writer.rows
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pandas,numpy"
+# ---------------------------------------------------------------------------
+""" Contains the column schema shared by every generator and Noise: column roles,
+compact in-memory dtypes, DataSynthesizer datatypes and the feature constraints. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import numpy as np
+
+
+# Remove in Production when column names are not masked
+# role : id, numeric, categorical or target
+# dtype : compact pandas dtype used in memory, integers are only narrowed when the values fit
+# bayes : (DataSynthesizer datatype, is categorical), None keeps the column out of attribute_to_datatype
+schema = {
+    'I':   {'role':'id',          'dtype':'int32',    'bayes':None},
+    'MT':  {'role':'numeric',     'dtype':'float32',  'bayes':('Float',False)},
+    'IP':  {'role':'categorical', 'dtype':'category', 'bayes':('String',True)},
+    'SNS': {'role':'categorical', 'dtype':'category', 'bayes':('String',True)},
+    'RL':  {'role':'categorical', 'dtype':'category', 'bayes':('String',True)},
+    'OS':  {'role':'categorical', 'dtype':'category', 'bayes':('String',True)},
+    'C':   {'role':'numeric',     'dtype':'int16',    'bayes':('Integer',False)},
+    'AC':  {'role':'numeric',     'dtype':'int16',    'bayes':('Integer',True)},
+    'WC':  {'role':'numeric',     'dtype':'int16',    'bayes':('Integer',False)},
+    'E':   {'role':'numeric',     'dtype':'int16',    'bayes':('Integer',False)},
+    'T':   {'role':'target',      'dtype':'int8',     'bayes':None},
+}
+
+features = list(schema)
+numeric = [c for c in features if schema[c]['role'] == 'numeric']
+ints = [c for c in numeric if schema[c]['dtype'].startswith('int')]
+categorical = [c for c in features if schema[c]['role'] == 'categorical']
+target = 'T'
+primary_key = 'I'
+
+#Defining Attribute types for DataSynthesizer
+attribute_to_datatype = {c:schema[c]['bayes'][0] for c in features if schema[c]['bayes']}
+attribute_is_categorical = {c:schema[c]['bayes'][1] for c in features if schema[c]['bayes']}
+
+
+# Defining Constraints to map Engineering of Features
+# kinds : scalar_inequality (column relation value), inequality (low <= high),
+# multiple_of (column is a positive multiple of base unless exclusion_column is 0)
+constraints = [
+    # C <= 19
+    {'kind':'scalar_inequality','column':'C','relation':'<=','value':19},
+    # E < C
+    {'kind':'inequality','low':'E','high':'C'},
+    # WC < C
+    {'kind':'inequality','low':'WC','high':'C'},
+    # Actual C=0 when C<19
+    {'kind':'multiple_of','column':'C','base':19,'exclusion_column':'AC'},
+]
+
+
+def coerce(df):
+
+    # Casts the columns of df that are in the schema to their compact dtype
+    out = df.copy(deep=False)
+    for c in out.columns:
+        if c not in schema:
+            continue
+        dtype = schema[c]['dtype']
+        col = out[c]
+        if dtype == 'category':
+            if not isinstance(col.dtype,pd.CategoricalDtype):
+                out[c] = col.astype('category')
+        elif dtype.startswith('int'):
+            info = np.iinfo(dtype)
+            if len(col) == 0 or (col.notna().all() and col.min() >= info.min and col.max() <= info.max):
+                out[c] = col.astype(dtype)
+        else:
+            out[c] = col.astype(dtype)
+    return out
+
+
+def load_data(path):
+
+    # Real data from any table format, renamed to the masked features and coerced
+    from DataIO import read_table
+    df = read_table(path)
+    # Remove in Production when column names are not masked
+    df.columns = features
+    return coerce(df)
+
+
+# Custom constraint functions for multiple_of, written for SDV's create_custom_constraint.
+# base comes from the constraint definition above.
+def ac_is_valid(column_names, data, exclusion_column, base):
+    column_name=column_names[0]
+    is_divisible = (data[column_name] % base == 0) & (data[column_name]>0)
+    is_excluded = (data[exclusion_column] == 0)
+    #is_zero= data[column_name]!=0
+    return (is_divisible | is_excluded )
+def ac_transform(column_names, data, exclusion_column, base):
+    column_name = column_names[0]
+    data[column_name] = data[column_name] / base
+    return data
+def ac_reverse_transform(column_names, transformed_data, exclusion_column, base):
+    column_name = column_names[0]
+    # One vectorized pass, no chained indexing copies
+    x = transformed_data[column_name].to_numpy(dtype=np.float64)
+    is_included = transformed_data[exclusion_column].to_numpy() == 0
+    transformed_data[column_name] = np.where(is_included,np.round(x),x)*base
+    return transformed_data
+
+
+# Kinds sdv learns by transforming the data, the others it enforces by rejecting rows
+transform_kinds = ['multiple_of']
+
+# sdv field types given to CTGAN and TVAE over the ones sdv infers from the dtypes.
+# T is a class label stored as int8, sdv would model it as a number : declared
+# categorical it is a discrete column, ctgan can condition its generator on it
+sdv_field_types = {target:{'type':'categorical'}}
+
+
+def sdv_fields(columns):
+
+    # Field types of columns in those models : sdv_field_types, else the type sdv
+    # infers from the compact dtype
+    return {c:sdv_field_types.get(c,{'type':'categorical' if schema[c]['dtype'] == 'category' else 'numerical'})
+            for c in columns}
+
+
+def sdv_constraints(kinds=None):
+
+    # SDV constraint objects for the definitions above, only those of kinds when given.
+    # sdv is imported here so that modules only needing the schema (Noise, evaluation)
+    # do not load it
+    from sdv.constraints import create_custom_constraint
+    from sdv.constraints import Inequality
+    from sdv.constraints import ScalarInequality
+
+    built = []
+    for c in constraints:
+        if kinds is not None and c['kind'] not in kinds:
+            continue
+        if c['kind'] == 'scalar_inequality':
+            built.append(ScalarInequality(column_name=c['column'],relation=c['relation'],value=c['value']))
+        elif c['kind'] == 'inequality':
+            built.append(Inequality(low_column_name=c['low'],high_column_name=c['high']))
+        elif c['kind'] == 'multiple_of':
+            constraint_object = create_custom_constraint(is_valid_fn=ac_is_valid,transform_fn=ac_transform,
+                                                         reverse_transform_fn=ac_reverse_transform)
+            built.append(constraint_object(column_names=[c['column']],exclusion_column=c['exclusion_column'],base=c['base']))
+    return built
+
+
+def unseen_categories(old,new):
+
+    # Values of the categorical columns (and the target) in new that old never had,
+    # as {column: [values]}. Generators refit from scratch when there are any.
+    unseen = {}
+    for c in categorical+[target]:
+        values = set(pd.unique(new[c].dropna().astype(str)))-set(pd.unique(old[c].dropna().astype(str)))
+        if values:
+            unseen[c] = sorted(values)
+    return unseen
+
+
+def memory_usage(df):
+
+    # Resident bytes of a frame, including string payloads
+    return int(df.memory_usage(index=True,deep=True).sum())
@@ -0,0 +1,469 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pandas,numpy,http.server,threading"
+# ---------------------------------------------------------------------------
+""" Contains a long lived local sampling server: fitted generators are loaded
+once and serve "N rows from model X, optionally conditioned on T" over HTTP,
+with concurrent requests batched together and a bounded buffer of rows
+generated ahead per model. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import pickle
+import queue
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from ModelCache import ModelCache
+from Sampling import iter_batches
+from Schema import schema, features, target, primary_key, coerce
+from Constraints import ConstraintEngine
+from Instrument import stage, emit
+
+
+"""
+Usage Example :
+python Server.py --model ctgan=<model cache key> --model bayes="bayes:bayes_temp/bayes_k_2_eps_100_tg_{}.csv" --port 8765
+curl "http://127.0.0.1:8765/sample?model=ctgan&n=100&T=1"
+
+In process (port 0 picks a free port, everything stays on localhost) :
+from Server import SamplingServer, request_rows
+with SamplingServer({'gcopula':GCopula("Data/data.csv")}) as server:
+    rows = request_rows(server.url,'gcopula',100,T=1)
+"""
+
+
+# Repair of sampled rows against the schema constraints, as the generators do
+engine = ConstraintEngine()
+
+
+def parse_conditions(raw):
+
+    # {column: value} with values cast to the column's type (query strings are text)
+    conditions = {}
+    for c, v in raw.items():
+        if c not in features or c == primary_key:
+            raise ValueError("Unknown column {}".format(c))
+        dtype = schema[c]['dtype']
+        conditions[c] = int(v) if dtype.startswith('int') else float(v) if dtype.startswith('float') else str(v)
+    return conditions
+
+
+class ModelSampler:
+
+    # A fitted sdv model (CTGAN, TVAE, GaussianCopula). Rows are repaired against
+    # the constraints unless the model learned them (repair=False).
+
+    def __init__(self,model,repair=True):
+
+        self.model = model
+        self.engine = engine if repair else None
+
+    def sample(self,n,conditions=None):
+
+        return pd.concat(iter_batches(self.model,n,n,features,engine=self.engine,component='server',
+                                      conditions=conditions),ignore_index=True)
+
+
+class DescriptionSampler:
+
+    # BAYES descriptions, one per class of T. Unconditioned rows are split between
+    # the classes by their share of the real rows, conditions can only fix T.
+
+    def __init__(self,descriptions,seed=0):
+
+        from BayesSampler import BayesSampler
+        self.descriptions = descriptions
+        # Conditional tables built once, every request only draws from them
+        self.samplers = {t:BayesSampler(path) for t,path in descriptions.items()}
+        tuples = {t:sampler.meta['num_tuples'] for t,sampler in self.samplers.items()}
+        self.shares = {t:n/sum(tuples.values()) for t,n in tuples.items()}
+        self.rng = np.random.default_rng(seed)
+        self.seed = seed
+
+    def sample(self,n,conditions=None):
+
+        conditions = conditions or {}
+        if set(conditions)-{target}:
+            raise ValueError("BAYES models can only be conditioned on {}".format(target))
+        if target in conditions:
+            if conditions[target] not in self.descriptions:
+                raise ValueError("No description for {}={}".format(target,conditions[target]))
+            counts = {conditions[target]:n}
+        else:
+            classes = list(self.descriptions)
+            counts = dict(zip(classes,self.rng.multinomial(n,[self.shares[t] for t in classes])))
+        parts = []
+        for t, k in counts.items():
+            if k == 0:
+                continue
+            # A new seed per call keeps rows fresh
+            self.seed += 1
+            parts.append(coerce(self.samplers[t].sample(int(k),self.seed)[features]))
+        rows = pd.concat(parts,ignore_index=True)
+        return rows.iloc[self.rng.permutation(len(rows))].reset_index(drop=True)
+
+
+def as_sampler(model,cache=None):
+
+    # Anything the server can sample from :
+    #  - a generator (CtGan, TVae, GCopula) or a fitted BAYES, its model is fitted or
+    #    loaded from the cache once here
+    #  - "bayes:<description path with {} for the class of T>"
+    #  - the path of a pickled fitted model, or a model cache key
+    #  - an object with sample(n, conditions) or a fitted sdv model
+    if isinstance(model,str):
+        if model.startswith("bayes:"):
+            pattern = model[len("bayes:"):]
+            return DescriptionSampler({0:pattern.format(0),1:pattern.format(1)})
+        if model.endswith(".pkl"):
+            with open(model,'rb') as f:
+                return ModelSampler(pickle.load(f))
+        fitted = (cache or ModelCache()).get(model)
+        if fitted is None:
+            raise ValueError("No fitted model for {}".format(model))
+        return ModelSampler(fitted)
+    if hasattr(model,'description0'):
+        return DescriptionSampler({0:model.description0,1:model.description1})
+    if hasattr(model,'fitted_model'):
+        return ModelSampler(model.fitted_model(),repair=getattr(model,'repair',True))
+    if hasattr(model,'sample_conditions'):
+        return ModelSampler(model)
+    return model
+
+
+class RowBuffer:
+
+    # Rows generated ahead, per condition, the least recently used condition is
+    # dropped beyond max_conditions
+
+    def __init__(self,max_conditions=8):
+
+        self.frames = OrderedDict()
+        self.max_conditions = max_conditions
+
+    def rows(self,key):
+
+        return sum(len(f) for f in self.frames.get(key,()))
+
+    def take(self,key,n):
+
+        frames, out, got = self.frames.get(key,[]), [], 0
+        while frames and got < n:
+            f = frames.pop(0)
+            if len(f) > n-got:
+                frames.insert(0,f.iloc[n-got:])
+                f = f.iloc[:n-got]
+            out.append(f)
+            got += len(f)
+        if key in self.frames:
+            self.frames.move_to_end(key)
+        return out
+
+    def put(self,key,frame):
+
+        if key not in self.frames:
+            self.frames[key] = []
+            while len(self.frames) > self.max_conditions:
+                self.frames.popitem(last=False)
+        if len(frame):
+            self.frames[key].append(frame)
+        self.frames.move_to_end(key)
+
+    def keys(self):
+
+        return list(self.frames)
+
+
+class ModelWorker(threading.Thread):
+
+    # One thread per model, the only one calling it. Requests that arrive within
+    # window seconds of each other are served together : rows come from the buffer
+    # first, the rest from one generation call per condition, whose extra rows
+    # (at least batch_rows are generated) are buffered. When idle the buffer of
+    # every condition seen is topped up to buffer_rows, batch_rows at a time.
+
+    def __init__(self,name,sampler,buffer_rows=10000,batch_rows=1000,window=0.005,max_conditions=8):
+
+        super().__init__(name="sampler-"+name,daemon=True)
+        self.model_name = name
+        self.sampler = sampler
+        self.buffer_rows = buffer_rows
+        self.batch_rows = batch_rows
+        self.window = window
+        self.requests = queue.Queue()
+        self.buffer = RowBuffer(max_conditions)
+        self.buffer.put((),pd.DataFrame())
+        self.served = 0
+        self.stats = {'requests':0,'batches':0,'rows':0,'from_buffer':0,'generated':0}
+        self.stopping = threading.Event()
+
+    def submit(self,n,conditions=None):
+
+        future = Future()
+        self.requests.put((int(n),conditions or {},future))
+        return future
+
+    def run(self):
+
+        while not self.stopping.is_set():
+            try:
+                pending = [self.requests.get(timeout=0.05)]
+            except queue.Empty:
+                self.refill()
+                continue
+            deadline = time.perf_counter()+self.window
+            while True:
+                remaining = deadline-time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            groups = {}
+            for request in pending:
+                groups.setdefault(tuple(sorted(request[1].items())),[]).append(request)
+            for key, requests in groups.items():
+                self.serve(key,requests)
+
+    def generate(self,key,n):
+
+        return self.sampler.sample(n,dict(key) or None)
+
+    def serve(self,key,requests):
+
+        need = sum(n for n,_,_ in requests)
+        try:
+            with stage('server','batch',model=self.model_name,requests=len(requests),rows=need,conditions=dict(key)) as ev:
+                frames = self.buffer.take(key,need)
+                buffered = sum(len(f) for f in frames)
+                if buffered < need:
+                    fresh = self.generate(key,max(need-buffered,self.batch_rows))
+                    frames.append(fresh.iloc[:need-buffered])
+                    self.buffer.put(key,fresh.iloc[need-buffered:self.buffer_rows+need-buffered])
+                # Requests for 0 rows get the columns and no rows
+                rows = pd.concat(frames,ignore_index=True) if frames else coerce(pd.DataFrame(columns=features))
+                if len(rows) < need:
+                    raise RuntimeError("Model returned {} of {} rows".format(len(rows),need))
+                ev['from_buffer'] = buffered
+        except Exception as e:
+            for _,_,future in requests:
+                future.set_exception(e)
+            return
+        # Ids run on across everything the model has served
+        if primary_key in rows.columns:
+            rows[primary_key] = np.arange(self.served,self.served+need,dtype=rows[primary_key].dtype)
+        self.served += need
+        self.stats['requests'] += len(requests)
+        self.stats['batches'] += 1
+        self.stats['rows'] += need
+        self.stats['from_buffer'] += buffered
+        self.stats['generated'] += need-buffered
+        offset = 0
+        for n, _, future in requests:
+            future.set_result(rows.iloc[offset:offset+n].reset_index(drop=True))
+            offset += n
+
+    def refill(self):
+
+        for key in self.buffer.keys():
+            if not self.requests.empty() or self.stopping.is_set():
+                return
+            have = self.buffer.rows(key)
+            if have < self.buffer_rows:
+                try:
+                    with stage('server','prefetch',model=self.model_name,rows=min(self.batch_rows,self.buffer_rows-have),conditions=dict(key)):
+                        self.buffer.put(key,self.generate(key,min(self.batch_rows,self.buffer_rows-have)))
+                except Exception:
+                    # Requests for the condition report the error, the buffer stops refilling it
+                    self.buffer.frames.pop(key,None)
+
+    def describe(self):
+
+        return {'requests_queued':self.requests.qsize(),
+                'buffered':{json.dumps(dict(k)):self.buffer.rows(k) for k in self.buffer.keys()},**self.stats}
+
+    def stop(self):
+
+        self.stopping.set()
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    # GET  /health, /models, /sample?model=X&n=100&T=1[&format=csv]
+    # POST /sample {"model": "X", "n": 100, "conditions": {"T": 1}, "format": "json"}
+
+    def reply(self,code,body,content_type="application/json"):
+
+        data = body if isinstance(body,bytes) else json.dumps(body,default=str).encode()
+        self.send_response(code)
+        self.send_header("Content-Type",content_type)
+        self.send_header("Content-Length",str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+
+        url = urllib.parse.urlparse(self.path)
+        if url.path == "/health":
+            return self.reply(200,{'status':'ok'})
+        if url.path == "/models":
+            return self.reply(200,self.server.service.describe())
+        if url.path == "/sample":
+            query = dict(urllib.parse.parse_qsl(url.query))
+            model, n, fmt = query.pop('model',None), query.pop('n',None), query.pop('format','json')
+            return self.sample(model,n,query,fmt)
+        self.reply(404,{'error':"Unknown path {}".format(url.path)})
+
+    def do_POST(self):
+
+        if urllib.parse.urlparse(self.path).path != "/sample":
+            return self.reply(404,{'error':"Unknown path {}".format(self.path)})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length",0))) or b"{}")
+        except ValueError as e:
+            return self.reply(400,{'error':"Invalid JSON: {}".format(e)})
+        self.sample(body.get('model'),body.get('n'),body.get('conditions') or {},body.get('format','json'))
+
+    def sample(self,model,n,conditions,fmt):
+
+        service = self.server.service
+        if model not in service.workers:
+            return self.reply(404,{'error':"Unknown model {}".format(model)})
+        try:
+            n = int(n)
+            if n < 0:
+                raise ValueError("n must not be negative")
+            conditions = parse_conditions(conditions)
+        except (TypeError,ValueError) as e:
+            return self.reply(400,{'error':str(e)})
+        try:
+            rows = service.sample(model,n,conditions)
+        except Exception as e:
+            return self.reply(500,{'error':"{}: {}".format(type(e).__name__,e)})
+        if fmt == 'csv':
+            return self.reply(200,rows.to_csv(index=False).encode(),"text/csv")
+        self.reply(200,{'columns':list(rows.columns),'data':rows.to_numpy().tolist()})
+
+    def log_message(self,format,*args):
+
+        # Requests are reported as events by the service
+        pass
+
+
+class SamplingServer:
+
+    # models : {name: generator, fitted model, description pattern or cache key},
+    # see as_sampler. port=0 picks a free port, url holds the address once started.
+    # buffer_rows : rows kept ready per model and condition, batch_rows : smallest
+    # generation call, window : seconds concurrent requests are gathered over.
+
+    def __init__(self,models,host="127.0.0.1",port=0,buffer_rows=10000,batch_rows=1000,window=0.005,timeout=300,cache=None):
+
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        with stage('server','load',models=len(models)):
+            self.workers = {name:ModelWorker(name,as_sampler(model,cache),buffer_rows,batch_rows,window)
+                            for name,model in models.items()}
+        self.httpd = None
+        self.url = None
+
+    def sample(self,model,n,conditions=None):
+
+        with stage('server','request',model=model,rows=n,conditions=conditions or {}):
+            return self.workers[model].submit(n,conditions).result(self.timeout)
+
+    def describe(self):
+
+        return {name:worker.describe() for name,worker in self.workers.items()}
+
+    def start(self):
+
+        # Serves from a background thread, for tests and notebooks
+        for worker in self.workers.values():
+            if not worker.is_alive():
+                worker.start()
+        self.httpd = ThreadingHTTPServer((self.host,self.port),Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.service = self
+        self.url = "http://{}:{}".format(*self.httpd.server_address[:2])
+        threading.Thread(target=self.httpd.serve_forever,name="sampling-server",daemon=True).start()
+        emit('server','listening',url=self.url,models=list(self.workers))
+        return self
+
+    def serve_forever(self):
+
+        self.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+        for worker in self.workers.values():
+            worker.stop()
+
+    def __enter__(self):
+
+        return self.start()
+
+    def __exit__(self,*exc):
+
+        self.stop()
+
+
+def request_rows(url,model,n,fmt='json',timeout=300,**conditions):
+
+    # Client side : n rows of model from a running server, conditions as keywords
+    query = urllib.parse.urlencode({'model':model,'n':n,'format':fmt,**conditions})
+    with urllib.request.urlopen("{}/sample?{}".format(url,query),timeout=timeout) as response:
+        body = response.read()
+    if fmt == 'csv':
+        import io
+        return coerce(pd.read_csv(io.BytesIO(body)))
+    body = json.loads(body)
+    return coerce(pd.DataFrame(body['data'],columns=body['columns']))
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Serve rows from fitted synthetic data generators")
+    parser.add_argument('--model',action='append',required=True,metavar="NAME=SOURCE",
+                        help="SOURCE : a model cache key, the path of a pickled model (.pkl), or bayes: followed by "
+                             "the description path with {} for the class of T, e.g. bayes:bayes_temp/bayes_k_2_eps_100_tg_{}.csv")
+    parser.add_argument('--host',default="127.0.0.1")
+    parser.add_argument('--port',type=int,default=8765)
+    parser.add_argument('--buffer-rows',type=int,default=10000)
+    parser.add_argument('--batch-rows',type=int,default=1000)
+    parser.add_argument('--window',type=float,default=0.005)
+    parser.add_argument('--cache-dir',default="model_cache")
+    args = parser.parse_args(argv)
+    models = dict(m.split("=",1) for m in args.model)
+    server = SamplingServer(models,args.host,args.port,args.buffer_rows,args.batch_rows,args.window,
+                            cache=ModelCache(args.cache_dir))
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
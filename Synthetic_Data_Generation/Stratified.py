@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pandas,numpy,os"
+# ---------------------------------------------------------------------------
+""" Contains a wrapper that trains one generator per stratum of a column,
+in parallel, for any of the SDV backed generator classes. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import numpy as np
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from ModelCache import ModelCache
+from Schema import coerce
+from DataIO import read_table, write_table, table_path
+from Instrument import stage
+from DataCache import datasets
+
+
+
+# Stratified class training one backend model per value of a column
+# Takes a backend class (CtGan, TVae, GCopula), path or dataframe, and the column to split on
+# fit takes the backend's fit arguments, transform the exact row count for each stratum
+# Overwrite True: Overwrite existing dynthetic data
+# Save True : Save generated data
+"""
+Usage Example :
+from CtGan import CtGan
+from Stratified import Stratified
+strat = Stratified(CtGan,"Data/data.csv",column='T',overwrite=False,save=True)
+synth = strat.fit_transform({0:5607,1:50463},epochs=1,bs=10)
+synth
+"""
+
+
+# Workers rebuild the backend around their slice of the data, sent as a SharedFrame
+# that maps the parent's copy instead of being pickled (DataCache.py). Fitted models
+# go through the model cache (cloudpickle), which also hands them back to sampling.
+def fit_stratum(backend,data,params,cache):
+
+    gen = backend(data,save=False,cache=cache)
+    gen.fit(**params)
+    gen.fitted_model()
+    return gen.key
+
+
+def sample_stratum(backend,data,params,cache,samples,batch_size):
+
+    gen = backend(data,save=False,cache=cache)
+    gen.fit(**params)
+    synth = pd.concat(gen.iter_samples(samples,batch_size))
+    return synth, getattr(gen,'report',None)
+
+
+class Stratified:
+
+    def __init__(self,backend,data_path,column='T',overwrite=False,save=True,processes=None,cache=None,name=None):
+
+        self.backend = backend
+        self.column = column
+        self.save = save
+        self.overwrite = overwrite
+        self.processes = processes
+        self.name = name or backend.__name__.lower()
+        # Workers always share fitted models through a cache, a private one when cache=False
+        if cache is False:
+            cache = ModelCache(tempfile.mkdtemp(prefix="strat_cache_"))
+        self.cache = ModelCache() if cache is None else cache
+
+        # Strata are views of one copy of the rows grouped by column, computed once per
+        # file for every Stratified object of the process
+        with stage(self.name,'split',column=self.column) as ev:
+            self.shared = datasets.split(data_path if isinstance(data_path,str) else coerce(data_path),self.column)
+            self.strata = sorted(self.shared)
+            self.parts = {v:self.shared[v].frame for v in self.strata}
+            self.data = self.shared[self.strata[0]].whole().frame
+            ev['strata'] = {str(v):len(self.parts[v]) for v in self.strata}
+        for v in self.strata:
+            assert(len(self.parts[v])>0)
+
+    def pool(self):
+
+        return ProcessPoolExecutor(max_workers=self.processes or len(self.strata))
+
+    def fit(self,**params):
+
+        self.params = params
+        self.fitted = False
+        # Keys are computed here so the saved output can be matched to its models
+        keys = []
+        for v in self.strata:
+            gen = self.backend(self.parts[v],save=False,cache=self.cache)
+            gen.fit(**params)
+            keys.append(gen.key)
+        self.key = hashlib.sha256("".join(keys).encode()).hexdigest()
+
+    def fit_strata(self):
+
+        if not self.fitted:
+            with stage(self.name,'fit',strata=len(self.strata),params=self.params), self.pool() as pool:
+                list(pool.map(fit_stratum,[self.backend]*len(self.strata),[self.shared[v] for v in self.strata],
+                              [self.params]*len(self.strata),[self.cache]*len(self.strata)))
+            self.fitted = True
+
+    def transform(self,counts,batch_size=10000,synth_path=None):
+
+        # counts maps each stratum value to the exact number of rows to generate
+        self.counts = {v:int(counts.get(v,0)) for v in self.strata}
+        self.samples = sum(self.counts.values())
+        tag = "_".join("{}_{}".format(k,v) for k,v in sorted(self.params.items()))
+        self.synth_path = synth_path or table_path("synthdata/{}_st_{}_{}_s_{}".format(self.name,self.column,tag,self.samples))
+
+        if os.path.isfile(self.synth_path) and not self.overwrite and self.cache.output_matches(self.synth_path,self.key):
+            with stage(self.name,'load_saved',path=self.synth_path) as ev:
+                self.synth = coerce(read_table(self.synth_path))
+                ev['rows'] = len(self.synth)
+            return self.synth
+
+        self.fit_strata()
+        wanted = [v for v in self.strata if self.counts[v] > 0]
+        with stage(self.name,'sample',rows=self.samples,strata=len(wanted)), self.pool() as pool:
+            parts = list(pool.map(sample_stratum,[self.backend]*len(wanted),[self.shared[v] for v in wanted],
+                                  [self.params]*len(wanted),[self.cache]*len(wanted),
+                                  [self.counts[v] for v in wanted],[batch_size]*len(wanted)))
+
+        self.synth = pd.concat([synth for synth,_ in parts],ignore_index=True)
+        # Constraint repair counts of every stratum, summed
+        self.report = None
+        for _,report in parts:
+            if report is not None:
+                self.report = report if self.report is None else self.report.merge(report)
+        if 'I' in self.synth.columns:
+            self.synth['I'] = np.arange(len(self.synth),dtype=self.synth['I'].dtype)
+        if self.save:
+            with stage(self.name,'write',path=self.synth_path,rows=len(self.synth)):
+                write_table(self.synth,self.synth_path)
+                self.cache.mark_output(self.synth_path,self.key)
+
+        return self.synth
+
+    def fit_transform(self,counts,batch_size=10000,**params):
+
+        #fitting
+        self.fit(**params)
+
+        #transforming
+        self.transform(counts,batch_size)
+        return self.synth
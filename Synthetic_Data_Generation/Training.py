@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "ctgan>=0.7,<0.8,torch,pandas,numpy,os"
+# ---------------------------------------------------------------------------
+""" Contains epoch by epoch training of the CTGAN and TVAE synthesizers, with
+early stopping on a loss plateau or on the fidelity of samples against a held
+out slice, and periodic checkpoints that an interrupted fit resumes from. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import pickle as stdpickle
+import torch
+from importlib import metadata
+from torch import optim
+from torch.utils.data import DataLoader, TensorDataset
+from ctgan.data_sampler import DataSampler
+from ctgan.data_transformer import DataTransformer
+from ctgan.synthesizers.ctgan import Generator, Discriminator
+from ctgan.synthesizers.tvae import Encoder, Decoder, _loss_function
+from ModelCache import data_fingerprint
+from Instrument import stage, emit
+
+try:
+    import cloudpickle as pickle
+except ImportError:
+    import pickle
+
+
+"""
+Usage Example :
+from CtGan import CtGan
+ctgan = CtGan("Data/data.csv")
+ctgan.fit(epochs=300,bs=500,patience=10,monitor='fidelity',checkpoint_every=5)
+synth = ctgan.transform(samples=56070)
+ctgan.fitted_model().trainer.history
+"""
+
+
+# ctgan releases the loops below were written against (the one sdv.tabular pins). They
+# reuse private parts of its synthesizers (_apply_activate, _cond_loss, DataSampler,
+# calc_gradient_penalty, the TVAE loss) that other releases change without notice.
+ctgan_versions = ((0,7),(0,8))
+
+
+def ctgan_version():
+
+    # (major, minor) of the installed ctgan, None when it is not installed
+    try:
+        version = metadata.version('ctgan')
+    except metadata.PackageNotFoundError:
+        return None
+    return tuple(int(p) if p.isdigit() else 0 for p in version.split('.')[:2])
+
+
+def ctgan_supported():
+
+    version = ctgan_version()
+    return version is not None and ctgan_versions[0] <= version < ctgan_versions[1]
+
+
+def discrete_columns(fields,table_data):
+
+    # Same choice of discrete columns as the sdv CTGAN / TVAE wrappers make,
+    # fields : the field types of their metadata (get_fields())
+    discrete = []
+    for field in table_data.columns:
+        if field in fields:
+            if fields[field]['type'] == 'categorical':
+                discrete.append(field)
+            continue
+        values = table_data[field].dropna()
+        if set(values.unique()) == {0.0,1.0}:
+            values = values.astype(bool)
+        try:
+            kind = np.dtype(values.infer_objects().dtype).kind
+        except TypeError:
+            kind = 'O'
+        if kind in ['O','b']:
+            discrete.append(field)
+    return discrete
+
+
+def fidelity_score(real,synth,bins=20):
+
+    # Mean total variation distance between the column marginals, lower is better.
+    # Numeric columns with many values are binned on quantiles of the real slice.
+    scores = []
+    for c in real.columns:
+        r, s = real[c].dropna(), synth[c].dropna()
+        if pd.api.types.is_numeric_dtype(r) and r.nunique() > bins:
+            edges = np.unique(np.quantile(r,np.linspace(0,1,bins+1)[1:-1]))
+            s = pd.to_numeric(s,errors='coerce').dropna()
+            p = np.bincount(np.searchsorted(edges,r,side='right'),minlength=len(edges)+1)/max(len(r),1)
+            q = np.bincount(np.searchsorted(edges,s,side='right'),minlength=len(edges)+1)/max(len(s),1)
+            scores.append(0.5*np.abs(p-q).sum())
+        else:
+            p = r.astype(str).value_counts(normalize=True)
+            q = s.astype(str).value_counts(normalize=True)
+            scores.append(0.5*p.sub(q,fill_value=0).abs().sum())
+    return float(np.mean(scores))
+
+
+class EarlyStopping:
+
+    # Lower is better. Stops once the value has not improved by more than min_delta
+    # for patience epochs, patience=None only keeps track of the best epoch.
+
+    def __init__(self,patience=None,min_delta=0.0,min_epochs=1):
+
+        self.patience = patience
+        self.min_delta = min_delta
+        self.min_epochs = min_epochs
+        self.best = None
+        self.best_epoch = 0
+        self.wait = 0
+
+    def update(self,epoch,value):
+
+        # True when value is the new best
+        if np.isfinite(value) and (self.best is None or value < self.best-self.min_delta):
+            self.best, self.best_epoch, self.wait = value, epoch, 0
+            return True
+        self.wait += 1
+        return False
+
+    def stop(self,epoch):
+
+        return self.patience is not None and self.wait >= self.patience and epoch >= self.min_epochs
+
+
+# One set of functions per synthesizer: setup builds the networks and optimizers
+# as the ctgan fit does (reusing an already fitted transformer when given one),
+# epoch runs one pass of its training loop, or state['steps'] batches when set,
+# weights are the parameters sampling depends on.
+
+def fit_transformer(data,discrete,transformer=None):
+
+    if transformer is None:
+        transformer = DataTransformer()
+        transformer.fit(data,discrete)
+    return transformer
+
+
+def ctgan_setup(model,data,discrete,transformer=None):
+
+    model._validate_discrete_columns(data,discrete)
+    model._transformer = fit_transformer(data,discrete,transformer)
+    train = model._transformer.transform(data)
+    model._data_sampler = DataSampler(train,model._transformer.output_info_list,model._log_frequency)
+    data_dim = model._transformer.output_dimensions
+    cond_dim = model._data_sampler.dim_cond_vec()
+    model._generator = Generator(model._embedding_dim+cond_dim,model._generator_dim,data_dim).to(model._device)
+    # Kept on the model (unlike ctgan's fit) so a later update can go on training it
+    model._discriminator = Discriminator(data_dim+cond_dim,model._discriminator_dim,pac=model.pac).to(model._device)
+    return ctgan_optimizers(model,train)
+
+
+def ctgan_optimizers(model,train):
+
+    return {'discriminator':model._discriminator,
+            'optimizerG':optim.Adam(model._generator.parameters(),lr=model._generator_lr,betas=(0.5,0.9),
+                                    weight_decay=model._generator_decay),
+            'optimizerD':optim.Adam(model._discriminator.parameters(),lr=model._discriminator_lr,betas=(0.5,0.9),
+                                    weight_decay=model._discriminator_decay),
+            'steps':max(len(train)//model._batch_size,1)}
+
+
+def ctgan_warm(model,data):
+
+    # Training state on new data for a fitted model, same encoding and weights.
+    # Models fitted before the discriminator was kept get a fresh one.
+    train = model._transformer.transform(data)
+    model._data_sampler = DataSampler(train,model._transformer.output_info_list,model._log_frequency)
+    if getattr(model,'_discriminator',None) is None:
+        model._discriminator = Discriminator(model._transformer.output_dimensions+model._data_sampler.dim_cond_vec(),
+                                             model._discriminator_dim,pac=model.pac).to(model._device)
+    return ctgan_optimizers(model,train)
+
+
+def ctgan_condition(model,fakez):
+
+    condvec = model._data_sampler.sample_condvec(model._batch_size)
+    if condvec is None:
+        return fakez, None, None, None, None
+    c1, m1, col, opt = condvec
+    c1 = torch.from_numpy(c1).to(model._device)
+    m1 = torch.from_numpy(m1).to(model._device)
+    return torch.cat([fakez,c1],dim=1), c1, m1, col, opt
+
+
+def ctgan_epoch(model,state):
+
+    discriminator, optimizerG, optimizerD = state['discriminator'], state['optimizerG'], state['optimizerD']
+    mean = torch.zeros(model._batch_size,model._embedding_dim,device=model._device)
+    std = mean+1
+    losses_g, losses_d = [], []
+    for _ in range(state['steps']):
+        for _ in range(model._discriminator_steps):
+            fakez, c1, m1, col, opt = ctgan_condition(model,torch.normal(mean=mean,std=std))
+            if c1 is None:
+                real = model._data_sampler.sample_data(model._batch_size,col,opt)
+            else:
+                perm = np.arange(model._batch_size)
+                np.random.shuffle(perm)
+                real = model._data_sampler.sample_data(model._batch_size,col[perm],opt[perm])
+                c2 = c1[perm]
+            fakeact = model._apply_activate(model._generator(fakez))
+            real = torch.from_numpy(real.astype('float32')).to(model._device)
+            if c1 is not None:
+                fake_cat, real_cat = torch.cat([fakeact,c1],dim=1), torch.cat([real,c2],dim=1)
+            else:
+                fake_cat, real_cat = fakeact, real
+            y_fake = discriminator(fake_cat)
+            y_real = discriminator(real_cat)
+            pen = discriminator.calc_gradient_penalty(real_cat,fake_cat,model._device,model.pac)
+            loss_d = -(torch.mean(y_real)-torch.mean(y_fake))
+            optimizerD.zero_grad()
+            pen.backward(retain_graph=True)
+            loss_d.backward()
+            optimizerD.step()
+
+        fakez, c1, m1, col, opt = ctgan_condition(model,torch.normal(mean=mean,std=std))
+        fake = model._generator(fakez)
+        fakeact = model._apply_activate(fake)
+        y_fake = discriminator(torch.cat([fakeact,c1],dim=1) if c1 is not None else fakeact)
+        cross_entropy = 0 if c1 is None else model._cond_loss(fake,c1,m1)
+        loss_g = -torch.mean(y_fake)+cross_entropy
+        optimizerG.zero_grad()
+        loss_g.backward()
+        optimizerG.step()
+        losses_g.append(loss_g.item())
+        losses_d.append(loss_d.item())
+    # The discriminator loss estimates the Wasserstein distance between real and
+    # generated rows, its size is what levels off as the generator stops improving
+    return {'loss':abs(float(np.mean(losses_d))),'loss_g':float(np.mean(losses_g)),'loss_d':float(np.mean(losses_d))}
+
+
+def ctgan_weights(model):
+
+    return model._generator
+
+
+def tvae_setup(model,data,discrete,transformer=None):
+
+    model.transformer = fit_transformer(data,discrete,transformer)
+    data_dim = model.transformer.output_dimensions
+    # The encoder is kept on the model (unlike ctgan's fit) so a later update can go on training it
+    model._encoder = Encoder(data_dim,model.compress_dims,model.embedding_dim).to(model._device)
+    model.decoder = Decoder(model.embedding_dim,model.decompress_dims,data_dim).to(model._device)
+    return tvae_optimizers(model,data)
+
+
+def tvae_optimizers(model,data):
+
+    train = torch.from_numpy(model.transformer.transform(data).astype('float32')).to(model._device)
+    return {'encoder':model._encoder,'train':train,
+            'optimizer':optim.Adam(list(model._encoder.parameters())+list(model.decoder.parameters()),weight_decay=model.l2scale),
+            'steps':None}
+
+
+def tvae_warm(model,data):
+
+    # Models fitted before the encoder was kept get a fresh one
+    if getattr(model,'_encoder',None) is None:
+        model._encoder = Encoder(model.transformer.output_dimensions,model.compress_dims,model.embedding_dim).to(model._device)
+    return tvae_optimizers(model,data)
+
+
+def tvae_epoch(model,state):
+
+    encoder, optimizer = state['encoder'], state['optimizer']
+    loader = DataLoader(TensorDataset(state['train']),batch_size=model.batch_size,shuffle=True,drop_last=False)
+    model.decoder.train()
+    losses = []
+    for step, data in enumerate(loader):
+        if state.get('steps') and step == state['steps']:
+            break
+        optimizer.zero_grad()
+        real = data[0].to(model._device)
+        mu, std, logvar = encoder(real)
+        emb = torch.randn_like(std)*std+mu
+        rec, sigmas = model.decoder(emb)
+        loss_1, loss_2 = _loss_function(rec,real,sigmas,mu,logvar,model.transformer.output_info_list,model.loss_factor)
+        loss = loss_1+loss_2
+        loss.backward()
+        optimizer.step()
+        model.decoder.sigma.data.clamp_(0.01,1.0)
+        losses.append(loss.item())
+    return {'loss':float(np.mean(losses))}
+
+
+def tvae_weights(model):
+
+    return model.decoder
+
+
+synthesizers = {
+    'ctgan': (ctgan_setup,ctgan_epoch,ctgan_weights,'_epochs',ctgan_warm),
+    'tvae':  (tvae_setup,tvae_epoch,tvae_weights,'epochs',tvae_warm),
+}
+
+
+class Trainer:
+
+    # Runs the training loop of a ctgan CTGAN or TVAE one epoch at a time.
+    # patience : stop after that many epochs without improvement (None runs every epoch)
+    # monitor : 'loss', or 'fidelity' of monitor_rows sampled rows against a held out
+    #           validation share of the data (the model trains on the rest)
+    # checkpoint_every : save the training state every that many epochs under
+    #           checkpoint_dir, a later fit on the same data and settings resumes
+    #           from it. The checkpoint is removed once training finishes.
+    # Epochs are reported as "epoch" events through Instrument, and kept in history.
+
+    def __init__(self,component,patience=None,monitor='loss',min_delta=0.0,validation=0.1,
+                 checkpoint_every=None,checkpoint_dir="checkpoints",monitor_rows=5000,seed=0):
+
+        if monitor not in ('loss','fidelity'):
+            raise ValueError("monitor must be 'loss' or 'fidelity', not {!r}".format(monitor))
+        self.component = component
+        self.patience = patience
+        self.monitor = monitor
+        self.min_delta = min_delta
+        self.validation = validation
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_dir = checkpoint_dir
+        self.monitor_rows = monitor_rows
+        self.seed = seed
+        self.history = []
+
+    def settings(self):
+
+        # Settings that change the fitted model, for the model cache key
+        return {'patience':self.patience,'monitor':self.monitor,'min_delta':self.min_delta,
+                'validation':self.validation if self.monitor == 'fidelity' else None,'seed':self.seed}
+
+    def split(self,data):
+
+        if self.monitor != 'fidelity':
+            return data, None
+        order = np.random.default_rng(self.seed).permutation(len(data))
+        n = max(1,int(len(data)*self.validation))
+        return data.iloc[order[n:]], data.iloc[order[:n]]
+
+    def fingerprint(self,kind,model,data):
+
+        # Data and hyperparameters of a run, epochs left out so a resumed run can
+        # also be given more of them
+        params = {k:v for k,v in vars(model).items()
+                  if isinstance(v,(int,float,str,bool,tuple,list)) and k not in ('_epochs','epochs','_verbose')}
+        content = json.dumps({'kind':kind,'data':data_fingerprint(data),'params':params,**self.settings()},
+                             sort_keys=True,default=str)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def load(self,path,fingerprint):
+
+        if not path or not os.path.isfile(path):
+            return None
+        # A truncated checkpoint, or one written by other library versions, is
+        # dropped and training starts over
+        try:
+            with open(path,'rb') as f:
+                checkpoint = pickle.load(f)
+            found = checkpoint.get('fingerprint')
+        except (EOFError,stdpickle.UnpicklingError,AttributeError,ImportError,ValueError,TypeError) as e:
+            emit(self.component,'checkpoint_corrupt',path=path,error=repr(e))
+            os.remove(path)
+            return None
+        return checkpoint if found == fingerprint else None
+
+    def save(self,path,checkpoint):
+
+        # Written next to the target and renamed, a crash mid-write keeps the old one
+        os.makedirs(os.path.dirname(path) or ".",exist_ok=True)
+        tmp = path+".tmp"
+        with open(tmp,'wb') as f:
+            pickle.dump(checkpoint,f)
+        os.replace(tmp,path)
+
+    def train(self,model,data,discrete):
+
+        kind = 'tvae' if hasattr(model,'decompress_dims') else 'ctgan'
+        setup, epoch_fn, weights, epochs_attr = synthesizers[kind][:4]
+        epochs = getattr(model,epochs_attr)
+        train, valid = self.split(data)
+        fingerprint = self.fingerprint(kind,model,data)
+        path = os.path.join(self.checkpoint_dir,"{}_{}.ckpt".format(self.component,fingerprint[:16])) if self.checkpoint_every else None
+
+        checkpoint = self.load(path,fingerprint)
+        if checkpoint is not None:
+            vars(model).update(checkpoint['model'])
+            state, start, best = checkpoint['state'], checkpoint['epoch'], checkpoint['best']
+            self.history, self.stopper = checkpoint['history'], checkpoint['stopper']
+            np.random.set_state(checkpoint['rng'][0])
+            torch.set_rng_state(checkpoint['rng'][1])
+            emit(self.component,'resume',epoch=start,path=path)
+        else:
+            state, start, best = setup(model,train,discrete), 0, None
+            self.history, self.stopper = [], EarlyStopping(self.patience,self.min_delta)
+
+        for epoch in range(start+1,epochs+1):
+            record = {'epoch':epoch,**epoch_fn(model,state)}
+            if self.monitor == 'fidelity':
+                record['score'] = fidelity_score(valid,model.sample(min(len(valid),self.monitor_rows)))
+            if self.stopper.update(epoch,record['score' if self.monitor == 'fidelity' else 'loss']) and self.monitor == 'fidelity':
+                # Best sampling weights so far, put back if later epochs do worse
+                best = {k:v.detach().clone() for k,v in weights(model).state_dict().items()}
+            self.history.append(record)
+            emit(self.component,'epoch',epochs=epochs,**record)
+            if self.stopper.stop(epoch):
+                emit(self.component,'early_stop',epoch=epoch,best_epoch=self.stopper.best_epoch,best=self.stopper.best)
+                break
+            if path and epoch % self.checkpoint_every == 0 and epoch < epochs:
+                with stage(self.component,'checkpoint',epoch=epoch,path=path):
+                    self.save(path,{'fingerprint':fingerprint,'model':dict(vars(model)),'state':state,'epoch':epoch,
+                                    'best':best,'history':self.history,'stopper':self.stopper,
+                                    'rng':(np.random.get_state(),torch.get_rng_state())})
+
+        # A GAN's loss says little about its samples, so only the best epoch by
+        # fidelity is restored
+        if best is not None and self.stopper.best_epoch != self.history[-1]['epoch']:
+            weights(model).load_state_dict(best)
+        if path and os.path.isfile(path):
+            os.remove(path)
+        return self.history
+
+    def fine_tune(self,model,data,epochs):
+
+        # Goes on training a fitted synthesizer on data for epochs epochs, from its
+        # current weights and encoding
+        kind = 'tvae' if hasattr(model,'decompress_dims') else 'ctgan'
+        epoch_fn, warm = synthesizers[kind][1], synthesizers[kind][4]
+        state = warm(model,data)
+        for epoch in range(1,epochs+1):
+            record = {'epoch':epoch,'update':True,**epoch_fn(model,state)}
+            self.history.append(record)
+            emit(self.component,'epoch',epochs=epochs,**record)
+        return self.history
+
+
+class EpochTraining:
+
+    # Mixed into the sdv CTGAN / TVAE wrappers. With a trainer set, the ctgan
+    # synthesizer is fitted by Trainer.train instead of its own fit loop. With a
+    # ctgan outside ctgan_versions it falls back to that loop, without early
+    # stopping or checkpoints.
+    trainer = None
+
+    def _fit(self,table_data):
+
+        if self.trainer is None:
+            return super()._fit(table_data)
+        if not ctgan_supported():
+            emit(self.trainer.component,'fallback',ctgan=ctgan_version(),supported=ctgan_versions)
+            return super()._fit(table_data)
+        self._model = self._build_model()
+        self.trainer.train(self._model,table_data,discrete_columns(self._metadata.get_fields(),table_data))
+
+    def update(self,data,epochs=5,replay=1.0):
+
+        # Fine-tunes the fitted synthesizer on new rows. replay mixes in that many
+        # rows sampled from the model per new row, so what it learned from earlier
+        # data is rehearsed instead of forgotten, at a cost set by the new rows only.
+        if not ctgan_supported():
+            raise RuntimeError("update needs ctgan >= {}.{}, < {}.{}, found {}".format(
+                *ctgan_versions[0],*ctgan_versions[1],metadata.version('ctgan')))
+        table = self._metadata.transform(data)
+        if replay:
+            table = pd.concat([table,self._model.sample(int(len(table)*replay))[table.columns]],ignore_index=True)
+        trainer = self.trainer or Trainer(type(self._model).__name__.lower())
+        trainer.fine_tune(self._model,table,epochs)
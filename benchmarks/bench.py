@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pandas,numpy,os"
+# ---------------------------------------------------------------------------
+""" Contains the performance benchmarks: wall time, throughput and peak RSS of
+fit, sample, noise and table I/O for every generator at several data sizes,
+saved as JSON and compared against a stored baseline. """
+# ---------------------------------------------------------------------------
+
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(here,'..','Synthetic_Data_Generation'))
+sys.path.append(os.path.join(here,'..','Noise'))
+sys.path.append(here)
+
+
+"""
+Usage Example :
+python bench.py --sizes 10000 100000 --stages io noise gcopula
+python bench.py --sizes 10000 --stages ctgan --epochs 1 5 --batch-sizes 500 --save-baseline
+python bench.py --compare baseline.json --tolerance 0.2
+"""
+
+
+stages = ['io','noise','gcopula','ctgan','tvae','bayes']
+default_sizes = [10000,100000,1000000]
+baseline_path = os.path.join(here,'baseline.json')
+results_dir = os.path.join(here,'results')
+
+
+def rss_mb():
+
+    # Peak resident set size of this process so far (ru_maxrss is in KB on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+
+class Timer:
+
+    # Appends one result per timed block: seconds, rows/s and the process peak RSS
+    # at the end of the block (every case runs in a fresh process)
+
+    def __init__(self,case,results):
+
+        self.case = case
+        self.results = results
+
+    def __call__(self,op,rows,**extra):
+
+        self.op, self.rows, self.extra = op, rows, extra
+        return self
+
+    def __enter__(self):
+
+        self.t = time.perf_counter()
+        return self
+
+    def __exit__(self,*exc):
+
+        seconds = time.perf_counter()-self.t
+        if exc[0] is None:
+            self.results.append({**self.case,'op':self.op,'rows':self.rows,**self.extra,'seconds':seconds,
+                                 'rows_per_s':self.rows/seconds if seconds > 0 else None,'peak_rss_mb':rss_mb()})
+
+
+def bench_io(timer,data,n):
+
+    from DataIO import read_table, write_table, iter_table
+    from Schema import load_data
+    df = load_data(data)
+    for fmt in ('feather','parquet','csv'):
+        path = "table."+fmt
+        with timer('write_'+fmt,n):
+            write_table(df,path)
+        with timer('read_'+fmt,n):
+            read_table(path)
+        with timer('iter_'+fmt,n):
+            for _ in iter_table(path,65536):
+                pass
+
+
+def bench_noise(timer,data,n):
+
+    from Noise import Noise
+    from DataIO import write_table
+    from Schema import load_data
+    write_table(load_data(data).head(0),"synth.feather")
+    noise = Noise()
+    with timer('fit',n):
+        noise.fit(data)
+    with timer('transform',n,p=0.9,noise=1):
+        noise.transform("synth.feather",0.9,1,seed=0)
+    with timer('transform_chunked',n,p=0.9,noise=1):
+        noise.transform("synth.feather",0.9,1,seed=0,chunksize=65536)
+
+
+def bench_sdv(timer,data,n,generator,epochs,batch_size):
+
+    from Schema import load_data
+    df = load_data(data)
+    if generator == 'gcopula':
+        from GCopula import GCopula
+        gen = GCopula(df,save=False,cache=False)
+        gen.fit()
+        params = {}
+    else:
+        if generator == 'ctgan':
+            from CtGan import CtGan as backend
+        else:
+            from TVAE import TVae as backend
+        gen = backend(df,save=False,cache=False)
+        gen.fit(epochs=epochs,bs=batch_size)
+        params = {'epochs':epochs,'batch_size':batch_size}
+    with timer('fit',n,**params):
+        gen.fitted_model()
+    with timer('sample',n,**params):
+        for _ in gen.iter_samples(n,10000):
+            pass
+
+
+def bayes_share(data):
+
+    import pandas as pd
+    return pd.read_csv(data,usecols=['T'])['T'].mean()
+
+
+def bench_bayes(timer,data,n,epsilon,k):
+
+    from BAYES import BAYES
+    bayes = BAYES(data,save=False)
+    with timer('fit',n,epsilon=epsilon,k=k):
+        bayes.fit(epsilon=epsilon,k=k)
+    with timer('sample',n,epsilon=epsilon,k=k):
+        ones = int(bayes_share(data)*n)
+        bayes.transform(onesamples=ones,zerosamples=n-ones)
+
+
+def run_case(case,queue):
+
+    # Child process entry, runs one (stage, size, settings) case in a scratch directory
+    results = []
+    timer = Timer(case,results)
+    try:
+        os.environ.setdefault('OMP_NUM_THREADS',str(case['threads']))
+        os.chdir(tempfile.mkdtemp(prefix="bench_"))
+        for d in ('synthdata','bayes_temp'):
+            os.makedirs(d,exist_ok=True)
+        stage, data, n = case['stage'], case['data'], case['size']
+        if stage == 'io':
+            bench_io(timer,data,n)
+        elif stage == 'noise':
+            bench_noise(timer,data,n)
+        elif stage == 'bayes':
+            bench_bayes(timer,data,n,case['epsilon'],case['k'])
+        else:
+            bench_sdv(timer,data,n,stage,case.get('epochs'),case.get('batch_size'))
+        queue.put(('ok',results))
+    except ImportError as e:
+        queue.put(('skipped',results+[{**case,'status':'skipped','error':str(e)}]))
+    except Exception as e:
+        queue.put(('failed',results+[{**case,'status':'failed','error':"{}: {}".format(type(e).__name__,e)}]))
+
+
+def cases(args):
+
+    from make_data import data_path
+    out = []
+    for n in args.sizes:
+        data = data_path(n,args.seed)
+        base = {'size':n,'data':data,'threads':args.threads}
+        for stage in args.stages:
+            if stage in ('ctgan','tvae'):
+                for epochs in args.epochs:
+                    for bs in args.batch_sizes:
+                        out.append({**base,'stage':stage,'epochs':epochs,'batch_size':bs})
+            elif stage == 'bayes':
+                out.append({**base,'stage':stage,'epsilon':args.epsilon,'k':args.k})
+            else:
+                out.append({**base,'stage':stage})
+    return out
+
+
+def run(args):
+
+    # Every case in a fresh spawned process, so peak RSS belongs to that case alone
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for case in cases(args):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run_case,args=(case,queue))
+        proc.start()
+        proc.join(args.timeout)
+        if proc.is_alive():
+            proc.kill()
+            proc.join()
+            rows = [{**case,'status':'timeout'}]
+        elif queue.empty():
+            rows = [{**case,'status':'failed','error':"exited with code {}".format(proc.exitcode)}]
+        else:
+            rows = queue.get()[1]
+        results.extend(rows)
+        for r in rows:
+            print(result_key(r),r.get('status') or "{:.3f} s {:.0f} MB".format(r['seconds'],r['peak_rss_mb']),r.get('error',''))
+    return results
+
+
+def result_key(r):
+
+    keys = ('stage','op','size','epochs','batch_size','epsilon','k')
+    return "|".join("{}={}".format(k,r[k]) for k in keys if r.get(k) is not None)
+
+
+def compare(results,baseline,tolerance,min_seconds=0.1):
+
+    # A result regresses when its time or peak RSS grows by more than tolerance,
+    # timings under min_seconds are too noisy to compare
+    base = {result_key(r):r for r in baseline['results'] if r.get('seconds') is not None}
+    flagged = []
+    for r in results:
+        b = base.get(result_key(r))
+        if b is None or r.get('seconds') is None:
+            continue
+        for metric in ('seconds','peak_rss_mb'):
+            if metric == 'seconds' and b[metric] < min_seconds:
+                continue
+            if b[metric] and r[metric] > b[metric]*(1+tolerance):
+                flagged.append({'case':result_key(r),'metric':metric,'baseline':b[metric],
+                                'current':r[metric],'change':r[metric]/b[metric]-1})
+    return flagged
+
+
+def environment():
+
+    from ModelCache import package_versions
+    return {'python':platform.python_version(),'platform':platform.platform(),
+            'machine':platform.machine(),'cpus':os.cpu_count(),'versions':package_versions(),
+            'created':time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Benchmark fit, sample, noise and I/O")
+    parser.add_argument('--sizes',type=int,nargs='+',default=default_sizes)
+    parser.add_argument('--stages',nargs='+',choices=stages,default=stages)
+    parser.add_argument('--epochs',type=int,nargs='+',default=[1])
+    parser.add_argument('--batch-sizes',type=int,nargs='+',default=[500])
+    parser.add_argument('--epsilon',type=float,default=1.0)
+    parser.add_argument('--k',type=int,default=2)
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--threads',type=int,default=os.cpu_count())
+    parser.add_argument('--timeout',type=float,default=None,help="seconds per case")
+    parser.add_argument('--out',help="results file, defaults to results/<timestamp>.json")
+    parser.add_argument('--compare',nargs='?',const=baseline_path,help="baseline to compare with")
+    parser.add_argument('--tolerance',type=float,default=0.2)
+    parser.add_argument('--min-seconds',type=float,default=0.1)
+    parser.add_argument('--save-baseline',action='store_true')
+    args = parser.parse_args(argv)
+
+    report = {'environment':environment(),'results':run(args)}
+    out = args.out or os.path.join(results_dir,time.strftime("%Y%m%d_%H%M%S")+".json")
+    os.makedirs(os.path.dirname(out),exist_ok=True)
+    with open(out,'w') as f:
+        json.dump(report,f,indent=1,default=str)
+    print("Results :",out)
+    if args.save_baseline:
+        with open(baseline_path,'w') as f:
+            json.dump(report,f,indent=1,default=str)
+        print("Baseline :",baseline_path)
+
+    if args.compare:
+        with open(args.compare) as f:
+            flagged = compare(report['results'],json.load(f),args.tolerance,args.min_seconds)
+        for r in flagged:
+            print("REGRESSION {case} {metric}: {baseline:.3f} -> {current:.3f} ({change:+.0%})".format(**r))
+        if flagged:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "subprocess,json,os"
+# ---------------------------------------------------------------------------
+""" Contains the import time check: every import below runs in a fresh process,
+and the check fails (exit code 1) when one takes longer than its budget or loads
+a heavy dependency it should only load on first use. """
+# ---------------------------------------------------------------------------
+
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+here = os.path.dirname(os.path.abspath(__file__))
+root = os.path.normpath(os.path.join(here,'..'))
+
+
+"""
+Usage Example :
+python import_budget.py
+python import_budget.py --repeat 5 --scale 2
+python -m pytest tests/test_import_budget.py    (runs main([]) as a test)
+"""
+
+
+# Dependencies loaded by fitting or sampling, never by an import
+heavy = ['sdv','ctgan','copulas','rdt','torch','DataSynthesizer','sklearn']
+
+# Statement : (seconds, modules it must not load). The backends pay for pandas (about
+# 0.4 s) and nothing more, the package itself for nothing but its own file.
+budgets = {
+    "import synthgen":                              (0.05,heavy+['pandas','numpy']),
+    "import synthgen; synthgen.__dir__()":          (0.05,heavy+['pandas','numpy']),
+    "import synthgen; synthgen.CtGan":              (1.0,heavy),
+    "import synthgen; synthgen.CtGan_ts":           (1.0,heavy),
+    "import synthgen; synthgen.TVae":               (1.0,heavy),
+    "import synthgen; synthgen.GCopula":            (1.0,heavy),
+    "import synthgen; synthgen.BAYES":              (1.0,heavy),
+    "import synthgen; synthgen.Noise":              (1.0,heavy),
+    "import synthgen; synthgen.Orchestrator":       (1.0,heavy),
+    "import synthgen; synthgen.SamplingServer":     (1.0,heavy),
+    "import synthgen; synthgen.ModelCache":         (1.0,heavy),
+}
+
+# Runs in the fresh process : seconds taken by the statement and the heavy modules loaded
+probe = """
+import json, sys, time
+sys.path.insert(0,{root!r})
+t = time.perf_counter()
+exec({statement!r})
+seconds = time.perf_counter()-t
+print(json.dumps({{'seconds':seconds,'loaded':[m for m in {watch!r} if m in sys.modules]}}))
+"""
+
+
+def measure(statement,watch,repeat):
+
+    # Fastest of repeat fresh processes, the loaded modules do not change between runs
+    best = None
+    for _ in range(repeat):
+        code = probe.format(root=root,statement=statement,watch=watch)
+        out = subprocess.run([sys.executable,'-c',code],capture_output=True,text=True,cwd=root)
+        if out.returncode:
+            raise RuntimeError("{} failed :\n{}".format(statement,out.stderr))
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    return best
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Check import times against their budgets")
+    parser.add_argument('--repeat',type=int,default=3)
+    parser.add_argument('--scale',type=float,default=1.0,help="multiplies every budget, for slow machines")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for statement, (budget, forbidden) in budgets.items():
+        result = measure(statement,forbidden,args.repeat)
+        over = result['seconds'] > budget*args.scale
+        status = "FAIL" if over or result['loaded'] else "ok"
+        failed += status == "FAIL"
+        print("{:4} {:7.3f}s / {:5.2f}s  {}{}".format(status,result['seconds'],budget*args.scale,statement,
+                                                     "  loaded "+",".join(result['loaded']) if result['loaded'] else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
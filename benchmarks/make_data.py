@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pandas,numpy,os"
+# ---------------------------------------------------------------------------
+""" Contains a seeded generator of stand-in "real" data with the project's
+11 column schema, meeting every constraint in Schema. """
+# ---------------------------------------------------------------------------
+
+
+import pandas as pd
+import numpy as np
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','Synthetic_Data_Generation'))
+from Schema import features, coerce
+
+
+"""
+Usage Example :
+python make_data.py 100000 --seed 0 --out data/real_100000_s0.csv
+"""
+
+
+# Category levels and frequencies of the masked columns
+levels = {
+    'IP':  (['ip_a','ip_b','ip_c','ip_d'],[0.4,0.3,0.2,0.1]),
+    'SNS': (['x1','x2'],[0.6,0.4]),
+    'RL':  (['r1','r2','r3','r4','r5'],[0.35,0.25,0.2,0.15,0.05]),
+    'OS':  (['lin','mac','win'],[0.3,0.2,0.5]),
+}
+
+
+def make_data(n,seed=0):
+
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'I':np.arange(n)})
+    df['MT'] = rng.gamma(2.0,3.0,n)
+    for c, (values,p) in levels.items():
+        df[c] = rng.choice(values,n,p=p)
+    # AC != 0 forces C to 19 (non zero multiple of 19, C <= 19), otherwise C is free below 19
+    ac = (rng.random(n) < 0.25).astype(np.int64)
+    u = rng.random(n)
+    c = np.where((ac == 1) | ((u >= 0.5) & (u < 0.9)),19,np.where(u < 0.5,0,rng.integers(1,19,n)))
+    df['C'] = c
+    df['AC'] = ac
+    # WC and E never exceed C
+    df['WC'] = np.floor(c*rng.beta(2,5,n)).astype(np.int64)
+    df['E'] = np.floor(c*rng.beta(1,3,n)).astype(np.int64)
+    # T depends on MT, OS and E so classifiers have something to learn, about 90% ones
+    logit = 2.6-0.08*(df['MT']-6)+0.5*(df['OS'] == 'lin')-0.1*df['E']
+    df['T'] = (rng.random(n) < 1/(1+np.exp(-logit))).astype(np.int64)
+    return coerce(df[features])
+
+
+def data_path(n,seed=0,data_dir=None):
+
+    # Cached CSV of make_data(n, seed), written on first use
+    data_dir = data_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)),'data')
+    path = os.path.join(data_dir,"real_{}_s{}.csv".format(n,seed))
+    if not os.path.isfile(path):
+        os.makedirs(data_dir,exist_ok=True)
+        tmp = path+".tmp"
+        make_data(n,seed).to_csv(tmp,index=False)
+        os.replace(tmp,path)
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Write seeded stand-in real data")
+    parser.add_argument('rows',type=int)
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--out')
+    args = parser.parse_args()
+    if args.out:
+        make_data(args.rows,args.seed).to_csv(args.out,index=False)
+        print(args.out)
+    else:
+        print(data_path(args.rows,args.seed))
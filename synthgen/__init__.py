@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "os,sys,importlib"
+# ---------------------------------------------------------------------------
+""" Contains the package entry point over the generators, the noise baseline and
+the evaluation modules. Every name is imported from its module on first access,
+so importing the package loads nothing but this file. """
+# ---------------------------------------------------------------------------
+
+
+import importlib
+import os
+import sys
+
+here = os.path.dirname(os.path.abspath(__file__))
+# Folders of the modules behind the names below. They import each other by bare
+# name, as when run from their own folder, so use_folders puts them on sys.path the
+# first time a name is used (or python -m synthgen runs), importing the package
+# alone leaves sys.path as it is.
+folders = [os.path.normpath(os.path.join(here,'..',folder)) for folder in ('Synthetic_Data_Generation','Noise')]
+
+
+"""
+Usage Example :
+import synthgen
+gcopula = synthgen.GCopula("Data/data.csv",overwrite=False,save=True)
+synth = gcopula.fit_transform(samples=56070)
+
+python -m synthgen generate gcopula Data/data.csv --param samples=56070
+python -m synthgen grid run grid.json --processes 4
+python -m synthgen serve --model ctgan=<cache key>
+"""
+
+
+# Public name : (module, attribute). sdv, torch, DataSynthesizer and sklearn load with
+# the module that needs them, the first time one of its names is used
+exports = {
+    'CtGan':          ('CtGan','CtGan'),
+    'CtGan_ts':       ('CtGan','CtGan_ts'),
+    'TVae':           ('TVAE','TVae'),
+    'GCopula':        ('GCopula','GCopula'),
+    'BAYES':          ('BAYES','BAYES'),
+    'BayesSampler':   ('BayesSampler','BayesSampler'),
+    'Noise':          ('Noise','Noise'),
+    'Stratified':     ('Stratified','Stratified'),
+    'Evaluate':       ('Evaluate','Evaluate'),
+    'Fidelity':       ('Fidelity','Fidelity'),
+    'Privacy':        ('Privacy','Privacy'),
+    'Orchestrator':   ('Orchestrator','Orchestrator'),
+    'ModelCache':     ('ModelCache','ModelCache'),
+    'datasets':       ('DataCache','datasets'),
+    'SamplingServer': ('Server','SamplingServer'),
+    'request_rows':   ('Server','request_rows'),
+    'load_data':      ('Schema','load_data'),
+    'coerce':         ('Schema','coerce'),
+    'read_table':     ('DataIO','read_table'),
+    'write_table':    ('DataIO','write_table'),
+    'configure':      ('Instrument','configure'),
+    'add_sink':       ('Instrument','add_sink'),
+    'MemorySink':     ('Instrument','MemorySink'),
+    'JsonlSink':      ('Instrument','JsonlSink'),
+}
+
+__all__ = sorted(exports)
+
+
+def use_folders():
+
+    for path in folders:
+        if path not in sys.path:
+            sys.path.append(path)
+
+
+def __getattr__(name):
+
+    if name not in exports:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__,name))
+    use_folders()
+    module, attr = exports[name]
+    value = getattr(importlib.import_module(module),attr)
+    # Later lookups find the name directly and skip this function
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+
+    return sorted(set(globals())|set(exports))
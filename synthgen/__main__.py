@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "argparse,json"
+# ---------------------------------------------------------------------------
+""" Contains the command line entry point : python -m synthgen <command>. Each
+command imports only the modules it runs. """
+# ---------------------------------------------------------------------------
+
+
+import argparse
+import json
+import synthgen
+
+
+"""
+Usage Example :
+python -m synthgen generate ctgan Data/data.csv --param epochs=1 --param bs=10 --param samples=56070
+python -m synthgen generate noise Data/data.csv --param synth_data_path=synthdata/noise.feather --param p=0.9
+python -m synthgen grid run grid.json --processes 4
+python -m synthgen grid status
+python -m synthgen serve --model ctgan=<cache key> --port 8765
+"""
+
+
+def parse_param(raw):
+
+    # name=value, the value read as JSON when it is one (1, 0.5, true, [1,2]) and as text otherwise
+    name, value = raw.split("=",1)
+    try:
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+
+def generate(argv):
+
+    from Orchestrator import generators, run_generator
+    parser = argparse.ArgumentParser(prog="synthgen generate",description="Fit one generator and write its synthetic table")
+    parser.add_argument('generator',choices=sorted(generators))
+    parser.add_argument('real_data')
+    parser.add_argument('--param',action='append',default=[],metavar="NAME=VALUE",
+                        help="fit_transform argument, repeated for each one")
+    args = parser.parse_args(argv)
+    print(run_generator(args.generator,args.real_data,dict(parse_param(p) for p in args.param)))
+
+
+def grid(argv):
+
+    from Orchestrator import main
+    main(argv)
+
+
+def serve(argv):
+
+    from Server import main
+    main(argv)
+
+
+commands = {'generate':generate,'grid':grid,'serve':serve}
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog="synthgen",description="Synthetic data generators")
+    parser.add_argument('command',choices=sorted(commands),
+                        help="generate : one generator, grid : Orchestrator grid runs, serve : sampling server")
+    parser.add_argument('args',nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+    # The commands import the modules by bare name
+    synthgen.use_folders()
+    commands[args.command](args.args)
+
+
+if __name__ == "__main__":
+    main()
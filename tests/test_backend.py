@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pytest,pandas,numpy"
+# ---------------------------------------------------------------------------
+""" Contains the tests of the shared base of the SDV backed generators, run
+against a stub model : cached fits, saved output and updates. """
+# ---------------------------------------------------------------------------
+
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','Synthetic_Data_Generation'))
+from Backend import SDVBackend, EpochBackend
+from ModelCache import ModelCache
+from Instrument import MemorySink, add_sink, remove_sink
+from Schema import features, coerce
+
+
+"""
+Usage Example :
+python -m pytest tests/test_backend.py -q
+"""
+
+
+class ResampleModel:
+
+    # Stands in for an sdv model : sample draws rows of the fitted data
+
+    fits = 0
+
+    def fit(self,data):
+
+        ResampleModel.fits += 1
+        self.data = data.reset_index(drop=True)
+
+    def sample(self,num_rows):
+
+        return self.data.sample(num_rows,replace=True,random_state=num_rows).reset_index(drop=True)
+
+
+class Resample(SDVBackend):
+
+    name = 'resample'
+
+    def fit(self,seed=0):
+
+        self.fit_args = {'seed':seed}
+        self.tag = ""
+        self.updates = 0
+        self.resample = ResampleModel()
+        self.key = self.cache.key(self.name,self.data,{'seed':seed}) if self.cache else None
+        self.fitted = False
+
+    def fit_info(self):
+
+        return {}
+
+    def synth_name(self):
+
+        return "synthdata/resample_s_{}{}".format(self.samples,self.tag)
+
+    def warm_update(self,model,new):
+
+        model.data = pd.concat([model.data,new],ignore_index=True)
+
+
+def frame(n=60,seed=0):
+
+    rng = np.random.default_rng(seed)
+    c = rng.choice([0,19],n)
+    return coerce(pd.DataFrame({'I':np.arange(n),'MT':rng.gamma(2.0,3.0,n),
+                                'IP':rng.choice(['ip_a','ip_b','ip_c'],n),'SNS':rng.choice(['x1','x2'],n),
+                                'RL':rng.choice(['r1','r2'],n),'OS':rng.choice(['lin','win'],n),
+                                'C':c,'AC':(c > 0).astype(int),'WC':rng.integers(0,19,n)*(c > 0),
+                                'E':rng.integers(0,19,n)*(c > 0),'T':rng.integers(0,2,n)})[features])
+
+
+def test_fit_once_and_saved_output(tmp_path):
+
+    cache = ModelCache(str(tmp_path/"cache"))
+    path = str(tmp_path/"synth.csv")
+    ResampleModel.fits = 0
+    gen = Resample(frame(),cache=cache)
+    gen.fit()
+    synth = gen.transform(25,path)
+    assert len(synth) == 25 and list(synth.columns) == features
+    assert synth['I'].tolist() == list(range(25))
+    # Same data and settings : the model and the saved table are reused
+    again = Resample(frame(),cache=cache)
+    again.fit()
+    pd.testing.assert_frame_equal(again.transform(25,path),synth,check_dtype=False)
+    assert ResampleModel.fits == 1 and not again.fitted
+    assert again.sample_to_file(str(tmp_path/"more.csv"),30,batch_size=7) == 30
+    assert ResampleModel.fits == 1 and again.resample is again.model
+
+
+def test_training_settings_in_the_key(tmp_path):
+
+    pytest.importorskip("sdv")
+
+    class Epochs(EpochBackend):
+        name = 'ctgan'
+        def build(self,**options):
+            return ResampleModel()
+
+    fits = {}
+    for name, settings in [('plain',{}),('checkpoints',{'checkpoint_every':5}),
+                           ('fidelity',{'monitor':'fidelity'}),('patience',{'patience':3})]:
+        gen = Epochs(frame(),cache=ModelCache(str(tmp_path)))
+        gen.fit(**settings)
+        fits[name] = (gen.key,gen.tag)
+    # Checkpoints leave the model unchanged, the held out slice of 'fidelity' does not
+    assert fits['checkpoints'] == fits['plain'] and fits['plain'][1] == ""
+    assert len({fits[n][0] for n in ['plain','fidelity','patience']}) == 3
+    assert fits['fidelity'][1] == "_p_None_fidelity" and fits['patience'][1] == "_p_3_loss"
+
+
+def test_update_and_refit(tmp_path):
+
+    events = add_sink(MemorySink())
+    try:
+        gen = Resample(frame(40),cache=ModelCache(str(tmp_path)))
+        gen.fit()
+        parent = gen.key
+        model = gen.update(frame(10,seed=1))
+        # Folded into the fitted model, keyed by its parent and the new rows
+        assert model is gen.resample and len(model.data) == 50 and len(gen.data) == 50
+        assert gen.key != parent and gen.tag == "_u_1"
+        new = frame(5,seed=2)
+        new['OS'] = pd.Categorical(['mac']*5)
+        gen.update(new)
+        # An unseen category refits on every row
+        assert 'refit' in events.stages('resample')
+        assert len(gen.data) == 55 and len(gen.fitted_model().data) == 55 and gen.tag == ""
+    finally:
+        remove_sink(events)
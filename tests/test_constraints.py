@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pytest,pandas,numpy"
+# ---------------------------------------------------------------------------
+""" Contains the tests of the constraint engine : the order of the repairs,
+clipping to the bounds and the rows it rejects. """
+# ---------------------------------------------------------------------------
+
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','Synthetic_Data_Generation'))
+from Constraints import ConstraintEngine, ConstraintReport, repair_order, bound_value, constraint_name
+
+
+"""
+Usage Example :
+python -m pytest tests/test_constraints.py -q
+"""
+
+
+def rows(**columns):
+
+    return pd.DataFrame({c:np.array(v,dtype='int16') for c,v in columns.items()})
+
+
+def test_repairs_run_before_the_constraints_reading_their_column():
+
+    engine = ConstraintEngine()
+    # C is written by its bound and by multiple_of, E and WC are clipped to it after
+    assert engine.names == ['C<=19','C%19|AC','E<=C','WC<=C']
+    # Ties keep the order of the definitions, a cycle starts with the first one
+    ties = [{'kind':'scalar_inequality','column':c,'relation':'<','value':1} for c in 'ab']
+    assert repair_order(ties) == ties
+    cycle = [{'kind':'inequality','low':'a','high':'b'},{'kind':'inequality','low':'b','high':'a'}]
+    assert [constraint_name(c) for c in repair_order(cycle)] == ['a<=b','b<=a']
+
+
+def test_clipping_to_the_repaired_column():
+
+    engine = ConstraintEngine()
+    df = rows(C=[40,25,19,0,7],AC=[1,1,1,0,1],WC=[3,30,20,5,2],E=[35,22,1,0,9])
+    out = engine.repair(df)
+    # C is clipped to 19 before E and WC are clipped to it, C=0 with AC=0 is excluded
+    # from multiple_of, WC=5 > C=0 is clipped to 0, C=7 goes to the nearest multiple
+    assert out['C'].tolist() == [19,19,19,0,19]
+    assert out['E'].tolist() == [19,19,1,0,9]
+    assert out['WC'].tolist() == [3,19,19,0,2]
+    assert engine.is_valid(out).all()
+    assert all(out[c].dtype == np.int16 for c in out.columns)
+
+
+@pytest.mark.parametrize('relation,dtype,expected',[('<=','int16',19),('<','int16',18),('>','int16',20),
+                                                    ('<','float64',np.nextafter(19.0,-np.inf)),('>=','float64',19.0)])
+def test_bounds(relation,dtype,expected):
+
+    assert bound_value(19,relation,np.dtype(dtype)) == expected
+    c = {'kind':'scalar_inequality','column':'x','relation':relation,'value':19}
+    engine = ConstraintEngine([c])
+    out = engine.repair(pd.DataFrame({'x':np.array([0,19,40,-40],dtype=dtype)}))
+    assert engine.is_valid(out).all()
+    # Only the rows breaking the bound move, and only onto it
+    breaking = ~engine.is_valid(pd.DataFrame({'x':np.array([0,19,40,-40],dtype=dtype)}))
+    assert (out['x'].to_numpy()[breaking] == expected).all()
+
+
+def test_unrepairable_rows_are_rejected_and_counted():
+
+    engine = ConstraintEngine()
+    report = ConstraintReport(engine.names)
+    df = rows(C=[-19,38,19],AC=[1,1,1],WC=[0,0,0],E=[0,0,0])
+    out = engine.repair(df,report)
+    # A non positive C cannot be made a multiple of 19
+    assert out['C'].tolist() == [19,19]
+    counts = report.counts
+    assert counts['C<=19'] == {'rows':3,'invalid':1,'repaired':1,'rejected':0}
+    assert counts['C%19|AC'] == {'rows':3,'invalid':1,'repaired':0,'rejected':1}
+    assert report.rates()['C%19|AC']['rejected'] == pytest.approx(1/3)
+    # Missing values are valid, as in SDV
+    floats = pd.DataFrame({'C':[np.nan,40.0],'AC':[1,1],'WC':[0.0,0.0],'E':[0.0,np.nan]})
+    out = engine.repair(floats)
+    assert np.isnan(out['C'].iloc[0]) and out['C'].iloc[1] == 19.0
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pytest,sdv,pandas,numpy"
+# ---------------------------------------------------------------------------
+""" Contains the tests of the CTGAN generator that need sdv : exact rows per
+class of T from one fitted model. """
+# ---------------------------------------------------------------------------
+
+
+import os
+import sys
+import pytest
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(here,'..','Synthetic_Data_Generation'))
+sys.path.append(here)
+pytest.importorskip("sdv")
+from CtGan import CtGan
+from Sampling import ctgan_discrete
+from test_backend import frame
+
+
+"""
+Usage Example :
+python -m pytest tests/test_ctgan.py -q
+"""
+
+
+def test_quotas_per_class_from_one_model():
+
+    ctgan = CtGan(frame(200),save=False,cache=False)
+    ctgan.fit(epochs=1,bs=20)
+    model = ctgan.fitted_model()
+    # T is a discrete column, rows of a class come from ctgan's condition vector
+    assert ctgan_discrete(model._model,'T')
+    synth = ctgan.sample_counts({0:37,1:52},batch_size=25)
+    assert len(synth) == 89 and synth['T'].value_counts().to_dict() == {0:37,1:52}
+    assert synth['I'].tolist() == list(range(89))
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pytest,pandas,numpy"
+# ---------------------------------------------------------------------------
+""" Contains the tests of the shared dataset cache: splits on numeric and
+categorical columns, and frames that callers can change without touching the
+shared rows. """
+# ---------------------------------------------------------------------------
+
+
+import os
+import pickle
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','Synthetic_Data_Generation'))
+import DataCache
+from DataCache import DataCache as Cache, split_frame
+
+
+"""
+Usage Example :
+python -m pytest tests/test_data_cache.py -q
+"""
+
+
+def frame(n=30):
+
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'a':rng.integers(0,5,n),'b':rng.random(n),
+                         's':pd.Categorical(rng.choice(['lin','mac','win'],n)),
+                         't':rng.integers(0,2,n).astype('int8')})
+
+
+@pytest.mark.parametrize('column',['t','s','a'])
+def test_split_keys_and_rows(column):
+
+    df = frame()
+    parts = split_frame(df,column)
+    assert sorted(parts) == sorted(df[column].unique().tolist())
+    for value, part in parts.items():
+        assert type(value) in (int,str)
+        rows = df[df[column] == value].reset_index(drop=True)
+        pd.testing.assert_frame_equal(part.frame.reset_index(drop=True),rows)
+
+
+def test_split_of_a_file_on_a_categorical_column(tmp_path):
+
+    path = str(tmp_path/"data.csv")
+    frame().to_csv(path,index=False)
+    cache = Cache()
+    monkey = lambda path: pd.read_csv(path).astype({'s':'category'})
+    DataCache.load_data, saved = monkey, DataCache.load_data
+    try:
+        parts = cache.split(path,'s')
+        assert sorted(parts) == ['lin','mac','win']
+        assert sum(len(p) for p in parts.values()) == 30
+        # Computed once per file
+        assert cache.split(path,'s') is parts
+    finally:
+        DataCache.load_data = saved
+
+
+@pytest.mark.parametrize('views',[True,False])
+def test_frames_can_be_changed_in_place(monkeypatch,views):
+
+    monkeypatch.setattr(DataCache,'shared_views',views)
+    shared = DataCache.SharedFrame.from_frame(frame())
+    first = shared.frame
+    first.loc[0,'a'] = 99
+    first['b'] *= 2
+    second = shared.frame
+    assert second.loc[0,'a'] != 99
+    pd.testing.assert_frame_equal(second,frame())
+    # Frames sent to another process are as writable
+    attached = pickle.loads(pickle.dumps(shared))
+    attached.loc[1,'a'] = 99
+    pd.testing.assert_frame_equal(shared.frame,frame())
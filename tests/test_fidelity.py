@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pytest,pandas,numpy"
+# ---------------------------------------------------------------------------
+""" Contains the tests of the fidelity metrics on a tiny table whose values are
+worked out by hand, and of the summaries they are built from. """
+# ---------------------------------------------------------------------------
+
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','Synthetic_Data_Generation'))
+from Fidelity import Fidelity, BinSpec, Summary, cramers_v
+from Schema import features, coerce
+
+
+"""
+Usage Example :
+python -m pytest tests/test_fidelity.py -q
+"""
+
+
+def table(**changes):
+
+    # 8 rows, IP follows T, MT is 1 .. 8 (quartile edges 2.75, 4.5, 6.25 with bins=4)
+    t = [0,1]*4
+    df = pd.DataFrame({'I':range(8),'MT':np.arange(1.0,9.0),'IP':['a' if v == 0 else 'b' for v in t],
+                       'SNS':'x','RL':'r','OS':'o','C':[0,19]*4,'AC':[0,1]*4,'WC':[0,3]*4,'E':[0,5]*4,'T':t})
+    df = df.assign(**changes)
+    return coerce(df[features])
+
+
+def fidelity(tmp_path,synth):
+
+    real_path, synth_path = str(tmp_path/"real.csv"), str(tmp_path/"synth.csv")
+    table().to_csv(real_path,index=False)
+    synth.to_csv(synth_path,index=False)
+    # chunksize 3 : the synthetic summary is merged from three chunks
+    fid = Fidelity(real_path,bins=4,chunksize=3)
+    results = fid.fit_transform(paths=[synth_path])
+    details = fid.details[synth_path]
+    return results.iloc[0], details['columns'].set_index('column'), details['pairs'].set_index('pair')
+
+
+def test_identical_tables(tmp_path):
+
+    results, cols, pairs = fidelity(tmp_path,table())
+    assert results['rows'] == 8
+    for metric in ['tvd_mean','ks_mean','ks_max','association_diff_mean','joint_tvd_mean']:
+        assert results[metric] == pytest.approx(0.0,abs=1e-12)
+    # IP follows T exactly, AC is C/19
+    assert pairs.loc['IP:T','real'] == pytest.approx(1.0)
+    assert pairs.loc['C:AC','measure'] == 'pearson' and pairs.loc['C:AC','real'] == pytest.approx(1.0)
+
+
+def test_hand_computed_metrics(tmp_path):
+
+    ip = ['b']+['a' if v == 0 else 'b' for v in [1,0,1,0,1,0,1]]
+    results, cols, pairs = fidelity(tmp_path,table(MT=0.0,IP=ip))
+    # MT : real quarters [.25,.25,.25,.25], every synthetic row in the first bin
+    assert cols.loc['MT','tvd'] == pytest.approx(0.75)
+    assert cols.loc['MT','ks'] == pytest.approx(0.75)
+    # IP : a 4 -> 3, b 4 -> 5
+    assert cols.loc['IP','tvd'] == pytest.approx(0.125)
+    assert np.isnan(cols.loc['IP','ks'])
+    for c in ['SNS','C','E','T']:
+        assert cols.loc[c,'tvd'] == 0.0
+    # IP:T, the moved row goes to the cell (b,0)
+    v = cramers_v(np.array([[3,0],[1,4]]))
+    assert v == pytest.approx(np.sqrt(0.6))
+    assert pairs.loc['IP:T','synth'] == pytest.approx(v)
+    assert pairs.loc['IP:T','difference'] == pytest.approx(1.0-v)
+    assert pairs.loc['IP:T','joint_tvd'] == pytest.approx(0.125)
+    # A constant synthetic MT has no correlation
+    assert np.isnan(pairs.loc['MT:C','synth'])
+    # Averages leave the id column out
+    assert results['tvd_mean'] == pytest.approx(cols.drop(index='I')['tvd'].mean())
+
+
+def test_cramers_v():
+
+    assert cramers_v(np.array([[2,0],[0,2]])) == pytest.approx(1.0)
+    assert cramers_v(np.array([[1,1],[1,1]])) == 0.0
+    # chi2 = 8*(3*4-1*0)**2/(4*4*3*5) = 4.8, V = sqrt(4.8/8)
+    assert cramers_v(np.array([[3,1],[0,4]])) == pytest.approx(np.sqrt(0.6))
+    # Empty rows and columns are dropped, a single category has no association
+    assert cramers_v(np.array([[2,0,0],[0,0,0],[0,0,3]])) == pytest.approx(1.0)
+    assert cramers_v(np.array([[5,3]])) == 0.0
+
+
+def test_summaries_merge_and_round_trip(tmp_path):
+
+    spec = BinSpec(table(),bins=4)
+    whole = Summary(spec).update(table())
+    merged = Summary(spec).update(table().iloc[:5]).merge(Summary(spec).update(table().iloc[5:]))
+    path = str(tmp_path/"summary.npz")
+    merged.save(path)
+    loaded = Summary.load(path)
+    for stats in [merged,loaded]:
+        assert stats.n == whole.n and stats.m == whole.m
+        assert all((stats.counts[c] == whole.counts[c]).all() for c in spec.columns)
+        assert all((stats.tables[p] == whole.tables[p]).all() for p in spec.pairs)
+        np.testing.assert_allclose(stats.xx,whole.xx)
+    assert loaded.spec.to_dict() == spec.to_dict()
+    # Unseen categories and missing values get the last code
+    codes = spec.codes(table(IP=['z']*8,MT=np.nan),'IP'), spec.codes(table(MT=np.nan),'MT')
+    assert codes[0].tolist() == [2]*8 and codes[1].tolist() == [4]*8
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pytest,subprocess"
+# ---------------------------------------------------------------------------
+""" Contains the import checks of the synthgen package: the import time budgets
+of benchmarks/import_budget.py, and an import that leaves sys.path alone. """
+# ---------------------------------------------------------------------------
+
+
+import json
+import os
+import subprocess
+import sys
+
+root = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+sys.path.append(os.path.join(root,'benchmarks'))
+import import_budget
+
+
+"""
+Usage Example :
+python -m pytest tests/test_import_budget.py -q
+"""
+
+
+def test_import_budget():
+
+    assert import_budget.main([]) == 0
+
+
+def test_import_leaves_sys_path():
+
+    # The module folders only go on sys.path once a name of the package is used
+    code = ("import json, sys; sys.path.insert(0,{!r}); before = list(sys.path); import synthgen; "
+            "print(json.dumps([before == sys.path, 'Schema' in sys.modules]))").format(root)
+    out = subprocess.run([sys.executable,'-c',code],capture_output=True,text=True,cwd=root,check=True)
+    assert json.loads(out.stdout) == [True,False]
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pytest,pandas,numpy"
+# ---------------------------------------------------------------------------
+""" Contains the tests of the fitted model cache: hits and misses, the content
+key, eviction and unreadable entries. """
+# ---------------------------------------------------------------------------
+
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','Synthetic_Data_Generation'))
+from ModelCache import ModelCache
+
+
+"""
+Usage Example :
+python -m pytest tests/test_model_cache.py -q
+"""
+
+
+class CountingModel:
+
+    # Stands in for an sdv model : fit records the rows it saw
+
+    fits = 0
+
+    def fit(self,data):
+
+        CountingModel.fits += 1
+        self.rows = len(data)
+
+
+def frame(n=20,seed=0):
+
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'a':rng.integers(0,10,n),'b':rng.random(n),'c':rng.choice(['x','y'],n)})
+
+
+class Constraint:
+
+    # An sdv constraint with to_dict, its bound carried in the definition
+
+    def __init__(self,value):
+
+        self.value = value
+
+    def to_dict(self):
+
+        return {'constraint':'Bound','value':self.value}
+
+
+def test_miss_then_hit(tmp_path):
+
+    cache = ModelCache(str(tmp_path))
+    data = frame()
+    key = cache.key('stub',data,{'epochs':1})
+    assert cache.get(key) is None
+    CountingModel.fits = 0
+    first = cache.fit(key,CountingModel(),data,meta={'kind':'stub'})
+    second = cache.fit(key,CountingModel(),data)
+    assert CountingModel.fits == 1
+    assert first.rows == second.rows == len(data)
+    assert cache.meta(key)['kind'] == 'stub'
+
+
+def test_key_changes_with_data_params_and_constraints(tmp_path):
+
+    cache = ModelCache(str(tmp_path))
+    data = frame()
+    key = cache.key('stub',data,{'epochs':1},[Constraint(19)])
+    # Equal content gives the same key, whatever the object
+    assert key == cache.key('stub',data.copy(),{'epochs':1},[Constraint(19)])
+    changed = data.copy()
+    changed.loc[0,'b'] += 1
+    others = [cache.key('other',data,{'epochs':1},[Constraint(19)]),
+              cache.key('stub',changed,{'epochs':1},[Constraint(19)]),
+              cache.key('stub',data.astype({'a':'int32'}),{'epochs':1},[Constraint(19)]),
+              cache.key('stub',data,{'epochs':2},[Constraint(19)]),
+              cache.key('stub',data,{'epochs':1},[Constraint(20)]),
+              cache.key('stub',data,{'epochs':1})]
+    assert len({key,*others}) == len(others)+1
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+
+    cache = ModelCache(str(tmp_path))
+    key = cache.key('stub',frame(),{})
+    cache.put(key,CountingModel())
+    with open(cache.model_path(key),'wb') as f:
+        f.write(b"\x80\x04truncated")
+    assert cache.get(key) is None
+    assert not os.path.exists(cache.model_path(key))
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+
+    cache = ModelCache(str(tmp_path))
+    keys = [cache.key('stub',frame(seed=i),{}) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key,np.zeros(1000))
+        os.utime(cache.model_path(key),(time.time()-100+i,time.time()-100+i))
+    # Reading the oldest makes it the most recent
+    cache.get(keys[0])
+    cache.max_bytes = 2*os.path.getsize(cache.model_path(keys[0]))
+    cache.evict()
+    assert [cache.get(k) is not None for k in keys] == [True,False,True]
+
+
+def test_output_marks(tmp_path):
+
+    cache = ModelCache(str(tmp_path))
+    path = str(tmp_path/"synth.csv")
+    assert not cache.output_matches(path,"k1")
+    cache.mark_output(path,"k1")
+    assert cache.output_matches(path,"k1") and not cache.output_matches(path,"k2")
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pytest,pandas,numpy"
+# ---------------------------------------------------------------------------
+""" Contains the tests of the Noise baseline: the column kernels against the
+per-cell draws they replace, the streaming transform and the mergeable fit
+statistics. """
+# ---------------------------------------------------------------------------
+
+
+import os
+import random
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(here,'..','Synthetic_Data_Generation'))
+sys.path.append(os.path.join(here,'..','Noise'))
+from DataIO import read_table
+from Schema import numeric, load_data
+import Noise as noise_module
+from Noise import Noise, NoiseStats, NoiseStream, partition_stats, category_table, mutate_column, laplace_column
+
+
+"""
+Usage Example :
+python -m pytest tests/test_noise.py -q
+"""
+
+
+def mutate(x,p,fmap,col):
+
+    # The per-cell draw of the first Noise.py
+    roulette = random.uniform(0, 1)
+    if roulette > p:
+        return random.choice(list(set(fmap[col])-set(x)))
+    else :
+        return x
+
+
+def frequencies(values,categories):
+
+    values = pd.Series(values)
+    return np.array([(values == c).mean() for c in categories])
+
+
+@pytest.mark.parametrize('categories',[['ip_a','ip_b','ip_c'],['a','b','ab','abc','c'],['x','y']])
+def test_mutation_matches_per_cell_draws(categories):
+
+    n, p = 60000, 0.4
+    fmap = {'IP':set(categories)}
+    table = category_table(fmap['IP'])
+    x = np.array([categories[i % len(categories)] for i in range(n)],dtype=object)
+    random.seed(0)
+    legacy = [mutate(v,p,fmap,'IP') for v in x]
+    vectorized = mutate_column(x,p,table,NoiseStream(0).uniform('IP',0,n,2))
+    # Same distribution of the output given each input value
+    for value in categories:
+        rows = x == value
+        expected = frequencies(np.array(legacy,dtype=object)[rows],categories)
+        assert np.abs(frequencies(vectorized[rows],categories)-expected).max() < 0.02
+
+
+def test_unseen_values_are_mutated_like_seen_ones():
+
+    table = category_table({'ab','cd'})
+    x = np.array(['zz']*20000,dtype=object)
+    out = mutate_column(x,0.0,table,NoiseStream(1).uniform('IP',0,len(x),2))
+    # 'zz' is not a category, every mutated cell becomes one of the two categories
+    assert set(out) == {'ab','cd'}
+    assert abs((out == 'ab').mean()-0.5) < 0.02
+
+
+def test_laplace_matches_per_cell_draws():
+
+    n, scale, noise = 200000, 3.0, 0.5
+    x = np.full(n,10.0)
+    np.random.seed(0)
+    legacy = np.array([int(v+np.random.laplace(loc=0.0,scale=scale)*noise) for v in x])
+    vectorized = laplace_column(x,scale,noise,True,NoiseStream(0).uniform('C',0,n))
+    assert vectorized.dtype == np.int64
+    assert abs(vectorized.mean()-legacy.mean()) < 0.05
+    assert abs(vectorized.std()-legacy.std()) < 0.05
+    # Truncation towards zero, as int() does
+    assert abs((vectorized == 10).mean()-(legacy == 10).mean()) < 0.01
+
+
+def make_table(path,n,seed):
+
+    # n rows in the layout of the real data, written to path
+    rng = np.random.default_rng(seed)
+    c = rng.choice([0,19],n)
+    pd.DataFrame({'I':np.arange(n),'MT':rng.gamma(2.0,3.0,n),
+                  'IP':rng.choice(['ip_a','ip_b','ip_c'],n),'SNS':rng.choice(['x1','x2'],n),
+                  'RL':rng.choice(['r1','r2','r3','r4'],n),'OS':rng.choice(['lin','mac','win'],n),
+                  'C':c,'AC':(c > 0).astype(int),'WC':rng.integers(0,19,n)*(c > 0),'E':rng.integers(0,19,n)*(c > 0),
+                  'T':rng.integers(0,2,n)}).to_csv(path,index=False)
+    return str(path)
+
+
+def test_transform_noises_the_synthetic_rows(tmp_path):
+
+    real = make_table(tmp_path/"real.csv",500,0)
+    synth = make_table(tmp_path/"synth.csv",300,1)
+    noise = Noise()
+    noise.fit(real)
+    noise.transform(synth,1.0,0.0,seed=0,save_path=str(tmp_path/"out.csv"))
+    # p=1 and noise=0 leave the rows unchanged : the output is the synthetic table
+    out = pd.read_csv(tmp_path/"out.csv")
+    pd.testing.assert_frame_equal(out,pd.read_csv(synth),check_dtype=False)
+
+
+def test_transform_is_identical_across_chunk_sizes(tmp_path):
+
+    real = make_table(tmp_path/"real.csv",500,0)
+    synth = make_table(tmp_path/"synth.csv",1000,1)
+    noise = Noise()
+    noise.fit(real)
+    outputs = []
+    for chunksize in [None,7,64,1000]:
+        path = str(tmp_path/"out_{}.csv".format(chunksize))
+        noise.transform(synth,0.7,0.5,seed=3,chunksize=chunksize,save_path=path)
+        with open(path,'rb') as f:
+            outputs.append(f.read())
+    assert all(out == outputs[0] for out in outputs[1:])
+    # Another seed draws other rows
+    noise.transform(synth,0.7,0.5,seed=4,chunksize=64,save_path=str(tmp_path/"other.csv"))
+    with open(tmp_path/"other.csv",'rb') as f:
+        assert f.read() != outputs[0]
+
+
+def test_sweep_reproduces_transform(tmp_path):
+
+    real = make_table(tmp_path/"real.csv",500,0)
+    synth = make_table(tmp_path/"synth.csv",400,1)
+    noise = Noise()
+    noise.fit(real)
+    paths = noise.sweep(synth,[(0.9,0.5),(0.5,1.0)],seed=7,processes=1)
+    for ((p,level),path), seed in zip(paths.items(),noise.seeds):
+        noise.transform(synth,p,level,seed=seed,save_path=str(tmp_path/"single.csv"))
+        # Sweep tables are written in the default storage format
+        pd.testing.assert_frame_equal(read_table(path),read_table(str(tmp_path/"single.csv")),check_dtype=False)
+
+
+def test_partition_stats_merge_into_the_single_pass(tmp_path):
+
+    real = make_table(tmp_path/"real.csv",1000,0)
+    whole = NoiseStats().update(load_data(real))
+    merged = NoiseStats()
+    for start, stop in [(0,130),(130,600),(600,1000)]:
+        merged.merge(partition_stats(real,chunksize=50,start=start,stop=stop))
+    assert merged.fmap == whole.fmap
+    scale, expected = merged.scale_map(), whole.scale_map()
+    assert scale.keys() == expected.keys()
+    np.testing.assert_allclose([scale[c] for c in scale],[expected[c] for c in scale],rtol=1e-12)
+    # Same std as describe(), which the per-cell fit used
+    std = load_data(real)[numeric].astype('float64').describe().loc['std']
+    np.testing.assert_allclose([scale[c] for c in numeric],(std/2**0.5).to_numpy(),rtol=1e-12)
+
+
+def test_saved_stats_skip_the_real_data(tmp_path,monkeypatch):
+
+    real = make_table(tmp_path/"real.csv",300,0)
+    stats_path = str(tmp_path/"stats.json")
+    Noise().fit(real,stats_path=stats_path)
+    fitted = Noise()
+    reads = []
+    monkeypatch.setattr(noise_module,'load_data',lambda path: reads.append(path) or load_data(path))
+    fitted.fit(real,stats_path=stats_path)
+    assert reads == [] and fitted.df is None
+    # A rewritten file is fitted again
+    make_table(tmp_path/"real.csv",301,0)
+    fitted.fit(real,stats_path=stats_path)
+    assert reads == [real]
+    # fit_transform passes the stats on, a fingerprint replaces the file check
+    synth = make_table(tmp_path/"synth.csv",50,1)
+    for _ in range(2):
+        fitted.fit_transform(real,synth,1.0,0.0,save_path=str(tmp_path/"out.csv"),stats_path=stats_path,fingerprint="v1")
+    # The real data is read by the first call only, the synthetic rows by both
+    assert reads == [real,real,synth,synth]
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pytest,scipy,numpy"
+# ---------------------------------------------------------------------------
+""" Contains the tests of the blocked nearest neighbour search against the
+KD-tree, over tiles of any size. """
+# ---------------------------------------------------------------------------
+
+
+import os
+import sys
+import numpy as np
+import pytest
+from scipy.spatial import cKDTree
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','Synthetic_Data_Generation'))
+from Privacy import blocked_knn
+
+
+"""
+Usage Example :
+python -m pytest tests/test_privacy.py -q
+"""
+
+
+@pytest.mark.parametrize('block_rows,block_bytes',[(7,16*7*2),(7,4096),(300,16*300*1001),(1024,256*1024**2)])
+def test_blocked_matches_the_tree(block_rows,block_bytes):
+
+    rng = np.random.default_rng(0)
+    index = rng.random((1001,12)).astype(np.float32)
+    index[7] = index[8]
+    sq = (index*index).sum(axis=1)
+    query = np.concatenate([rng.random((200,12)).astype(np.float32),index[:20]])
+    expected, _ = cKDTree(index).query(query,k=2)
+    dist = blocked_knn(index,sq,query,2,block_rows,block_bytes)
+    np.testing.assert_allclose(dist,expected,atol=1e-5)
+    # Real rows in the query are exact matches, a duplicated one has two
+    assert (dist[200:,0] == 0).all() and dist[207,1] == 0 and dist[208,1] == 0
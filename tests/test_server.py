@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pytest,pandas,numpy"
+# ---------------------------------------------------------------------------
+""" Contains the tests of the sampling server, run against a stub sampler on a
+free localhost port: request batching, the prefetch buffer, condition parsing
+and the replies to bad requests. """
+# ---------------------------------------------------------------------------
+
+
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','Synthetic_Data_Generation'))
+from Schema import features, target, primary_key
+from Server import SamplingServer, request_rows
+
+
+"""
+Usage Example :
+python -m pytest tests/test_server.py -q
+"""
+
+
+class StubSampler:
+
+    # Valid rows without a fitted model, every call recorded as (n, conditions)
+
+    def __init__(self):
+
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def sample(self,n,conditions=None):
+
+        with self.lock:
+            self.calls.append((n,conditions))
+        conditions = conditions or {}
+        rng = np.random.default_rng(len(self.calls))
+        return pd.DataFrame({
+            'I':np.arange(n),'MT':rng.random(n),
+            'IP':'ip','SNS':'sns','RL':'rl','OS':'os',
+            'C':np.full(n,19),'AC':np.ones(n,dtype=int),'WC':np.zeros(n,dtype=int),'E':np.zeros(n,dtype=int),
+            target:np.full(n,conditions.get(target,0)),
+        })[features]
+
+
+def status(url):
+
+    # HTTP status code and decoded JSON body of a GET or (with a bytes body) POST
+    request = urllib.request.Request(url) if isinstance(url,str) else urllib.request.Request(*url)
+    try:
+        with urllib.request.urlopen(request,timeout=30) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def wait_for(check,timeout=10):
+
+    deadline = time.time()+timeout
+    while time.time() < deadline:
+        if check():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_concurrent_requests_are_batched():
+
+    stub = StubSampler()
+    # No buffer, every row is generated for the batch that asks for it
+    with SamplingServer({'stub':stub},buffer_rows=0,batch_rows=1,window=0.5) as server:
+        results = [None]*4
+        def fetch(i):
+            results[i] = request_rows(server.url,'stub',10,T=1)
+        threads = [threading.Thread(target=fetch,args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = server.describe()['stub']
+
+    assert stub.calls == [(40,{target:1})]
+    assert stats['requests'] == 4 and stats['batches'] == 1 and stats['rows'] == 40
+    assert all(len(r) == 10 and (r[target] == 1).all() for r in results)
+    # Ids run on across the requests of the batch
+    assert sorted(np.concatenate([r[primary_key].to_numpy() for r in results]).tolist()) == list(range(40))
+
+
+def test_prefetch_buffer_serves_requests():
+
+    stub = StubSampler()
+    with SamplingServer({'stub':stub},buffer_rows=300,batch_rows=100,window=0.001) as server:
+        first = request_rows(server.url,'stub',10,T=1)
+        # Extra rows of the first call are kept, the idle worker tops them up
+        assert wait_for(lambda: server.describe()['stub']['buffered'].get(json.dumps({target:1})) == 300)
+        calls = [n for n,c in stub.calls if c == {target:1}]
+        rows = request_rows(server.url,'stub',250,T=1)
+        stats = server.describe()['stub']
+
+    assert len(first) == 10 and len(rows) == 250
+    # The first call draws at least batch_rows rows, the buffer is then topped up
+    # batch_rows at a time, and the second request is served from it alone
+    assert calls == [100,100,100,10]
+    assert stats['from_buffer'] == 250 and stats['generated'] == 10
+
+
+def test_conditions_are_parsed():
+
+    stub = StubSampler()
+    with SamplingServer({'stub':stub},buffer_rows=0,batch_rows=1) as server:
+        code, body = status("{}/sample?model=stub&n=5&T=1".format(server.url))
+        assert code == 200 and body['columns'] == features
+        assert [row[features.index(target)] for row in body['data']] == [1]*5
+        post = json.dumps({'model':'stub','n':3,'conditions':{target:"0"}}).encode()
+        code, body = status(("{}/sample".format(server.url),post,{'Content-Type':'application/json'}))
+        assert code == 200 and len(body['data']) == 3
+
+    # Query string values arrive as text and are cast to the column's dtype
+    assert stub.calls == [(5,{target:1}),(3,{target:0})]
+
+
+def test_zero_rows():
+
+    with SamplingServer({'stub':StubSampler()},buffer_rows=0,batch_rows=1) as server:
+        rows = request_rows(server.url,'stub',0,T=1)
+    assert len(rows) == 0 and list(rows.columns) == features
+
+
+@pytest.mark.parametrize('query',["model=stub&n=-1","model=stub&n=ten","model=stub","model=stub&n=5&Z=1",
+                                  "model=stub&n=5&I=3","model=stub&n=5&T=one"])
+def test_bad_requests(query):
+
+    stub = StubSampler()
+    with SamplingServer({'stub':stub},buffer_rows=0) as server:
+        code, body = status("{}/sample?{}".format(server.url,query))
+    assert code == 400 and body['error']
+    assert stub.calls == []
+
+
+def test_bad_json_and_unknown_model():
+
+    with SamplingServer({'stub':StubSampler()},buffer_rows=0) as server:
+        code, _ = status(("{}/sample".format(server.url),b"{not json",{'Content-Type':'application/json'}))
+        assert code == 400
+        code, _ = status("{}/sample?model=other&n=5".format(server.url))
+        assert code == 404
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#----------------------------------------------------------------------------
+# Created By  : Prashanth Suresh, Naveen Shaji, Pratik Kamat, Amisha Turkel, Anusha Reddy
+# Created Date: 7th March 2023
+# version ='1.0'
+# requirements = "pytest,pandas,numpy"
+# ---------------------------------------------------------------------------
+""" Contains the tests of the stratified wrapper, one stub model per value of a
+numeric or categorical column : exact counts per stratum and the saved output. """
+# ---------------------------------------------------------------------------
+
+
+import os
+import sys
+import pandas as pd
+import pytest
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(here,'..','Synthetic_Data_Generation'))
+sys.path.append(here)
+from ModelCache import ModelCache
+from Stratified import Stratified
+from Schema import features
+from test_backend import Resample, frame
+
+
+"""
+Usage Example :
+python -m pytest tests/test_stratified.py -q
+"""
+
+
+@pytest.mark.parametrize('column,counts',[('T',{0:13,1:21}),('IP',{'ip_a':9,'ip_b':0,'ip_c':17})])
+def test_round_trip(tmp_path,column,counts):
+
+    data = frame()
+    cache = ModelCache(str(tmp_path/"cache"))
+    path = str(tmp_path/"synth.csv")
+    strat = Stratified(Resample,data,column=column,processes=2,cache=cache)
+    assert strat.strata == sorted(data[column].unique().tolist())
+    strat.fit(seed=0)
+    synth = strat.transform(counts,batch_size=5,synth_path=path)
+    assert list(synth.columns) == features and synth['I'].tolist() == list(range(len(synth)))
+    assert {v:int((synth[column] == v).sum()) for v in counts} == counts
+    # Every row comes from the model of its stratum : a row of the data with that value
+    rows = data.drop(columns='I').astype({c:str for c in ['IP','SNS','RL','OS']})
+    drawn = synth.drop(columns='I').astype(rows.dtypes.to_dict())
+    assert len(drawn.merge(rows.drop_duplicates(),how='left',indicator=True).query("_merge != 'both'")) == 0
+
+    models = sorted(f for f in os.listdir(cache.cache_dir) if f.endswith(".pkl"))
+    assert len(models) == len(strat.strata)
+
+    # Same data and settings : the table comes from the file
+    again = Stratified(Resample,data,column=column,processes=2,cache=cache)
+    again.fit(seed=0)
+    assert again.key == strat.key
+    pd.testing.assert_frame_equal(again.transform(counts,synth_path=path),synth,check_dtype=False,check_categorical=False)
+    assert not again.fitted
+    # Other counts are drawn from the cached models, none is fitted again
+    more = {v:n+1 for v,n in counts.items()}
+    synth = again.transform(more,synth_path=str(tmp_path/"more.csv"))
+    assert {v:int((synth[column] == v).sum()) for v in more} == more
+    assert sorted(f for f in os.listdir(cache.cache_dir) if f.endswith(".pkl")) == models